@@ -0,0 +1,18 @@
+"""
+基准测试包 - 合成影像生成、热点路径微基准测试、端到端数据集基准测试和结果对比
+
+在PySide6目录下运行：
+    python -m benchmarks micro --sizes 1024 4096 --output benchmarks/results/micro.json
+    python -m benchmarks dataset LEVIR-CD/test --workers 4 --config tile=512
+    python -m benchmarks compare 旧结果.json 新结果.json
+"""
+from .results import compare_results, load_results, save_results
+from .synthetic import generate_dataset, generate_pair
+
+__all__ = [
+    'compare_results',
+    'generate_dataset',
+    'generate_pair',
+    'load_results',
+    'save_results',
+]
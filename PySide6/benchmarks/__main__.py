@@ -0,0 +1,178 @@
+"""
+基准测试命令行入口
+
+    python -m benchmarks micro [--sizes ...] [--bands ...] [--dtypes ...] [--layouts ...] [--formats ...]
+    python -m benchmarks generate 输出目录 [--size N] [--bands N] [--dtype uint8] [--layout tiled:256] [--format tif]
+    python -m benchmarks dataset 数据集目录 [--workers N] [--threshold 0.5] [--config 名称=值 ...]
+    python -m benchmarks generate-dataset 输出目录 [--count N] [--size N]
+    python -m benchmarks compare 基准.json 当前.json [--threshold 0.1]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# 与main.py相同，保证display、log_sink和function包可以导入
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_dir not in sys.path:
+    sys.path.insert(0, project_dir)
+
+# 基准测试默认只记录警告以上的日志并关闭遥测，避免日志和统计开销计入耗时
+os.environ.setdefault("RSCD_LOG_LEVEL", "WARNING")
+os.environ.setdefault("RSCD_TELEMETRY", "0")
+
+from benchmarks.results import compare_results, format_comparison, load_results, save_results  # noqa: E402
+
+
+def _default_output(prefix):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join("benchmarks", "results", f"{prefix}_{timestamp}.json")
+
+
+def _run_micro(args):
+    from benchmarks.micro import run_micro
+    from function.telemetry import peak_rss_bytes
+
+    params = {
+        "sizes": args.sizes, "bands": args.bands, "dtypes": args.dtypes, "layouts": args.layouts,
+        "formats": args.formats, "zooms": args.zooms, "grid": args.grid,
+        "repeat": args.repeat, "warmup": args.warmup,
+    }
+    results = run_micro(args.sizes, args.bands, args.dtypes, args.layouts, args.formats, args.zooms,
+                        args.grid, args.repeat, args.warmup, args.work_dir, progress=print)
+    params["peak_rss_bytes"] = peak_rss_bytes()
+    output = save_results(args.output or _default_output("micro"), results, params)
+    print(f"结果已保存: {output}")
+    return 0
+
+
+def _run_generate(args):
+    from benchmarks.synthetic import generate_pair
+
+    paths = generate_pair(args.output_dir, args.name, args.size, args.size, args.bands, args.dtype,
+                          args.layout, args.format, args.changes, args.seed)
+    for path in paths:
+        print(path)
+    return 0
+
+
+def _parse_config(items):
+    config = {}
+    for item in items or []:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise SystemExit(f"无效的配置标签: {item}（应为 名称=值）")
+        config[key] = value
+    return config
+
+
+def _run_dataset(args):
+    from benchmarks.dataset import run_dataset
+
+    config = _parse_config(args.config)
+    result = run_dataset(args.root, args.workers, args.threshold, args.weights, args.limit,
+                         args.output_dir, config, progress=print)
+    accuracy = result["accuracy"]
+    print(f"完成 {result['completed']}/{result['pairs']} 组，失败 {result['failed']} 组，总耗时 {result['wall_s']:.2f} s")
+    print(f"吞吐量: {result['pairs_per_s']} 组/秒，{result['mpix_per_s']} 百万像素/秒")
+    if "latency_percentiles_s" in result:
+        print("延迟: " + ", ".join(f"{key}={value:.3f}s" for key, value in result["latency_percentiles_s"].items()))
+    if result["peak_rss_bytes"] is not None:
+        print(f"峰值内存: {result['peak_rss_bytes'] / 1024 / 1024:.1f} MB")
+    print("精度: " + ", ".join(f"{key}={accuracy[key]}" for key in ("precision", "recall", "f1", "iou")))
+
+    params = {"root": os.path.abspath(args.root), "workers": args.workers, "threshold": args.threshold,
+              "weights": args.weights, "limit": args.limit, "config": config}
+    output = save_results(args.output or _default_output("dataset"), [result], params)
+    print(f"结果已保存: {output}")
+    return 1 if result["failed"] else 0
+
+
+def _run_generate_dataset(args):
+    from benchmarks.synthetic import generate_dataset
+
+    root = generate_dataset(args.output_dir, args.count, args.size, args.size, args.bands, args.dtype,
+                            args.format, args.seed)
+    print(f"已生成 {args.count} 组影像对: {root}")
+    return 0
+
+
+def _run_compare(args):
+    rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold, args.metric)
+    print(format_comparison(rows))
+    regressions = sum(1 for row in rows if row[-1] == "regression")
+    print(f"\n共 {len(rows)} 项，退化 {regressions} 项（阈值 {args.threshold:.0%}）")
+    # 存在退化时返回非零状态，便于在脚本中使用
+    return 1 if regressions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="遥感影像变化检测系统基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    micro = subparsers.add_parser("micro", help="热点路径微基准测试")
+    micro.add_argument("--sizes", type=int, nargs="+", default=[1024, 4096], help="影像边长")
+    micro.add_argument("--bands", type=int, nargs="+", default=[3], help="波段数")
+    micro.add_argument("--dtypes", nargs="+", default=["uint8"], choices=["uint8", "uint16", "float32"])
+    micro.add_argument("--layouts", nargs="+", default=["striped", "tiled:256"],
+                       help="GeoTIFF分块方式：striped或tiled:<边长>")
+    micro.add_argument("--formats", nargs="+", default=["tif", "png"], choices=["tif", "png"])
+    micro.add_argument("--zooms", type=float, nargs="+", default=[0.25, 0.5, 1.0, 2.0, 4.0, 8.0],
+                       help="update_display测试的缩放级别")
+    micro.add_argument("--grid", type=int, default=4, help="网格裁剪的行列数")
+    micro.add_argument("--repeat", type=int, default=5, help="每项计时次数")
+    micro.add_argument("--warmup", type=int, default=1, help="每项预热次数")
+    micro.add_argument("--work-dir", default=None, help="中间文件目录，默认使用临时目录")
+    micro.add_argument("--output", default=None, help="结果JSON路径，默认benchmarks/results/micro_<时间戳>.json")
+    micro.set_defaults(handler=_run_micro)
+
+    generate = subparsers.add_parser("generate", help="生成合成影像对")
+    generate.add_argument("output_dir")
+    generate.add_argument("--name", default="synthetic")
+    generate.add_argument("--size", type=int, default=1024)
+    generate.add_argument("--bands", type=int, default=3)
+    generate.add_argument("--dtype", default="uint8", choices=["uint8", "uint16", "float32"])
+    generate.add_argument("--layout", default="striped")
+    generate.add_argument("--format", default="tif", choices=["tif", "png"])
+    generate.add_argument("--changes", type=int, default=12, help="变化区域数量")
+    generate.add_argument("--seed", type=int, default=0)
+    generate.set_defaults(handler=_run_generate)
+
+    dataset = subparsers.add_parser("dataset", help="LEVIR-CD格式数据集端到端基准测试")
+    dataset.add_argument("root", help="包含A、B、label子目录的数据集目录")
+    dataset.add_argument("--workers", type=int, default=None, help="并行检测任务数")
+    dataset.add_argument("--threshold", type=float, default=0.5, help="变化概率阈值")
+    dataset.add_argument("--weights", default=None, help="模型权重路径")
+    dataset.add_argument("--limit", type=int, default=None, help="最多测试的影像对数量")
+    dataset.add_argument("--output-dir", default=None, help="保留检测结果的目录，默认使用临时目录")
+    dataset.add_argument("--config", nargs="*", default=[], metavar="名称=值",
+                         help="写入结果的配置标签，用于区分量化、分块大小等不同设置")
+    dataset.add_argument("--output", default=None, help="结果JSON路径，默认benchmarks/results/dataset_<时间戳>.json")
+    dataset.set_defaults(handler=_run_dataset)
+
+    generate_dataset = subparsers.add_parser("generate-dataset", help="生成LEVIR-CD格式的合成数据集")
+    generate_dataset.add_argument("output_dir")
+    generate_dataset.add_argument("--count", type=int, default=8)
+    generate_dataset.add_argument("--size", type=int, default=512)
+    generate_dataset.add_argument("--bands", type=int, default=3)
+    generate_dataset.add_argument("--dtype", default="uint8", choices=["uint8", "uint16"])
+    generate_dataset.add_argument("--format", default="png", choices=["png", "tif"])
+    generate_dataset.add_argument("--seed", type=int, default=0)
+    generate_dataset.set_defaults(handler=_run_generate_dataset)
+
+    compare = subparsers.add_parser("compare", help="对比两次运行的结果")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="判定退化的相对变化阈值")
+    compare.add_argument("--metric", default="median_s", choices=["min_s", "median_s", "mean_s"])
+    compare.set_defaults(handler=_run_compare)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
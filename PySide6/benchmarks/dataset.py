@@ -0,0 +1,222 @@
+"""
+端到端数据集基准测试
+
+对LEVIR-CD格式的数据集（A/前时相、B/后时相、label/变化标签，同名文件一一对应）
+通过DetectionWorkerPool运行完整检测流程（解码、推理、阈值化、编码写出），统计：
+    吞吐量      影像对/秒、百万像素/秒
+    延迟        每组影像从开始解码到结果写出的耗时分位数
+    内存        进程峰值常驻内存
+    精度        变化类的精确率、召回率、F1和IoU（全数据集像素累计）以及总体精度
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from .results import summarize
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+def find_pairs(root, limit=None):
+    """
+    查找数据集中的影像对
+
+    前后时相按文件名匹配，标签按文件名主干匹配（标签扩展名可以不同）。
+
+    Args:
+        root: 数据集目录，包含A、B、label三个子目录
+        limit: 最多返回的影像对数量
+
+    Returns:
+        list: [(名称, 前时相路径, 后时相路径, 标签路径), ...]，按名称排序
+    """
+    dirs = {name: os.path.join(root, name) for name in ("A", "B", "label")}
+    missing = [path for path in dirs.values() if not os.path.isdir(path)]
+    if missing:
+        raise FileNotFoundError(f"数据集目录不完整，缺少: {', '.join(missing)}")
+
+    after_names = set(os.listdir(dirs["B"]))
+    labels = {os.path.splitext(name)[0]: name for name in os.listdir(dirs["label"])
+              if name.lower().endswith(IMAGE_EXTENSIONS)}
+    pairs = []
+    for name in sorted(os.listdir(dirs["A"])):
+        if not name.lower().endswith(IMAGE_EXTENSIONS) or name not in after_names:
+            continue
+        label = labels.get(os.path.splitext(name)[0])
+        if label is None:
+            continue
+        pairs.append((name, os.path.join(dirs["A"], name), os.path.join(dirs["B"], name),
+                      os.path.join(dirs["label"], label)))
+        if limit and len(pairs) >= limit:
+            break
+    return pairs
+
+
+def read_mask(path):
+    """读取二值图（标签或检测结果），非零像素为变化"""
+    import cv2
+    mask = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        raise IOError(f"无法读取图像: {path}")
+    return mask > 0
+
+
+class ConfusionCounter:
+    """逐像素累计二分类混淆矩阵"""
+
+    def __init__(self):
+        self.tp = self.fp = self.fn = self.tn = 0
+
+    def update(self, prediction, label):
+        if prediction.shape != label.shape:
+            raise ValueError(f"检测结果与标签尺寸不一致: {prediction.shape} 与 {label.shape}")
+        tp = int(np.count_nonzero(prediction & label))
+        fp = int(np.count_nonzero(prediction & ~label))
+        fn = int(np.count_nonzero(~prediction & label))
+        self.tp += tp
+        self.fp += fp
+        self.fn += fn
+        self.tn += prediction.size - tp - fp - fn
+        return tp, fp, fn
+
+    @staticmethod
+    def _ratio(numerator, denominator):
+        return round(numerator / denominator, 6) if denominator else None
+
+    def metrics(self):
+        """返回变化类的精确率、召回率、F1、IoU和总体精度"""
+        precision = self._ratio(self.tp, self.tp + self.fp)
+        recall = self._ratio(self.tp, self.tp + self.fn)
+        total = self.tp + self.fp + self.fn + self.tn
+        return {
+            "precision": precision,
+            "recall": recall,
+            "f1": self._ratio(2 * self.tp, 2 * self.tp + self.fp + self.fn),
+            "iou": self._ratio(self.tp, self.tp + self.fp + self.fn),
+            "overall_accuracy": self._ratio(self.tp + self.tn, total),
+            "tp": self.tp, "fp": self.fp, "fn": self.fn, "tn": self.tn,
+        }
+
+
+def _run_pool(pairs, output_dir, workers, threshold, weights, progress):
+    """通过DetectionWorkerPool执行全部影像对，返回(总耗时, {名称: 单组耗时}, {名称: 错误})"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QCoreApplication, QEventLoop
+
+    from function.detection_pool import DetectionWorkerPool
+    from function.execute_change_detection_task import ChangeDetectionModel
+
+    QCoreApplication.instance() or QCoreApplication([])
+    model = ChangeDetectionModel(weights)
+    # 预先加载权重，避免首个任务的延迟包含模型加载
+    model.load()
+    pool = DetectionWorkerPool(max_workers=workers, threshold=threshold, model=model)
+
+    latencies, errors = {}, {}
+    loop = QEventLoop()
+
+    def on_finished(key, output_path, elapsed, fingerprints):
+        latencies[key] = elapsed
+        progress(f"  [{len(latencies) + len(errors)}/{len(pairs)}] {key}: {elapsed:.3f} s")
+        if len(latencies) + len(errors) == len(pairs):
+            loop.quit()
+
+    def on_failed(key, error):
+        errors[key] = error.splitlines()[0] if error else ""
+        progress(f"  [{len(latencies) + len(errors)}/{len(pairs)}] {key} 失败: {errors[key]}")
+        if len(latencies) + len(errors) == len(pairs):
+            loop.quit()
+
+    pool.finished.connect(on_finished)
+    pool.failed.connect(on_failed)
+
+    start = time.perf_counter()
+    for name, before, after, _ in pairs:
+        pool.submit(name, before, after, os.path.join(output_dir, os.path.splitext(name)[0] + ".png"))
+    if pairs:
+        loop.exec()
+    total = time.perf_counter() - start
+    pool.wait_for_done()
+    return total, latencies, errors
+
+
+def run_dataset(root, workers=None, threshold=0.5, weights=None, limit=None, output_dir=None,
+                config=None, progress=None):
+    """
+    运行端到端数据集基准测试
+
+    Args:
+        root: 数据集目录（包含A、B、label）
+        workers: 并行检测任务数，默认与批量处理相同
+        threshold: 变化概率阈值
+        weights: 模型权重路径，默认与主程序相同
+        limit: 最多测试的影像对数量
+        output_dir: 检测结果目录，默认使用临时目录并在结束后删除
+        config: 附加的配置标签（如量化方式、分块大小），原样写入结果，便于区分不同设置
+        progress: 进度回调，参数为说明文字
+
+    Returns:
+        dict: 结果项，包含吞吐量、延迟分位数、峰值内存和精度指标
+    """
+    from function.raster_io import read_image_size
+    from function.telemetry import peak_rss_bytes
+
+    report = progress or (lambda message: None)
+    pairs = find_pairs(root, limit)
+    if not pairs:
+        raise FileNotFoundError(f"数据集中没有完整的影像对: {root}")
+    report(f"共 {len(pairs)} 组影像对")
+
+    own_dir = output_dir is None
+    output_dir = output_dir or tempfile.mkdtemp(prefix="rscd_dataset_")
+    rss_before = peak_rss_bytes()
+    try:
+        total, latencies, errors = _run_pool(pairs, output_dir, workers, threshold, weights, report)
+        rss_after = peak_rss_bytes()
+
+        # 精度评估在计时结束后进行，不计入吞吐量
+        counter = ConfusionCounter()
+        megapixels = 0.0
+        per_pair = []
+        for name, before, _, label_path in pairs:
+            if name not in latencies:
+                per_pair.append({"name": name, "error": errors.get(name, "未完成")})
+                continue
+            width, height = read_image_size(before)
+            megapixels += width * height / 1e6
+            prediction = read_mask(os.path.join(output_dir, os.path.splitext(name)[0] + ".png"))
+            tp, fp, fn = counter.update(prediction, read_mask(label_path))
+            f1 = 2 * tp / (2 * tp + fp + fn) if (tp + fp + fn) else None
+            per_pair.append({"name": name, "latency_s": round(latencies[name], 6),
+                             "f1": round(f1, 6) if f1 is not None else None})
+    finally:
+        if own_dir:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    completed = len(latencies)
+    timings = list(latencies.values())
+    result = {
+        "name": "dataset",
+        "case": dict({"dataset": os.path.basename(os.path.normpath(root)), "workers": workers,
+                      "threshold": threshold}, **(config or {})),
+        "pairs": len(pairs),
+        "completed": completed,
+        "failed": len(errors),
+        "wall_s": round(total, 6),
+        "pairs_per_s": round(completed / total, 3) if total > 0 else None,
+        "mpix_per_s": round(megapixels / total, 3) if total > 0 else None,
+        "peak_rss_bytes": rss_after,
+        "peak_rss_growth_bytes": rss_after - rss_before if rss_after is not None and rss_before is not None else None,
+    }
+    if timings:
+        result.update(summarize(timings))
+        result["latency_percentiles_s"] = {
+            f"p{q}": round(float(np.percentile(timings, q)), 6) for q in LATENCY_PERCENTILES
+        }
+    result["accuracy"] = counter.metrics()
+    result["per_pair"] = per_pair
+    return result
@@ -0,0 +1,184 @@
+"""
+热点路径微基准测试
+
+在离屏Qt环境中使用真实的NavigationFunctions和ZoomableLabel，对合成影像计时：
+    display_image       ImageDisplay.display_image（解码、归一化、转换为QPixmap并显示）
+    crop_cv2            GridCropping._crop_image_grid_cv2
+    crop_geotiff        GridCropping._crop_geotiff_grid（仅GeoTIFF）
+    standardize         StandardizeImage.standardize_image（完成提示框替换为不弹出的模拟对象）
+    update_display      ZoomableLabel.update_display（不同缩放级别）
+"""
+import itertools
+import os
+import shutil
+import tempfile
+
+from .results import measure, summarize
+from .synthetic import generate_pair
+
+DEFAULT_ZOOMS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+DISPLAY_SIZE = (1280, 800)
+
+
+def _gdal_available():
+    try:
+        from osgeo import gdal  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _qt_application():
+    """获取QApplication，未设置显示平台时使用离屏平台"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def _suppress_message_boxes(module):
+    """
+    把被测模块中的QMessageBox替换为不弹出的模拟对象
+
+    计时不包含等待模态提示框和关闭提示框的时间，小影像的结果不会被这部分开销掩盖。
+    """
+    from unittest import mock
+    return mock.patch(f"{module}.QMessageBox")
+
+
+def _navigation():
+    """创建与主界面相同结构的NavigationFunctions"""
+    from PySide6.QtWidgets import QPlainTextEdit
+    from display import NavigationFunctions, ZoomableLabel
+
+    labels = [ZoomableLabel() for _ in range(3)]
+    for label in labels:
+        label.resize(*DISPLAY_SIZE)
+    return NavigationFunctions(labels[0], labels[1], labels[2], QPlainTextEdit())
+
+
+def _process_events():
+    from PySide6.QtWidgets import QApplication
+    QApplication.processEvents()
+
+
+def iter_cases(sizes, bands_list, dtypes, layouts, formats):
+    """
+    枚举影像参数组合，PNG不区分分块方式
+
+    Yields:
+        dict: size、bands、dtype、layout、format
+    """
+    for size, bands, dtype, fmt in itertools.product(sizes, bands_list, dtypes, formats):
+        for layout in (layouts if fmt in ("tif", "tiff") else ("striped",)):
+            yield {"size": size, "bands": bands, "dtype": dtype, "layout": layout, "format": fmt}
+
+
+def _skip_reason(case):
+    if case["format"] in ("tif", "tiff") and not _gdal_available():
+        return "GDAL不可用"
+    if case["format"] not in ("tif", "tiff"):
+        if case["dtype"] == "float32":
+            return f"{case['format']}不支持float32"
+        if case["bands"] not in (1, 3, 4):
+            return f"{case['format']}只支持1、3、4波段"
+    return None
+
+
+def run_micro(sizes=(1024, 4096), bands_list=(3,), dtypes=("uint8",), layouts=("striped", "tiled:256"),
+              formats=("tif", "png"), zooms=DEFAULT_ZOOMS, grid=4, repeat=5, warmup=1, work_dir=None,
+              progress=None):
+    """
+    运行全部热点路径微基准测试
+
+    Args:
+        sizes: 影像边长列表
+        bands_list: 波段数列表
+        dtypes: 数据类型列表
+        layouts: GeoTIFF分块方式列表
+        formats: 影像格式列表
+        zooms: update_display测试的缩放级别
+        grid: 网格裁剪的行列数
+        repeat: 每项计时次数
+        warmup: 每项预热次数
+        work_dir: 合成影像和中间结果目录，默认使用临时目录并在结束后删除
+        progress: 进度回调，参数为说明文字
+
+    Returns:
+        list: 结果列表，每项包含name、case和耗时汇总，跳过的项包含skipped
+    """
+    from function.grid_cropping import GridCropping
+    from function.image_display import ImageDisplay
+    from function.standardize_image import StandardizeImage
+
+    report = progress or (lambda message: None)
+    _qt_application()
+    navigation = _navigation()
+    display = ImageDisplay(navigation)
+    cropping = GridCropping(navigation)
+    standardize = StandardizeImage(navigation)
+
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="rscd_bench_")
+    results = []
+    try:
+        for index, case in enumerate(iter_cases(sizes, bands_list, dtypes, layouts, formats)):
+            reason = _skip_reason(case)
+            if reason:
+                results.append({"name": "generate", "case": case, "skipped": reason})
+                report(f"跳过 {case}: {reason}")
+                continue
+
+            case_dir = os.path.join(work_dir, f"case_{index:03d}")
+            before_path, _, _ = generate_pair(
+                case_dir, "bench", case["size"], case["size"], case["bands"], case["dtype"],
+                case["layout"], case["format"], seed=index
+            )
+            megapixels = case["size"] * case["size"] / 1e6
+            report(f"测试 {case}")
+
+            def record(name, timings, extra=None, pixels=megapixels):
+                entry = {"name": name, "case": dict(case, **(extra or {}))}
+                entry.update(summarize(timings, pixels))
+                results.append(entry)
+                report(f"  {name} {extra or ''}: 中位数 {entry['median_s']:.4f} s")
+
+            def load():
+                display.display_image(before_path, True)
+                _process_events()
+
+            record("display_image", measure(load, repeat, warmup))
+
+            crop_dir = os.path.join(case_dir, "grid")
+
+            def reset_crop_dir():
+                shutil.rmtree(crop_dir, ignore_errors=True)
+
+            record("crop_cv2", measure(lambda: cropping._crop_image_grid_cv2(before_path, grid, crop_dir, True),
+                                       repeat, warmup, setup=reset_crop_dir), {"grid": grid})
+            if case["format"] in ("tif", "tiff"):
+                record("crop_geotiff", measure(lambda: cropping._crop_geotiff_grid(before_path, grid, crop_dir, True),
+                                               repeat, warmup, setup=reset_crop_dir), {"grid": grid})
+            reset_crop_dir()
+
+            # 标准化结果写在输入影像旁边，每次执行前恢复输入路径
+            def reset_standardize():
+                navigation.file_path = before_path
+
+            with _suppress_message_boxes("function.standardize_image"):
+                record("standardize", measure(standardize.standardize_image, repeat, warmup, setup=reset_standardize))
+
+            # 以display_image加载后的显示状态测试各缩放级别的重绘
+            load()
+            label = navigation.label_before
+            display_pixels = DISPLAY_SIZE[0] * DISPLAY_SIZE[1] / 1e6
+            for zoom in zooms:
+                def set_zoom(zoom=zoom):
+                    label.scale_factor = zoom
+                record("update_display", measure(label.update_display, repeat, warmup, setup=set_zoom),
+                       {"zoom": zoom}, display_pixels)
+
+            shutil.rmtree(case_dir, ignore_errors=True)
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
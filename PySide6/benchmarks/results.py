@@ -0,0 +1,170 @@
+"""
+基准测试结果模块 - 计时、运行环境记录、JSON保存和版本间对比
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+def measure(func, repeat=5, warmup=1, setup=None):
+    """
+    多次执行func并返回每次的耗时
+
+    Args:
+        func: 被测函数（无参数）
+        repeat: 计时次数
+        warmup: 不计时的预热次数（填充文件缓存、初始化驱动等）
+        setup: 每次执行前调用的准备函数，不计入耗时
+
+    Returns:
+        list: 每次执行的耗时（秒）
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings, megapixels=None):
+    """
+    汇总耗时
+
+    Args:
+        timings: 每次执行的耗时列表
+        megapixels: 每次处理的像素量（百万像素），用于计算吞吐量
+
+    Returns:
+        dict: 最小值、中位数、平均值、最大值、标准差（秒）和吞吐量
+    """
+    summary = {
+        "repeat": len(timings),
+        "min_s": round(min(timings), 6),
+        "median_s": round(statistics.median(timings), 6),
+        "mean_s": round(statistics.fmean(timings), 6),
+        "max_s": round(max(timings), 6),
+        "stdev_s": round(statistics.stdev(timings), 6) if len(timings) > 1 else 0.0,
+    }
+    if megapixels:
+        summary["megapixels"] = round(megapixels, 4)
+        summary["mpix_per_s"] = round(megapixels / summary["median_s"], 3) if summary["median_s"] > 0 else None
+    return summary
+
+
+def _module_version(name):
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    if name == "osgeo":
+        from osgeo import gdal
+        return gdal.__version__
+    return getattr(module, "__version__", None)
+
+
+def _git_revision():
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return output.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    """记录运行环境，对比不同版本的结果时用于确认测试条件一致"""
+    versions = {name: _module_version(name) for name in ("numpy", "cv2", "PIL", "osgeo", "PySide6")}
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+
+def save_results(path, results, params=None):
+    """
+    保存基准测试结果
+
+    Args:
+        path: JSON文件路径
+        results: 结果列表，每项包含name、case和耗时汇总
+        params: 本次运行的参数
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    document = {"environment": environment(), "params": params or {}, "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _case_key(result):
+    return result["name"], json.dumps(result.get("case", {}), sort_keys=True)
+
+
+def compare_results(baseline, current, threshold=0.10, metric="median_s"):
+    """
+    对比两次运行的结果
+
+    Args:
+        baseline: 基准结果（load_results的返回值）
+        current: 当前结果
+        threshold: 判定为退化或提升的相对变化阈值
+        metric: 对比的耗时指标
+
+    Returns:
+        list: 每项为(名称, 用例, 基准耗时, 当前耗时, 相对变化, 状态)，
+              状态为"regression"、"improvement"、"unchanged"或"missing"
+    """
+    baseline_cases = {_case_key(result): result for result in baseline.get("results", [])}
+    rows = []
+    for result in current.get("results", []):
+        key = _case_key(result)
+        old = baseline_cases.get(key)
+        new_value = result.get(metric)
+        if old is None or old.get(metric) is None or new_value is None:
+            rows.append((result["name"], result.get("case", {}), None, new_value, None, "missing"))
+            continue
+        old_value = old[metric]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        else:
+            status = "unchanged"
+        rows.append((result["name"], result.get("case", {}), old_value, new_value, change, status))
+    return rows
+
+
+def format_comparison(rows):
+    """把对比结果格式化为文本表格"""
+    lines = [f"{'状态':<12}{'变化':>9}  {'基准(s)':>10}  {'当前(s)':>10}  用例"]
+    for name, case, old, new, change, status in rows:
+        case_text = ", ".join(f"{key}={value}" for key, value in case.items())
+        change_text = f"{change:+.1%}" if change is not None else "-"
+        old_text = f"{old:.4f}" if old is not None else "-"
+        new_text = f"{new:.4f}" if new is not None else "-"
+        lines.append(f"{status:<12}{change_text:>9}  {old_text:>10}  {new_text:>10}  {name} [{case_text}]")
+    return "\n".join(lines)
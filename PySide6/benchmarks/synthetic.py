@@ -0,0 +1,193 @@
+"""
+合成影像生成模块 - 生成尺寸、波段数、数据类型和分块方式可配置的前后时相影像对
+
+影像内容为低频纹理加噪声（压缩率和真实影像接近），后时相在随机位置加入若干
+变化区域，同时输出对应的变化标签，可用于微基准测试和端到端数据集基准测试。
+"""
+import os
+
+import cv2
+import numpy as np
+
+# 数据类型名 -> (numpy类型, 取值上限)
+DTYPES = {
+    "uint8": (np.uint8, 255),
+    "uint16": (np.uint16, 4095),   # 模拟12位传感器
+    "float32": (np.float32, 1.0),  # 模拟反射率
+}
+
+# 合成影像使用的地理参考：UTM 50N，0.5米分辨率
+SYNTHETIC_EPSG = 32650
+SYNTHETIC_GEOTRANSFORM = (500000.0, 0.5, 0.0, 4000000.0, 0.0, -0.5)
+
+
+def parse_block_layout(layout):
+    """
+    解析分块方式
+
+    Args:
+        layout: "striped"（按行条带存储）或"tiled:<边长>"（如"tiled:256"）
+
+    Returns:
+        int: 分块边长，条带存储返回0
+    """
+    if layout in (None, "", "striped"):
+        return 0
+    kind, _, size = layout.partition(":")
+    if kind != "tiled" or not size.isdigit() or int(size) % 16:
+        raise ValueError(f"无效的分块方式: {layout}（应为striped或tiled:<16的倍数>）")
+    return int(size)
+
+
+def _texture(rng, height, width, bands):
+    """生成低频纹理加噪声的浮点影像，取值范围[0, 1]"""
+    layers = []
+    for _ in range(bands):
+        # 小尺寸随机场放大得到平滑的地物纹理
+        coarse = rng.random((max(2, height // 64), max(2, width // 64)), dtype=np.float32)
+        layer = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+        layer += rng.normal(0.0, 0.03, (height, width)).astype(np.float32)
+        layers.append(layer)
+    image = np.dstack(layers) if bands > 1 else layers[0][..., None]
+    return np.clip(image, 0.0, 1.0)
+
+
+def _change_mask(rng, height, width, changes):
+    """在随机位置生成矩形和椭圆变化区域，返回uint8标签（变化为255）"""
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for _ in range(changes):
+        w = int(rng.integers(max(4, width // 40), max(5, width // 8)))
+        h = int(rng.integers(max(4, height // 40), max(5, height // 8)))
+        x = int(rng.integers(0, max(1, width - w)))
+        y = int(rng.integers(0, max(1, height - h)))
+        if rng.random() < 0.5:
+            cv2.rectangle(mask, (x, y), (x + w, y + h), 255, -1)
+        else:
+            cv2.ellipse(mask, (x + w // 2, y + h // 2), (w // 2, h // 2), float(rng.integers(0, 180)), 0, 360, 255, -1)
+    return mask
+
+
+def _to_dtype(image, dtype_name):
+    dtype, scale = DTYPES[dtype_name]
+    if dtype_name == "float32":
+        return image.astype(np.float32)
+    return np.round(image * scale).astype(dtype)
+
+
+def write_raster(path, array, block_layout="striped", georeferenced=True):
+    """
+    写入合成影像
+
+    .tif/.tiff使用GDAL写入，按block_layout设置分块并写入地理参考；其他格式使用OpenCV编码。
+
+    Args:
+        path: 输出路径
+        array: 形状为(H, W)或(H, W, 波段数)的数组，波段顺序为RGB
+        block_layout: 分块方式，见parse_block_layout
+        georeferenced: 是否写入地理变换和投影
+    """
+    if array.ndim == 2:
+        array = array[..., None]
+    height, width, bands = array.shape
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext in (".tif", ".tiff"):
+        from osgeo import gdal, osr
+
+        gdal_types = {np.dtype(np.uint8): gdal.GDT_Byte, np.dtype(np.uint16): gdal.GDT_UInt16,
+                      np.dtype(np.float32): gdal.GDT_Float32}
+        block = parse_block_layout(block_layout)
+        options = ["TILED=YES", f"BLOCKXSIZE={block}", f"BLOCKYSIZE={block}"] if block else ["TILED=NO"]
+        options.append("INTERLEAVE=PIXEL" if bands > 1 else "INTERLEAVE=BAND")
+        driver = gdal.GetDriverByName("GTiff")
+        ds = driver.Create(path, width, height, bands, gdal_types[array.dtype], options)
+        if georeferenced:
+            srs = osr.SpatialReference()
+            srs.ImportFromEPSG(SYNTHETIC_EPSG)
+            ds.SetGeoTransform(SYNTHETIC_GEOTRANSFORM)
+            ds.SetProjection(srs.ExportToWkt())
+        for band_idx in range(bands):
+            ds.GetRasterBand(band_idx + 1).WriteArray(array[:, :, band_idx])
+        ds.FlushCache()
+        ds = None
+        return
+
+    if array.dtype == np.float32:
+        raise ValueError(f"{ext}格式不支持float32，请使用GeoTIFF")
+    if bands not in (1, 3, 4):
+        raise ValueError(f"{ext}格式只支持1、3、4波段")
+    if bands >= 3:
+        order = cv2.COLOR_RGB2BGR if bands == 3 else cv2.COLOR_RGBA2BGRA
+        array = cv2.cvtColor(np.ascontiguousarray(array), order)
+    else:
+        array = array[:, :, 0]
+    ok, buffer = cv2.imencode(ext, array)
+    if not ok:
+        raise IOError(f"编码图像失败: {path}")
+    buffer.tofile(path)
+
+
+def generate_pair(output_dir, name="synthetic", width=1024, height=1024, bands=3, dtype="uint8",
+                  block_layout="striped", fmt="tif", changes=12, seed=0):
+    """
+    生成一组前后时相影像和变化标签
+
+    Args:
+        output_dir: 输出目录
+        name: 文件名前缀
+        width, height: 影像尺寸
+        bands: 波段数
+        dtype: 数据类型，见DTYPES
+        block_layout: GeoTIFF分块方式，见parse_block_layout
+        fmt: 影像格式扩展名（tif或png）
+        changes: 变化区域数量
+        seed: 随机种子，相同参数和种子生成相同的影像
+
+    Returns:
+        tuple: (前时相路径, 后时相路径, 标签路径)，标签固定为单波段uint8 PNG
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"不支持的数据类型: {dtype}（可选: {', '.join(DTYPES)}）")
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    before = _texture(rng, height, width, bands)
+    mask = _change_mask(rng, height, width, changes)
+    # 变化区域替换为另一种纹理并整体提亮，未变化区域只加入轻微的辐射差异
+    replacement = np.clip(_texture(rng, height, width, bands) * 0.6 + 0.4, 0.0, 1.0)
+    after = np.clip(before * 0.97 + 0.02 + rng.normal(0.0, 0.01, before.shape).astype(np.float32), 0.0, 1.0)
+    after[mask > 0] = replacement[mask > 0]
+
+    ext = "." + fmt.lstrip(".")
+    before_path = os.path.join(output_dir, f"{name}_A{ext}")
+    after_path = os.path.join(output_dir, f"{name}_B{ext}")
+    label_path = os.path.join(output_dir, f"{name}_label.png")
+    write_raster(before_path, _to_dtype(before, dtype), block_layout)
+    write_raster(after_path, _to_dtype(after, dtype), block_layout)
+    write_raster(label_path, mask)
+    return before_path, after_path, label_path
+
+
+
+def generate_dataset(root, count=8, width=512, height=512, bands=3, dtype="uint8", fmt="png", seed=0):
+    """
+    生成LEVIR-CD格式的合成数据集（A/、B/、label/三个目录，同名文件一一对应）
+
+    Args:
+        root: 数据集根目录
+        count: 影像对数量
+        其余参数同generate_pair
+
+    Returns:
+        str: 数据集根目录
+    """
+    for subdir in ("A", "B", "label"):
+        os.makedirs(os.path.join(root, subdir), exist_ok=True)
+    ext = "." + fmt.lstrip(".")
+    for index in range(count):
+        name = f"pair_{index:04d}"
+        before, after, label = generate_pair(root, name, width, height, bands, dtype, fmt=fmt, seed=seed + index)
+        os.replace(before, os.path.join(root, "A", name + ext))
+        os.replace(after, os.path.join(root, "B", name + ext))
+        os.replace(label, os.path.join(root, "label", name + ".png"))
+    return root
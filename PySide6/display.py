@@ -4,14 +4,19 @@ import logging
 from datetime import datetime
 from PySide6.QtWidgets import QFileDialog, QLabel, QMessageBox, QInputDialog, QApplication, QTextEdit, QScrollBar, QDialog, QVBoxLayout, QPushButton, QGridLayout
 from PySide6.QtGui import QPixmap, QImage, QPainter, Qt, QWheelEvent, QMouseEvent, QResizeEvent
-from PySide6.QtCore import QEvent, Qt, QPoint
-import os
+from PySide6.QtCore import QEvent, Qt, QPoint, Signal
 import tempfile
 from PIL import Image
 from pathlib import Path
 
+from log_sink import UiLogSink, setup_log_sink
+from function.trace_events import traced
+
 class ZoomableLabel(QLabel):#定义图像为缩放的标签类
     """可缩放的标签类，支持鼠标滚轮缩放图像和拖动"""
+    # 选择模式下完成框选时发出，参数为原始图像坐标(x, y, 宽度, 高度)
+    selection_finished = Signal(object)
+
     def __init__(self, text="", parent=None):
         super().__init__(text, parent)
         self.original_pixmap = None
@@ -49,6 +54,34 @@ class ZoomableLabel(QLabel):#定义图像为缩放的标签类
         self.selection_active = False  # 重置选择状态
         self.update_display()
 
+    def replace_pixmap(self, pixmap):
+        """替换图像但保留当前的缩放和平移，用于同尺寸图像的重新着色（如调整阈值）"""
+        if self.original_pixmap is None or pixmap.size() != self.original_pixmap.size():
+            self.set_pixmap(pixmap)
+            return
+        self.original_pixmap = pixmap
+        self.update_display()
+
+    def release_resources(self):
+        """
+        释放原始图像和显示用的缓存图像
+
+        Returns:
+            int: 释放的内存字节数
+        """
+        freed = 0
+        for pixmap in (self.original_pixmap, self.pixmap()):
+            if pixmap is not None and not pixmap.isNull():
+                freed += pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        self.original_pixmap = None
+        self.current_pixmap_size = None
+        self.selection_active = False
+        self.selection_mode = False
+        self.selecting = False
+        self.setCursor(Qt.ArrowCursor)
+        super().clear()
+        return freed
+
     def reset_view(self):
         """重置视图到原始状态"""
         if self.original_pixmap:
@@ -64,14 +97,14 @@ class ZoomableLabel(QLabel):#定义图像为缩放的标签类
             self.selection_mode = True
             self.selection_active = False
             self.setCursor(Qt.CrossCursor)  # 设置十字光标
-            self.update()  # 更新显示
+            self.update_display()  # 清除之前的选择框
 
     def exit_selection_mode(self):
         """退出区域选择模式"""
         self.selection_mode = False
         self.selecting = False
         self.setCursor(Qt.ArrowCursor)  # 恢复默认光标
-        self.update()  # 更新显示
+        self.update_display()  # 更新显示
 
     def get_selected_area(self):
         """获取选择区域在原始图像上的坐标
@@ -160,6 +193,7 @@ class ZoomableLabel(QLabel):#定义图像为缩放的标签类
             
             return (orig_x, orig_y, orig_width, orig_height)
 
+    @traced("ZoomableLabel.update_display", "paint")
     def update_display(self):
         """更新显示，根据当前缩放因子和偏移量重新绘制图像"""
         if not self.original_pixmap:
@@ -294,7 +328,7 @@ class ZoomableLabel(QLabel):#定义图像为缩放的标签类
                         self.selection_active = True
                         self.selection_start = mouse_event.position().toPoint()
                         self.selection_end = self.selection_start  # 初始化为相同点
-                        self.update()  # 更新显示
+                        self.update_display()  # 重绘选择框
                         return True
                     elif self.can_drag():
                         # 在非选择模式下，如果可以拖动图像，开始拖动
@@ -310,7 +344,7 @@ class ZoomableLabel(QLabel):#定义图像为缩放的标签类
                 if self.selecting:
                     # 更新选择区域的结束点
                     self.selection_end = mouse_event.position().toPoint()
-                    self.update()  # 更新显示
+                    self.update_display()  # 重绘选择框
                     return True
                 elif self.dragging:
                     # 计算鼠标移动的距离
@@ -339,7 +373,12 @@ class ZoomableLabel(QLabel):#定义图像为缩放的标签类
                         if self.selection_start.x() == self.selection_end.x() and self.selection_start.y() == self.selection_end.y():
                             self.selection_active = False
                         
-                        self.update()  # 更新显示
+                        self.update_display()  # 重绘选择框
+                        
+                        # 通知使用选择区域的功能（如区域检测）
+                        area = self.get_selected_area()
+                        if area and area[2] > 0 and area[3] > 0:
+                            self.selection_finished.emit(area)
                         return True
                     elif self.dragging:
                         self.dragging = False
@@ -395,6 +434,9 @@ class NavigationFunctions:
         # 初始化日志时间
         self.log_start_time = datetime.now()
         
+        # 界面日志缓冲，消息按定时器批量刷新到日志控件
+        self.ui_log = UiLogSink(text_log) if text_log is not None else None
+        
         # 记录启动时间
         self.log_message("NavigationFunctions模块已初始化")
         
@@ -417,69 +459,31 @@ class NavigationFunctions:
             pass
     
     def setup_logging(self):
-        """设置日志系统"""
+        """设置日志系统（文件写入在后台线程中进行）"""
         try:
-            # 确保日志目录存在
-            log_dir = "logs"
-            if not os.path.exists(log_dir):
-                os.makedirs(log_dir)
-                
-            # 创建一个带有时间戳的日志文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_file = os.path.join(log_dir, f"log_{timestamp}.txt")
-            
-            # 配置日志
-            logging.basicConfig(
-                filename=log_file,
-                level=logging.INFO,
-                format='%(asctime)s - %(levelname)s - %(message)s',
-                encoding='utf-8'
-            )
+            log_file = setup_log_sink()
             
             # 记录日志系统启动
-            self.log_message("=== 日志系统已启动 ===")
+            self.log_message(f"=== 日志系统已启动: {log_file} ===")
             
         except Exception as e:
             # 如果设置日志系统失败，仍然能够在UI中记录消息
-            if self.text_log:
-                self.text_log.append(f"设置日志系统失败: {str(e)}")
+            if self.ui_log:
+                self.ui_log.append(f"设置日志系统失败: {str(e)}", logging.ERROR)
     
-    def log_message(self, message):
-        """记录消息到日志文件和界面"""
-        try:
-            # 记录到日志文件
-            logging.info(message)
-            
-            # 记录到UI
-            if self.text_log:
-                # 记录消息前确保文本使用正确的颜色
-                if hasattr(self, 'is_dark_theme'):
-                    try:
-                        from theme_manager import ThemeManager
-                        # 根据主题获取正确的文本颜色
-                        colors = ThemeManager.get_colors(self.is_dark_theme)
-                        text_color = colors["text"]
-                        # 使用HTML格式应用文本颜色
-                        formatted_message = f"<span style='color:{text_color};'>{message}</span>"
-                        # 添加格式化后的消息
-                        self.text_log.append(formatted_message)
-                    except Exception as e:
-                        # 如果设置颜色失败，不影响主流程，使用默认文本添加
-                        print(f"设置文本颜色失败: {str(e)}")
-                        self.text_log.append(message)
-                else:
-                    # 如果没有主题属性，使用默认文本添加
-                    self.text_log.append(message)
-                
-                # 自动滚动到底部
-                self.text_log.verticalScrollBar().setValue(self.text_log.verticalScrollBar().maximum())
-        except Exception as e:
-            # 如果记录消息失败，至少尝试在UI中显示
-            if self.text_log:
-                self.text_log.append(f"记录消息失败: {str(e)}")
-                self.text_log.append(f"原始消息: {message}")
-                # 自动滚动到底部
-                self.text_log.verticalScrollBar().setValue(self.text_log.verticalScrollBar().maximum())
+    def log_message(self, message, level=logging.INFO):
+        """
+        记录消息到日志文件和界面
+        
+        文件写入由后台线程完成，界面消息由UiLogSink定时批量刷新，可在任意线程调用。
+        
+        Args:
+            message: 日志内容
+            level: 日志级别，逐块处理等细节信息使用logging.DEBUG，默认不显示在界面上
+        """
+        logging.log(level, message)
+        if self.ui_log:
+            self.ui_log.append(message, level)
     
     def update_image_display(self, is_before=None):
         """
@@ -0,0 +1,98 @@
+"""
+会话资源登记模块 - 记录本次运行产生的文件和占用内存的对象，清空界面时统一释放
+
+登记的对象需实现release_resources()方法，释放缓存的图像、缓冲区或线程池状态，
+并返回释放的内存字节数（无法估计时返回0）。对象以弱引用保存，登记不会延长其生命周期。
+"""
+import logging
+import os
+import threading
+import weakref
+
+from .workspace import get_workspace
+
+
+def image_nbytes(image):
+    """估算QImage/QPixmap占用的内存字节数"""
+    if image is None or image.isNull():
+        return 0
+    return image.width() * image.height() * max(image.depth(), 8) // 8
+
+
+class ArtifactRegistry:
+    """本次会话产生的资源登记表"""
+
+    def __init__(self):
+        self._files = []
+        self._releasables = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def track_file(self, path):
+        """登记本次会话生成的中间文件"""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._files:
+                self._files.append(path)
+
+    def untrack_file(self, path):
+        """取消登记（如文件已被导出为正式结果）"""
+        with self._lock:
+            try:
+                self._files.remove(os.path.abspath(path))
+            except ValueError:
+                pass
+
+    def track(self, obj):
+        """登记实现了release_resources()的对象"""
+        with self._lock:
+            self._releasables.add(obj)
+        return obj
+
+    def release_all(self):
+        """
+        释放本次会话登记的全部资源
+
+        Returns:
+            dict: {"memory_bytes": 释放的内存, "disk_bytes": 释放的磁盘空间,
+                   "files": 删除的文件数, "objects": 释放的对象数}
+        """
+        with self._lock:
+            files = list(self._files)
+            self._files.clear()
+            releasables = list(self._releasables)
+
+        report = {"memory_bytes": 0, "disk_bytes": 0, "files": 0, "objects": 0}
+        for obj in releasables:
+            try:
+                report["memory_bytes"] += obj.release_resources() or 0
+                report["objects"] += 1
+            except Exception as e:
+                logging.warning(f"释放资源失败: {obj!r}, 错误: {str(e)}")
+
+        workspace = get_workspace()
+        for path in files:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            # 工作空间中的文件通过工作空间删除，同时更新其空间统计
+            freed = workspace.remove(path)
+            if not freed and os.path.exists(path):
+                try:
+                    os.remove(path)
+                    freed = size
+                except OSError as e:
+                    logging.warning(f"删除临时文件失败: {path}, 错误: {str(e)}")
+                    continue
+            report["disk_bytes"] += freed
+            report["files"] += 1
+            logging.info(f"已删除临时文件: {path}")
+        return report
+
+
+_registry = ArtifactRegistry()
+
+
+def get_artifact_registry():
+    """获取进程共享的会话资源登记表"""
+    return _registry
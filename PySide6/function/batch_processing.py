@@ -1,12 +1,13 @@
 import os
+import re
+import time
 import traceback
-from pathlib import Path
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, 
     QGridLayout, QFileDialog, QProgressBar, QListWidget, 
-    QTabWidget, QWidget, QMessageBox, QSplitter, QComboBox
+    QTabWidget, QWidget, QMessageBox, QSplitter, QComboBox, QLineEdit
 )
-from PySide6.QtCore import Qt, Signal, QSize, QThread, QObject
+from PySide6.QtCore import Qt, Signal, QSize, QThread, QObject, QTimer
 from PySide6.QtGui import QFont, QIcon, QPixmap, QCursor
 
 try:
@@ -15,6 +16,14 @@ except ImportError:
     # 尝试直接导入
     from theme_manager import ThemeManager
 
+from .thumbnail_service import ThumbnailGridView, get_thumbnail_service
+from .directory_index import DirectoryIndex, DirectoryScanThread, PairingRule, pair_indexes
+from .watch_folder import WatchFolderIngest, WatchFolderController
+from .detection_pool import DetectionWorkerPool
+from .job_manifest import JobManifest
+from .result_packager import ResultPackager, archive_format
+from .telemetry import get_telemetry
+
 class BatchProcessingDialog(QDialog):
     """批量化影像变化检测对话框"""
     
@@ -39,6 +48,24 @@ class BatchProcessingDialog(QDialog):
         self.output_dir = ""
         self.before_images = []
         self.after_images = []
+        self.image_pairs = []  # [(配对键, 前时相路径, 后时相路径)]
+        self.watch_controller = None
+        
+        # 批量作业：作业清单记录每组影像的处理状态，中断后可继续
+        self.manifest = None
+        self.detection_pool = None
+        self.batch_running = False
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setSingleShot(True)
+        self.retry_timer.timeout.connect(self._dispatch_batch)
+        self.packager = None
+        
+        # 目录索引，重新扫描时只处理变化的文件
+        self.before_index = None
+        self.after_index = None
+        self.scan_threads = {}
+        # 扫描进行中又选择了目录时，记录最新的(目录, 是否强制)，当前扫描结束后再扫描
+        self.pending_scans = {}
         
     def init_ui(self):
         """初始化用户界面"""
@@ -89,25 +116,35 @@ class BatchProcessingDialog(QDialog):
         
         # 创建按钮
         self.start_button = QPushButton("开始执行")
+        self.watch_button = QPushButton("开始监控")
         self.cancel_button = QPushButton("取消")
         self.start_button.setStyleSheet(ThemeManager.get_primary_button_style(self.is_dark_theme))
+        self.watch_button.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
         self.cancel_button.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
         
         # 设置按钮尺寸
         self.start_button.setFixedSize(120, 32)
+        self.watch_button.setFixedSize(120, 32)
         self.cancel_button.setFixedSize(120, 32)
         
         # 设置按钮字体
         self.start_button.setFont(QFont("Microsoft YaHei UI", 9))
+        self.watch_button.setFont(QFont("Microsoft YaHei UI", 9))
         self.cancel_button.setFont(QFont("Microsoft YaHei UI", 9))
         
         # 连接信号
         self.cancel_button.clicked.connect(self.reject)
         self.start_button.clicked.connect(self.start_batch_processing)
+        self.watch_button.clicked.connect(self.toggle_watch_mode)
+        # 对话框关闭时停止目录监控和批量作业
+        self.finished.connect(self.stop_watch_mode)
+        self.finished.connect(self.stop_batch_processing)
+        self.finished.connect(self.stop_packaging)
         
         # 添加按钮到底部布局
         bottom_layout.addStretch()
         bottom_layout.addWidget(self.start_button)
+        bottom_layout.addWidget(self.watch_button)
         bottom_layout.addWidget(self.cancel_button)
         
         # 添加底部布局到主布局
@@ -160,6 +197,25 @@ class BatchProcessingDialog(QDialog):
         options_layout.addWidget(grid_label, 0, 0)
         options_layout.addWidget(self.grid_size_combo, 0, 1)
         
+        # 影像配对选项
+        pairing_label = QLabel("影像配对方式:")
+        self.pairing_combo = QComboBox()
+        self.pairing_combo.addItem("文件名一致", "stem")
+        self.pairing_combo.addItem("正则提取", "regex")
+        self.pairing_combo.addItem("忽略日期标记", "date")
+        self.pairing_pattern_edit = QLineEdit()
+        self.pairing_pattern_edit.setPlaceholderText(r"正则表达式，如 (?P<key>tile_\d+)")
+        self.pairing_pattern_edit.setEnabled(False)
+        options_layout.addWidget(pairing_label, 1, 0)
+        options_layout.addWidget(self.pairing_combo, 1, 1)
+        options_layout.addWidget(self.pairing_pattern_edit, 1, 2)
+        
+        # 配对统计和重新扫描
+        self.pairing_status_label = QLabel("未配对")
+        self.rescan_button = QPushButton("重新扫描")
+        options_layout.addWidget(self.pairing_status_label, 2, 0, 1, 2)
+        options_layout.addWidget(self.rescan_button, 2, 2)
+        
         # 添加所有布局到主布局
         layout.addLayout(before_layout)
         layout.addLayout(after_layout)
@@ -171,11 +227,15 @@ class BatchProcessingDialog(QDialog):
         self.before_dir_button.clicked.connect(self.select_before_dir)
         self.after_dir_button.clicked.connect(self.select_after_dir)
         self.output_dir_button.clicked.connect(self.select_output_dir)
+        self.pairing_combo.currentIndexChanged.connect(self.on_pairing_changed)
+        self.pairing_pattern_edit.editingFinished.connect(self.update_pairs)
+        self.rescan_button.clicked.connect(self.rescan_directories)
         
         # 设置按钮样式
         self.before_dir_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         self.after_dir_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         self.output_dir_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
+        self.rescan_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         
     def init_process_tab(self):
         """初始化任务处理选项卡"""
@@ -239,6 +299,11 @@ class BatchProcessingDialog(QDialog):
         result_layout.addLayout(list_layout, 1)
         result_layout.addLayout(preview_layout, 2)
         
+        # 创建结果缩略图条，只为可见的结果生成缩略图
+        self.result_thumbnails = ThumbnailGridView(max_edge=96, wrapping=False)
+        self.result_thumbnails.setFixedHeight(140)
+        self.result_thumbnails.setStyleSheet(ThemeManager.get_list_widget_style(self.is_dark_theme))
+        
         # 创建操作按钮
         button_layout = QHBoxLayout()
         self.open_folder_button = QPushButton("打开输出文件夹")
@@ -253,11 +318,20 @@ class BatchProcessingDialog(QDialog):
         
         # 添加到主布局
         layout.addLayout(result_layout)
+        layout.addWidget(self.result_thumbnails)
         layout.addLayout(button_layout)
         
         # 连接信号
         self.open_folder_button.clicked.connect(self.open_output_folder)
         self.export_all_button.clicked.connect(self.export_all_results)
+        self.result_list.currentRowChanged.connect(self.on_result_selected)
+        self.result_thumbnails.thumbnail_activated.connect(
+            lambda row, path: self.result_list.setCurrentRow(row))
+        
+        # 预览使用较大边长的缩略图，就绪后再刷新预览区域
+        self.preview_service = get_thumbnail_service(512)
+        self.preview_service.thumbnail_ready.connect(self._on_preview_ready)
+        self.result_files = []
         
     def apply_theme(self):
         """应用当前主题到对话框"""
@@ -298,13 +372,16 @@ class BatchProcessingDialog(QDialog):
         self.log_list.setStyleSheet(ThemeManager.get_log_text_style(self.is_dark_theme))
         self.result_list.setStyleSheet(ThemeManager.get_list_widget_style(self.is_dark_theme))
         self.preview_label.setStyleSheet(ThemeManager.get_image_label_style(self.is_dark_theme))
+        self.result_thumbnails.setStyleSheet(ThemeManager.get_list_widget_style(self.is_dark_theme))
         
         # 更新按钮样式
         self.start_button.setStyleSheet(ThemeManager.get_primary_button_style(self.is_dark_theme))
         self.cancel_button.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
+        self.watch_button.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
         self.before_dir_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         self.after_dir_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         self.output_dir_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
+        self.rescan_button.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         self.open_folder_button.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
         self.export_all_button.setStyleSheet(ThemeManager.get_primary_button_style(self.is_dark_theme))
         
@@ -331,26 +408,161 @@ class BatchProcessingDialog(QDialog):
             self.output_dir = directory
             self.output_dir_label.setText(directory)
             
-    def scan_directory(self, directory, is_before=True):
-        """扫描目录中的图像文件"""
+            # 输出目录中有作业清单时直接从清单读取结果，无需重新扫描目录
+            if JobManifest.exists(directory):
+                try:
+                    manifest = JobManifest(JobManifest.path_for(directory))
+                    try:
+                        summary = manifest.summary()
+                        self.set_result_files(manifest.completed_outputs())
+                    finally:
+                        manifest.close()
+                    self.add_log(f"读取作业清单: 共 {summary['total']} 组，已完成 {summary[JobManifest.DONE]} 组，"
+                                 f"失败 {summary[JobManifest.FAILED]} 组")
+                    return
+                except Exception as e:
+                    self.add_log(f"读取作业清单出错: {str(e)}")
+            
+            # 列出输出目录中已有的结果，便于浏览之前的处理结果
+            try:
+                image_extensions = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+                with os.scandir(directory) as entries:
+                    results = sorted(entry.path for entry in entries
+                                     if entry.is_file() and entry.name.lower().endswith(image_extensions))
+                self.set_result_files(results)
+            except OSError as e:
+                self.add_log(f"读取输出目录出错: {str(e)}")
+            
+    def set_result_files(self, paths):
+        """设置结果查看选项卡中显示的结果文件"""
+        self.result_files = list(paths)
+        self.result_list.clear()
+        self.result_list.addItems([os.path.basename(path) for path in self.result_files])
+        self.result_thumbnails.set_paths(self.result_files)
+        self.preview_label.setText("选择文件以预览")
+        
+    def on_result_selected(self, row):
+        """选中结果文件时显示其缩略图预览"""
+        if row < 0 or row >= len(self.result_files):
+            return
+        self.result_thumbnails.select_row(row)
+        image = self.preview_service.thumbnail(self.result_files[row])
+        if image is None:
+            self.preview_label.setText("正在生成预览...")
+        else:
+            self._show_preview(image)
+            
+    def _on_preview_ready(self, path, image):
+        """预览缩略图生成完成"""
+        row = self.result_list.currentRow()
+        if 0 <= row < len(self.result_files) and self.result_files[row] == path:
+            self._show_preview(image)
+            
+    def _show_preview(self, image):
+        if image.isNull():
+            self.preview_label.setText("无法预览该文件")
+        else:
+            pixmap = QPixmap.fromImage(image)
+            self.preview_label.setPixmap(pixmap.scaled(self.preview_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            
+    def scan_directory(self, directory, is_before=True, force=False):
+        """
+        在后台线程中扫描目录中的图像文件
+        
+        Args:
+            directory: 影像目录
+            is_before: 是否为前时相目录
+            force: 是否忽略已有索引重新扫描全部文件
+        """
         try:
-            image_extensions = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
-            images = []
+            # 该时相已有扫描在进行时不重复启动，记录下来等当前扫描结束后再扫描
+            running = self.scan_threads.get(is_before)
+            if running is not None and running.isRunning():
+                pending = self.pending_scans.get(is_before)
+                self.pending_scans[is_before] = (directory, force or (pending is not None and pending[1]))
+                return
+            self.pending_scans.pop(is_before, None)
             
-            for ext in image_extensions:
-                images.extend(list(Path(directory).glob(f"*{ext}")))
-                images.extend(list(Path(directory).glob(f"*{ext.upper()}")))
+            # 同一目录复用已有索引，重新扫描时只stat变化的文件
+            index = self.before_index if is_before else self.after_index
+            if index is None or index.directory != directory:
+                index = DirectoryIndex(directory)
+                if is_before:
+                    self.before_index = index
+                else:
+                    self.after_index = index
             
-            if is_before:
-                self.before_images = images
-                self.add_log(f"发现 {len(images)} 个前时相影像文件")
-            else:
-                self.after_images = images
-                self.add_log(f"发现 {len(images)} 个后时相影像文件")
+            thread = DirectoryScanThread(index, force, self)
+            thread.scanned.connect(lambda idx, changed, b=is_before: self.on_directory_scanned(idx, changed, b))
+            thread.failed.connect(lambda idx, error: self.add_log(f"扫描目录出错: {error}"))
+            thread.finished.connect(lambda b=is_before, t=thread: self._on_scan_thread_finished(b, t))
+            self.scan_threads[is_before] = thread
+            self.add_log(f"正在扫描{'前' if is_before else '后'}时相影像目录: {directory}")
+            thread.start()
                 
         except Exception as e:
             self.add_log(f"扫描目录出错: {str(e)}")
             
+    def _on_scan_thread_finished(self, is_before, thread):
+        """扫描线程结束，扫描期间选择了新目录时接着扫描"""
+        if self.scan_threads.get(is_before) is thread:
+            del self.scan_threads[is_before]
+        pending = self.pending_scans.pop(is_before, None)
+        if pending is not None:
+            self.scan_directory(pending[0], is_before, pending[1])
+            
+    def on_directory_scanned(self, index, changed, is_before):
+        """目录扫描完成"""
+        # 扫描期间用户可能已切换到其他目录，忽略过期的结果（切换后的目录会接着扫描）
+        if index is not (self.before_index if is_before else self.after_index) or is_before in self.pending_scans:
+            return
+        
+        images = index.files()
+        if is_before:
+            self.before_images = images
+            self.add_log(f"发现 {len(images)} 个前时相影像文件（本次读取 {index.last_stat_count} 个文件属性）")
+        else:
+            self.after_images = images
+            self.add_log(f"发现 {len(images)} 个后时相影像文件（本次读取 {index.last_stat_count} 个文件属性）")
+        
+        if changed or not self.image_pairs:
+            self.update_pairs()
+            
+    def rescan_directories(self):
+        """增量重新扫描前后时相目录"""
+        if self.before_image_dir:
+            self.scan_directory(self.before_image_dir, is_before=True)
+        if self.after_image_dir:
+            self.scan_directory(self.after_image_dir, is_before=False)
+            
+    def on_pairing_changed(self):
+        """切换配对方式"""
+        self.pairing_pattern_edit.setEnabled(self.pairing_combo.currentData() == "regex")
+        self.update_pairs()
+        
+    def current_pairing_rule(self):
+        """根据界面设置创建配对规则"""
+        mode = self.pairing_combo.currentData()
+        pattern = self.pairing_pattern_edit.text().strip() if mode == "regex" else None
+        return PairingRule(mode, pattern)
+        
+    def update_pairs(self):
+        """按当前配对规则重新配对前后时相影像，无需重新扫描目录"""
+        if self.before_index is None or self.after_index is None:
+            return
+        try:
+            rule = self.current_pairing_rule()
+        except (ValueError, re.error) as e:
+            self.pairing_status_label.setText(f"配对规则无效: {str(e)}")
+            return
+        
+        self.image_pairs, before_unmatched, after_unmatched = pair_indexes(
+            self.before_index, self.after_index, rule)
+        status = (f"已配对 {len(self.image_pairs)} 组，"
+                  f"未配对前时相 {len(before_unmatched)} 个，未配对后时相 {len(after_unmatched)} 个")
+        self.pairing_status_label.setText(status)
+        self.add_log(status)
+            
     def add_log(self, message):
         """添加日志到日志列表"""
         self.log_list.addItem(message)
@@ -367,11 +579,196 @@ class BatchProcessingDialog(QDialog):
             QMessageBox.warning(self, "警告", "没有找到可处理的影像文件")
             return
             
-        # TODO: 实现批量处理逻辑
-        self.add_log("开始批量处理...")
+        if not self.image_pairs:
+            QMessageBox.warning(self, "警告", "没有配对成功的前后时相影像，请检查配对方式")
+            return
+            
+        if self.batch_running:
+            return
+        
+        try:
+            self.open_manifest()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法创建作业清单: {str(e)}")
+            return
+        
+        output_dir = self.output_dir
+        stats = self.manifest.sync_pairs(
+            self.image_pairs, lambda key: os.path.join(output_dir, f"{key}_change.png"))
+        self.add_log(f"开始批量处理: 新增 {stats['added']} 组，需重新处理 {stats['reset']} 组，"
+                     f"跳过已完成 {stats['skipped']} 组，移除不再配对的 {stats['removed']} 组")
+        
+        if self.detection_pool is None:
+            self.detection_pool = DetectionWorkerPool(parent=self)
+            self.detection_pool.finished.connect(self.on_batch_pair_finished)
+            self.detection_pool.failed.connect(self.on_batch_pair_failed)
+        
+        self.batch_running = True
+        self.start_button.setEnabled(False)
+        self.watch_button.setEnabled(False)
+        self.set_result_files(self.manifest.completed_outputs())
+        self.update_batch_progress()
         
         # 切换到处理选项卡
         self.tab_widget.setCurrentIndex(1)
+        self._dispatch_batch()
+        
+    def open_manifest(self):
+        """
+        打开输出目录中的作业清单
+        
+        输入目录或配对规则与清单中记录的不同时视为新作业，清空原有记录；
+        相同时恢复上次中断的作业。
+        """
+        if self.manifest is not None and self.manifest.db_path == JobManifest.path_for(self.output_dir):
+            manifest = self.manifest
+        else:
+            if self.manifest is not None:
+                self.manifest.close()
+            os.makedirs(self.output_dir, exist_ok=True)
+            manifest = JobManifest(JobManifest.path_for(self.output_dir))
+            self.manifest = manifest
+        
+        meta = {
+            "before_dir": os.path.abspath(self.before_image_dir),
+            "after_dir": os.path.abspath(self.after_image_dir),
+            "pairing_mode": self.pairing_combo.currentData(),
+            "pairing_pattern": self.pairing_pattern_edit.text().strip(),
+        }
+        if manifest.get_meta() != meta:
+            manifest.reset()
+            manifest.set_meta(meta)
+        else:
+            recovered = manifest.recover()
+            if recovered:
+                self.add_log(f"恢复上次中断的 {recovered} 组影像")
+        
+    def _dispatch_batch(self):
+        """按检测线程池的空闲程度从作业清单中取出影像对提交"""
+        if not self.batch_running:
+            return
+        capacity = self.detection_pool.max_workers * 2 - self.detection_pool.in_flight
+        if capacity > 0:
+            for row in self.manifest.next_ready(capacity):
+                self.manifest.mark_running(row["pair_key"])
+                self.detection_pool.submit(row["pair_key"], row["before_path"], row["after_path"],
+                                           row["output_path"], fingerprint=True)
+        
+        if self.detection_pool.in_flight == 0:
+            # 没有执行中的任务时，等待最早一次重试；没有可重试的影像对则作业结束
+            retry_at = self.manifest.next_retry_time()
+            if retry_at is None:
+                self.finish_batch_processing()
+            else:
+                delay = max(0.0, retry_at - time.time())
+                self.add_log(f"{delay:.0f} 秒后重试失败的影像对")
+                self.retry_timer.start(int(delay * 1000) + 50)
+                
+    def on_batch_pair_finished(self, key, output_path, elapsed, fingerprints):
+        """批量作业中一组影像检测完成"""
+        if self.manifest is None:
+            return
+        model = self.detection_pool.model.description
+        self.manifest.mark_done(key, output_path, elapsed, fingerprints, model)
+        self.add_log(f"检测完成 [{key}]: {os.path.basename(output_path)}（{model}），耗时 {elapsed:.2f} 秒")
+        self.result_files.append(output_path)
+        self.result_list.addItem(os.path.basename(output_path))
+        self.result_thumbnails.append_paths([output_path])
+        self.update_batch_progress()
+        self._dispatch_batch()
+        
+    def on_batch_pair_failed(self, key, error):
+        """批量作业中一组影像检测失败"""
+        if self.manifest is None:
+            return
+        self.manifest.mark_failed(key, error)
+        self.add_log(f"检测失败 [{key}]: {error.splitlines()[0]}")
+        self.update_batch_progress()
+        self._dispatch_batch()
+        
+    def update_batch_progress(self):
+        """根据作业清单更新进度条"""
+        summary = self.manifest.summary()
+        total = summary["total"]
+        finished = summary[JobManifest.DONE] + summary["exhausted"]
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(finished)
+        self.progress_bar.setFormat(f"%v/%m（失败 {summary[JobManifest.FAILED]} 组）")
+        
+    def finish_batch_processing(self):
+        """批量作业结束"""
+        self.batch_running = False
+        self.start_button.setEnabled(True)
+        self.watch_button.setEnabled(True)
+        summary = self.manifest.summary()
+        self.add_log(f"批量处理完成: 成功 {summary[JobManifest.DONE]} 组，"
+                     f"失败 {summary['exhausted']} 组（已达最大重试次数）")
+        self.set_result_files(self.manifest.completed_outputs())
+        
+        # 作业结束时立即导出一次汇总，不等待定时导出
+        try:
+            get_telemetry().export_prometheus()
+        except OSError as e:
+            self.add_log(f"导出性能指标出错: {str(e)}")
+        
+    def stop_batch_processing(self):
+        """停止批量作业，未开始的影像对保留在作业清单中，下次继续处理"""
+        self.retry_timer.stop()
+        if self.detection_pool is not None:
+            self.detection_pool.cancel_pending()
+            self.detection_pool.wait_for_done()
+        self.batch_running = False
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+        
+    def toggle_watch_mode(self):
+        """开始或停止目录监控模式"""
+        if self.watch_controller is not None and self.watch_controller.is_running():
+            self.stop_watch_mode()
+            return
+        
+        if not self.before_image_dir or not self.after_image_dir or not self.output_dir:
+            QMessageBox.warning(self, "警告", "请先选择前后时相影像目录和输出目录")
+            return
+        try:
+            rule = self.current_pairing_rule()
+        except (ValueError, re.error) as e:
+            QMessageBox.warning(self, "警告", f"配对规则无效: {str(e)}")
+            return
+        
+        ingest = WatchFolderIngest(self.before_image_dir, self.after_image_dir, self.output_dir, rule)
+        ingest.result_ready.connect(self.on_watch_result)
+        ingest.pair_failed.connect(lambda key, error: self.add_log(f"检测失败 [{key}]: {error.splitlines()[0]}"))
+        ingest.status_changed.connect(self.progress_bar.setFormat)
+        
+        self.watch_controller = WatchFolderController(ingest, self)
+        self.watch_controller.start()
+        
+        self.watch_button.setText("停止监控")
+        self.start_button.setEnabled(False)
+        self.progress_bar.setRange(0, 0)  # 持续监控，进度条显示为忙碌状态
+        self.progress_bar.setTextVisible(True)
+        self.add_log(f"已开始监控: {self.before_image_dir} 与 {self.after_image_dir}")
+        self.tab_widget.setCurrentIndex(1)
+        
+    def stop_watch_mode(self):
+        """停止目录监控模式"""
+        if self.watch_controller is None or not self.watch_controller.is_running():
+            return
+        self.watch_controller.stop()
+        self.watch_button.setText("开始监控")
+        self.start_button.setEnabled(True)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setFormat("%p%")
+        self.add_log("已停止目录监控")
+        
+    def on_watch_result(self, key, output_path):
+        """监控模式下一组影像检测完成"""
+        self.add_log(f"检测完成 [{key}]: {output_path}")
+        self.result_files.append(output_path)
+        self.result_list.addItem(os.path.basename(output_path))
+        self.result_thumbnails.append_paths([output_path])
         
     def open_output_folder(self):
         """打开输出文件夹"""
@@ -394,9 +791,72 @@ class BatchProcessingDialog(QDialog):
             QMessageBox.warning(self, "错误", f"无法打开文件夹: {str(e)}")
             
     def export_all_results(self):
-        """导出所有结果"""
-        # TODO: 实现导出所有结果的逻辑
-        self.add_log("导出所有结果...")
+        """将所有结果打包为压缩包：逐组COG、镶嵌影像、变化图斑矢量图层和汇总表"""
+        if self.packager is not None and self.packager.isRunning():
+            QMessageBox.information(self, "提示", "正在打包结果，请稍候")
+            return
+        
+        rows = self.completed_result_rows()
+        if not rows:
+            QMessageBox.warning(self, "警告", "没有可导出的结果")
+            return
+        
+        archive_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出全部结果", os.path.join(self.output_dir or "", "change_detection_results.zip"),
+            "ZIP压缩包 (*.zip);;TAR归档 (*.tar);;TAR.GZ压缩包 (*.tar.gz)")
+        if not archive_path:
+            return
+        if archive_format(archive_path) is None:
+            archive_path += re.search(r"\*(\.[\w.]+)\)", selected_filter).group(1) if selected_filter else ".zip"
+        
+        self.packager = ResultPackager(rows, archive_path, parent=self)
+        self.packager.progress.connect(self.on_packaging_progress)
+        self.packager.message.connect(self.add_log)
+        self.packager.finished_packaging.connect(self.on_packaging_finished)
+        self.packager.failed.connect(lambda error: self.add_log(f"导出结果出错: {error}"))
+        self.packager.finished.connect(lambda: self.export_all_button.setEnabled(True))
+        
+        self.export_all_button.setEnabled(False)
+        self.add_log(f"正在导出 {len(rows)} 组结果到: {archive_path}")
+        self.tab_widget.setCurrentIndex(1)
+        self.packager.start()
+        
+    def completed_result_rows(self):
+        """
+        获取需要导出的结果记录
+        
+        优先使用作业清单中的记录（含前时相影像路径，用于继承地理参考），
+        没有作业清单时使用结果列表中的文件。
+        """
+        if self.manifest is not None:
+            return [dict(row) for row in self.manifest.completed_rows()]
+        if self.output_dir and JobManifest.exists(self.output_dir):
+            manifest = JobManifest(JobManifest.path_for(self.output_dir))
+            try:
+                return [dict(row) for row in manifest.completed_rows()]
+            finally:
+                manifest.close()
+        return [{"pair_key": os.path.splitext(os.path.basename(path))[0], "before_path": None,
+                 "after_path": None, "output_path": path, "duration": None}
+                for path in self.result_files]
+        
+    def on_packaging_progress(self, done, total):
+        """更新打包进度"""
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat("打包中 %v/%m")
+        
+    def on_packaging_finished(self, archive_path):
+        """结果打包完成"""
+        size_mb = os.path.getsize(archive_path) / (1024 * 1024)
+        self.progress_bar.setFormat("%p%")
+        self.add_log(f"结果已导出到: {archive_path}（{size_mb:.1f} MB）")
+        
+    def stop_packaging(self):
+        """对话框关闭时中止正在进行的打包"""
+        if self.packager is not None and self.packager.isRunning():
+            self.packager.requestInterruption()
+            self.packager.wait()
 
 class BatchProcessing:
     """批量化影像变化检测功能模块"""
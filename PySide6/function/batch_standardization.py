@@ -0,0 +1,188 @@
+"""
+批量标准化模块 - 按同一尺寸规格并行标准化整个目录树
+
+每个文件在独立进程中通过resampling模块分块重采样，GeoTIFF重采样后按新尺寸调整地理变换
+（像元大小按缩放比例放大，左上角坐标不变），投影信息原样保留。输出文件比源文件新时
+视为已是最新，直接跳过，中断后重新运行只处理剩余文件。
+"""
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PySide6.QtCore import QThread, Signal
+
+from .resampling import resample_raster
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+# 与单文件标准化相同的输出命名，重新扫描源目录时据此排除已生成的结果
+OUTPUT_PATTERN = re.compile(r'_\d+x\d+_cliped$')
+
+
+def output_name(file_name, width, height):
+    """返回标准化结果的文件名，如image.tif -> image_256x256_cliped.tif"""
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem}_{width}x{height}_cliped{ext}"
+
+
+def plan_jobs(source_dir, width, height, output_dir=None, recursive=True):
+    """
+    列出目录树中需要标准化的文件
+
+    Args:
+        source_dir: 源目录
+        width, height: 目标尺寸
+        output_dir: 输出目录，按源目录的相对路径建立子目录；为None时保存在源文件旁边
+        recursive: 是否包含子目录
+
+    Returns:
+        list: [(源文件路径, 输出文件路径), ...]
+    """
+    jobs = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        if not recursive:
+            dirs.clear()
+        # 输出目录位于源目录内部时不重复处理其中的结果
+        if output_dir and os.path.commonpath([os.path.abspath(root), os.path.abspath(output_dir)]) == os.path.abspath(output_dir):
+            dirs.clear()
+            continue
+        target_dir = os.path.join(output_dir, os.path.relpath(root, source_dir)) if output_dir else root
+        for name in sorted(files):
+            stem, ext = os.path.splitext(name)
+            # 跳过之前的结果，以及被强行终止时残留的临时文件（*.part.tif）
+            if ext.lower() not in IMAGE_EXTENSIONS or OUTPUT_PATTERN.search(stem) or stem.endswith(".part"):
+                continue
+            jobs.append((os.path.join(root, name), os.path.normpath(os.path.join(target_dir, output_name(name, width, height)))))
+    return jobs
+
+
+def is_up_to_date(source_path, output_path):
+    """输出文件存在且不早于源文件时视为已是最新"""
+    try:
+        return os.path.getmtime(output_path) >= os.path.getmtime(source_path)
+    except OSError:
+        return False
+
+
+def standardize_file(source_path, output_path, width, height, kernel="lanczos"):
+    """
+    标准化单个文件，在工作进程中执行
+
+    结果先写入临时文件再重命名，中断时不会留下不完整的输出。
+
+    Returns:
+        dict: source、output、seconds、megapixels（源影像）、bytes_read、bytes_written
+    """
+    start = time.perf_counter()
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    root, ext = os.path.splitext(output_path)
+    temp_path = f"{root}.part{ext}"
+    try:
+        source_size = resample_raster(source_path, temp_path, width, height, kernel=kernel)["source_size"]
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return {
+        "source": source_path,
+        "output": output_path,
+        "seconds": time.perf_counter() - start,
+        "megapixels": source_size[0] * source_size[1] / 1e6,
+        "bytes_read": os.path.getsize(source_path),
+        "bytes_written": os.path.getsize(output_path),
+    }
+
+
+class BatchStandardizationThread(QThread):
+    """批量标准化线程
+
+    在进程池中并行处理文件，同时提交的任务数限制为进程数的两倍，
+    可随时取消，已完成的文件保留，再次运行时自动跳过。
+    """
+
+    progress = Signal(int, int)  # 已处理文件数, 总文件数
+    file_done = Signal(object)  # 单个文件的结果字典
+    message = Signal(str)
+    finished_standardization = Signal(object)  # 汇总字典
+
+    def __init__(self, jobs, width, height, max_workers=None, kernel="lanczos", parent=None):
+        """
+        初始化批量标准化线程
+
+        Args:
+            jobs: plan_jobs返回的(源文件, 输出文件)列表
+            width, height: 目标尺寸
+            max_workers: 进程数，默认为CPU核数减一
+            kernel: 重采样核函数，见resampling.KERNELS
+            parent: 父QObject
+        """
+        super().__init__(parent)
+        self.jobs = list(jobs)
+        self.width = width
+        self.height = height
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.kernel = kernel
+
+    def run(self):
+        start = time.perf_counter()
+        summary = {"total": len(self.jobs), "done": 0, "skipped": 0, "failed": 0,
+                   "megapixels": 0.0, "bytes_written": 0, "cancelled": False}
+        processed = 0
+        self.progress.emit(processed, summary["total"])
+
+        # 检查输出是否已是最新只需stat，在本线程中完成，不占用进程池
+        pending_jobs = []
+        for source_path, output_path in self.jobs:
+            if is_up_to_date(source_path, output_path):
+                summary["skipped"] += 1
+                processed += 1
+            else:
+                pending_jobs.append((source_path, output_path))
+        if summary["skipped"]:
+            self.message.emit(f"跳过 {summary['skipped']} 个已是最新的文件")
+            self.progress.emit(processed, summary["total"])
+
+        # GUI进程中已有Qt线程，使用spawn启动工作进程，避免fork复制线程状态
+        context = multiprocessing.get_context("spawn")
+        jobs = iter(pending_jobs)
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context) as executor:
+            pending = {}
+            while True:
+                while len(pending) < self.max_workers * 2 and not self.isInterruptionRequested():
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    future = executor.submit(standardize_file, job[0], job[1], self.width, self.height,
+                                             self.kernel)
+                    pending[future] = job
+                if self.isInterruptionRequested():
+                    # 取消尚未开始的任务，只等待正在执行的文件完成
+                    for future in [future for future in pending if future.cancel()]:
+                        pending.pop(future)
+                if not pending:
+                    break
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    source_path, _ = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        summary["failed"] += 1
+                        self.message.emit(f"标准化失败: {source_path}, 错误: {str(e)}")
+                    else:
+                        summary["done"] += 1
+                        summary["megapixels"] += result["megapixels"]
+                        summary["bytes_written"] += result["bytes_written"]
+                        self.file_done.emit(result)
+                    processed += 1
+                    self.progress.emit(processed, summary["total"])
+
+        summary["cancelled"] = self.isInterruptionRequested()
+        summary["seconds"] = time.perf_counter() - start
+        self.finished_standardization.emit(summary)
@@ -1,8 +1,8 @@
-import os
-import glob
 import logging
 from PySide6.QtWidgets import QLabel
 
+from .artifact_registry import get_artifact_registry
+
 class ClearTask:
     def __init__(self, navigation_functions, label_before, label_after, label_output, text_log):
         """
@@ -24,21 +24,24 @@ class ClearTask:
     def clear_interface(self):
         """清除界面显示的所有内容"""
         try:
-            # 清除图像显示
-            self.label_before.clear()
-            if isinstance(self.label_before, QLabel):
-                self.label_before.setText("前时相影像")
-                
-            self.label_after.clear()
-            if isinstance(self.label_after, QLabel):
-                self.label_after.setText("后时相影像")
-                
-            self.label_output.clear()
-            if isinstance(self.label_output, QLabel):
-                self.label_output.setText("解译结果")
+            # 释放图像显示占用的原始图像和显示缓存
+            freed_memory = 0
+            for label, text in ((self.label_before, "前时相影像"),
+                                (self.label_after, "后时相影像"),
+                                (self.label_output, "解译结果")):
+                if hasattr(label, 'release_resources'):
+                    freed_memory += label.release_resources()
+                else:
+                    label.clear()
+                if isinstance(label, QLabel):
+                    label.setText(text)
             
-            # 清除日志
-            self.text_log.clear()
+            # 清除日志（连同尚未刷新到界面的消息）
+            ui_log = getattr(self.navigation_functions, 'ui_log', None)
+            if ui_log is not None:
+                ui_log.clear()
+            else:
+                self.text_log.clear()
             
             # 重置导航功能类的文件路径和图像信息
             self.navigation_functions.file_path = None
@@ -50,21 +53,9 @@ class ClearTask:
             self.navigation_functions.result_image_path = None
             self.navigation_functions.mask_image_path = None 
             self.navigation_functions.boundary_image_path = None
-            # 如果有其他存储的临时文件路径，也应该在这里清除
             
-            # 删除临时保存的结果文件
-            temp_files = ['result_image_path', 'mask_image_path', 'boundary_image_path']
-            for attr in temp_files:
-                file_path = getattr(self.navigation_functions, attr, None)
-                if file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        logging.info(f"已删除临时文件: {file_path}")
-                    except Exception as e:
-                        logging.warning(f"删除临时文件失败: {file_path}, 错误: {str(e)}")
-            
-            # 清理目录中所有临时缓存文件
-            self.clean_temp_files()
+            # 释放本次会话登记的缓存、线程池状态和临时结果文件
+            self.clean_temp_files(freed_memory)
             
             # 添加清除完成的消息到日志
             self.navigation_functions.log_message("当前界面已清空，您可以载入新的影像")
@@ -74,47 +65,29 @@ class ClearTask:
             import traceback
             self.navigation_functions.log_message(traceback.format_exc())
     
-    def clean_temp_files(self):
-        """清理所有临时缓存文件"""
-        try:
-            # 清理变化检测结果临时文件
-            temp_patterns = [
-                "change_detection_result_*.png",
-                "change_detection_mask_*.png",
-                "change_detection_boundary_*.png"
-            ]
-            
-            files_removed = 0
-            
-            for pattern in temp_patterns:
-                for file_path in glob.glob(pattern):
-                    try:
-                        os.remove(file_path)
-                        logging.info(f"已清理临时文件: {file_path}")
-                        files_removed += 1
-                    except Exception as e:
-                        logging.warning(f"清理临时文件失败: {file_path}, 错误: {str(e)}")
+    def clean_temp_files(self, freed_memory=0):
+        """
+        释放本次会话登记的资源
+        
+        只删除本次运行生成并登记过的文件，不再按通配符匹配当前目录，也不清理Python字节码缓存。
+        
+        Args:
+            freed_memory: 调用方已释放的内存字节数，计入汇总
             
-            # 清理__pycache__目录中的缓存文件
-            pycache_dirs = ["__pycache__", "*/__pycache__"]
-            for cache_dir_pattern in pycache_dirs:
-                for cache_dir in glob.glob(cache_dir_pattern):
-                    if os.path.isdir(cache_dir):
-                        # 只清理目录中的文件，不删除目录本身
-                        for cache_file in glob.glob(f"{cache_dir}/*.pyc") + glob.glob(f"{cache_dir}/*.pyo"):
-                            try:
-                                os.remove(cache_file)
-                                logging.info(f"已清理Python缓存文件: {cache_file}")
-                                files_removed += 1
-                            except Exception as e:
-                                logging.warning(f"清理缓存文件失败: {cache_file}, 错误: {str(e)}")
+        Returns:
+            dict: 释放统计，见ArtifactRegistry.release_all
+        """
+        try:
+            report = get_artifact_registry().release_all()
+            report["memory_bytes"] += freed_memory
             
-            if files_removed > 0:
-                logging.info(f"共清理 {files_removed} 个临时文件")
-                self.navigation_functions.log_message(f"已清理 {files_removed} 个临时文件")
-            else:
-                logging.info("没有临时文件需要清理")
+            message = (f"已释放内存 {report['memory_bytes'] / (1024 * 1024):.1f} MB，"
+                       f"删除临时文件 {report['files']} 个（{report['disk_bytes'] / (1024 * 1024):.1f} MB）")
+            logging.info(message)
+            self.navigation_functions.log_message(message)
+            return report
                 
         except Exception as e:
             logging.error(f"清理临时文件过程中发生错误: {str(e)}")
             self.navigation_functions.log_message(f"清理临时文件时出错: {str(e)}")
+            return None
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from .execute_change_detection_task import ChangeDetectionModel
+from .job_manifest import file_fingerprint
+from .mask_postprocess import get_postprocess_settings, postprocess_array
+from .raster_io import RasterReader, write_image
+from .telemetry import record_bytes, stage
+from .tile_writer import get_encoder_settings
+
+
+class _DetectionSignals(QObject):
+    """检测任务的信号载体"""
+    finished = Signal(str, str, float, object)  # 任务键, 结果路径, 耗时(秒), 输入指纹
+    failed = Signal(str, str)  # 任务键, 错误信息
+
+
+class _DetectionTask(QRunnable):
+    """对一组前后时相影像执行变化检测并写出二值结果"""
+
+    def __init__(self, key, before_path, after_path, output_path, model, threshold, signals, fingerprint, claim):
+        super().__init__()
+        self.key = key
+        self.before_path = before_path
+        self.after_path = after_path
+        self.output_path = output_path
+        self.model = model
+        self.threshold = threshold
+        self.signals = signals
+        self.fingerprint = fingerprint
+        self.claim = claim
+
+    def run(self):
+        # 已被cancel_pending取消的任务不执行，也不发出完成或失败信号
+        if not self.claim(self):
+            return
+        start = time.perf_counter()
+        try:
+            with stage("batch.pair", key=self.key):
+                with stage("batch.inference"):
+                    before, after = RasterReader(self.before_path), RasterReader(self.after_path)
+                    try:
+                        prob = self.model.predict_window(before, after)
+                    finally:
+                        before.close()
+                        after.close()
+                    record_bytes(read=os.path.getsize(self.before_path) + os.path.getsize(self.after_path))
+                    mask = np.where(prob >= self.threshold, 255, 0).astype(np.uint8)
+                postprocess = get_postprocess_settings()
+                if postprocess.enabled:
+                    with stage("batch.postprocess"):
+                        mask = postprocess_array(mask, postprocess)
+
+                # 先写临时文件再重命名，监控目录或中断时不会留下不完整的结果
+                with stage("batch.encode"):
+                    output_dir = os.path.dirname(self.output_path)
+                    if output_dir:
+                        os.makedirs(output_dir, exist_ok=True)
+                    root, ext = os.path.splitext(self.output_path)
+                    temp_path = f"{root}.part{ext}"
+                    write_image(temp_path, mask, get_encoder_settings().cv2_params(ext))
+                    os.replace(temp_path, self.output_path)
+                    record_bytes(written=os.path.getsize(self.output_path))
+
+            # 在工作线程中计算输入指纹，供作业清单判断输入是否变化
+            fingerprints = None
+            if self.fingerprint:
+                fingerprints = (file_fingerprint(self.before_path), file_fingerprint(self.after_path))
+
+            self.signals.finished.emit(self.key, self.output_path, time.perf_counter() - start, fingerprints)
+        except Exception as e:
+            self.signals.failed.emit(self.key, f"{str(e)}\n{traceback.format_exc()}")
+
+
+class DetectionWorkerPool(QObject):
+    """变化检测工作线程池
+
+    批量处理和目录监控共用的检测执行器。记录正在执行的任务数，
+    调用方据此控制提交速度，避免一次性解码过多影像占满内存。
+    """
+
+    finished = Signal(str, str, float, object)  # 任务键, 结果路径, 耗时(秒), 输入指纹（未要求时为None）
+    failed = Signal(str, str)  # 任务键, 错误信息
+
+    def __init__(self, max_workers=None, threshold=0.5, model=None, parent=None):
+        """
+        初始化检测线程池
+
+        Args:
+            max_workers: 最大并行任务数，默认按CPU核数计算
+            threshold: 变化概率阈值
+            model: ChangeDetectionModel实例，为None时新建
+            parent: 父QObject
+        """
+        super().__init__(parent)
+        self.model = model if model is not None else ChangeDetectionModel()
+        self.threshold = threshold
+        self.in_flight = 0
+        # 已提交但尚未开始执行的任务，取消时据此扣减in_flight
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(max_workers or max(1, min(4, (os.cpu_count() or 2) // 2)))
+
+        self._signals = _DetectionSignals()
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+
+    @property
+    def max_workers(self):
+        return self._pool.maxThreadCount()
+
+    def submit(self, key, before_path, after_path, output_path, fingerprint=False):
+        """
+        提交一组影像的检测任务
+
+        Args:
+            key: 任务键，完成信号中原样返回
+            before_path: 前时相影像路径
+            after_path: 后时相影像路径
+            output_path: 结果影像路径
+            fingerprint: 是否在完成后计算输入文件指纹
+        """
+        task = _DetectionTask(key, before_path, after_path, output_path,
+                              self.model, self.threshold, self._signals, fingerprint, self._claim)
+        with self._queued_lock:
+            self._queued.add(task)
+        self.in_flight += 1
+        self._pool.start(task)
+
+    def _claim(self, task):
+        """工作线程开始执行任务前调用，任务已被取消时返回False"""
+        with self._queued_lock:
+            if task not in self._queued:
+                return False
+            self._queued.discard(task)
+            return True
+
+    def _on_finished(self, key, output_path, elapsed, fingerprints):
+        self.in_flight -= 1
+        self.finished.emit(key, output_path, elapsed, fingerprints)
+
+    def _on_failed(self, key, error):
+        self.in_flight -= 1
+        self.failed.emit(key, error)
+
+    def cancel_pending(self):
+        """
+        取消尚未开始的任务
+
+        只扣减被取消的任务数。已开始的任务照常发出完成或失败信号，
+        即使信号已在队列中等待处理，in_flight也不会被重复扣减。
+        """
+        with self._queued_lock:
+            cancelled = len(self._queued)
+            self._queued.clear()
+        self._pool.clear()
+        self.in_flight -= cancelled
+
+    def wait_for_done(self, msecs=-1):
+        """等待正在执行的任务结束"""
+        return self._pool.waitForDone(msecs)
@@ -0,0 +1,233 @@
+import os
+import re
+
+from PySide6.QtCore import QThread, Signal
+
+# 批量处理支持的影像扩展名（.vrt为虚拟裁剪块，检测时按窗口读取源影像）
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.vrt')
+
+# 日期标记：20200131、2020-01-31、2020_01_31、2020.01.31
+DATE_TOKEN_PATTERN = re.compile(r'(?:19|20)\d{2}[-_.]?(?:0[1-9]|1[0-2])[-_.]?(?:0[1-9]|[12]\d|3[01])')
+
+
+def normalize_stem(name):
+    """
+    规范化文件名主干，用作配对键
+
+    去掉扩展名、统一为小写，并把空格和连字符统一为下划线，
+    使 "Area 01.TIF" 与 "area-01.png" 得到相同的键。
+    """
+    stem = os.path.splitext(name)[0].strip().lower()
+    stem = re.sub(r'[\s\-]+', '_', stem)
+    return re.sub(r'_+', '_', stem).strip('_')
+
+
+class IndexEntry:
+    """目录索引中的一个文件"""
+    __slots__ = ('path', 'name', 'inode', 'mtime_ns', 'size')
+
+    def __init__(self, path, name, inode, mtime_ns, size):
+        self.path = path
+        self.name = name
+        self.inode = inode
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+
+class DirectoryIndex:
+    """影像目录索引
+
+    使用一次os.scandir遍历目录，按文件名建立索引。再次扫描时，若目录的修改时间未变
+    则直接跳过；否则重新stat每个文件，inode、修改时间和大小都未变的条目直接复用。
+
+    目录的修改时间只在文件增删或重命名时变化，原地覆盖写入文件不会改变它，
+    因此跳过目录时看不到原地修改；需要发现这类修改时使用scan(force=True)或refresh()。
+    """
+
+    def __init__(self, directory, extensions=IMAGE_EXTENSIONS):
+        """
+        初始化目录索引
+
+        Args:
+            directory: 影像目录
+            extensions: 需要索引的文件扩展名（小写）
+        """
+        self.directory = directory
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.entries = {}  # 文件名 -> IndexEntry
+        self._dir_mtime_ns = None
+        self.last_stat_count = 0  # 最近一次扫描调用stat的次数
+
+    def scan(self, force=False):
+        """
+        扫描目录并更新索引
+
+        Args:
+            force: 为True时忽略目录修改时间，重新扫描并视为索引已变化
+
+        Returns:
+            bool: 索引内容是否发生变化
+        """
+        self.last_stat_count = 0
+        dir_mtime_ns = os.stat(self.directory).st_mtime_ns
+        if not force and dir_mtime_ns == self._dir_mtime_ns:
+            return False
+
+        entries = {}
+        changed = force
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                name = entry.name
+                if not name.lower().endswith(self.extensions):
+                    continue
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                self.last_stat_count += 1
+                # 原地覆盖写入的文件inode不变，须同时比较修改时间和大小才能复用
+                signature = (entry.inode(), stat.st_mtime_ns, stat.st_size)
+                old = self.entries.get(name)
+                if old is not None and (old.inode, old.mtime_ns, old.size) == signature:
+                    entries[name] = old
+                    continue
+                entries[name] = IndexEntry(entry.path, name, *signature)
+                changed = True
+
+        if len(entries) != len(self.entries):
+            changed = True
+        self.entries = entries
+        self._dir_mtime_ns = dir_mtime_ns
+        return changed
+
+    def refresh(self, name):
+        """
+        重新stat单个文件，用于跟踪仍在写入中的文件
+
+        Returns:
+            IndexEntry: 更新后的条目，文件不存在时返回None
+        """
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.entries.pop(name, None)
+            return None
+        entry = IndexEntry(path, name, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self.entries[name] = entry
+        return entry
+
+    def files(self):
+        """返回按文件名排序的文件路径列表"""
+        return [self.entries[name].path for name in sorted(self.entries)]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PairingRule:
+    """前后时相影像的配对规则
+
+    mode可选:
+        stem: 规范化后的文件名完全一致
+        regex: 用正则表达式从文件名中提取配对键（优先使用命名分组key，其次第一个分组）
+        date: 去掉文件名中的日期标记后比较，如 area01_20200101 与 area01_20210101
+    """
+
+    MODES = ('stem', 'regex', 'date')
+
+    def __init__(self, mode='stem', pattern=None):
+        """
+        初始化配对规则
+
+        Args:
+            mode: 配对模式
+            pattern: regex模式下使用的正则表达式
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的配对模式: {mode}")
+        if mode == 'regex' and not pattern:
+            raise ValueError("正则匹配模式需要提供正则表达式")
+        self.mode = mode
+        self.pattern = re.compile(pattern, re.IGNORECASE) if mode == 'regex' else None
+
+    def key(self, name):
+        """
+        计算文件名的配对键
+
+        Returns:
+            str: 配对键，无法提取时返回None
+        """
+        if self.mode == 'stem':
+            return normalize_stem(name)
+
+        stem = os.path.splitext(name)[0]
+        if self.mode == 'regex':
+            match = self.pattern.search(stem)
+            if match is None:
+                return None
+            if 'key' in self.pattern.groupindex:
+                value = match.group('key')
+            elif self.pattern.groups:
+                value = match.group(1)
+            else:
+                value = match.group(0)
+            return normalize_stem(value) if value else None
+
+        # date模式
+        return normalize_stem(DATE_TOKEN_PATTERN.sub('', stem)) or None
+
+
+def pair_indexes(before_index, after_index, rule):
+    """
+    按配对规则匹配前后时相影像
+
+    Args:
+        before_index: 前时相DirectoryIndex
+        after_index: 后时相DirectoryIndex
+        rule: PairingRule实例
+
+    Returns:
+        tuple: (配对列表[(配对键, 前时相路径, 后时相路径)], 未配对的前时相路径列表, 未配对的后时相路径列表)
+    """
+    def build(index):
+        keyed = {}
+        unmatched = []
+        for name in sorted(index.entries):
+            key = rule.key(name)
+            # 同一个键对应多个文件时只保留第一个，其余视为未配对
+            if key is None or key in keyed:
+                unmatched.append(index.entries[name].path)
+            else:
+                keyed[key] = index.entries[name].path
+        return keyed, unmatched
+
+    before_keyed, before_unmatched = build(before_index)
+    after_keyed, after_unmatched = build(after_index)
+
+    pairs = []
+    for key in sorted(before_keyed):
+        if key in after_keyed:
+            pairs.append((key, before_keyed[key], after_keyed[key]))
+        else:
+            before_unmatched.append(before_keyed[key])
+    after_unmatched.extend(path for key, path in after_keyed.items() if key not in before_keyed)
+    return pairs, before_unmatched, after_unmatched
+
+
+class DirectoryScanThread(QThread):
+    """在后台线程中扫描目录索引，避免大目录阻塞界面"""
+
+    scanned = Signal(object, bool)  # DirectoryIndex, 索引是否变化
+    failed = Signal(object, str)  # DirectoryIndex, 错误信息
+
+    def __init__(self, index, force=False, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.force = force
+
+    def run(self):
+        try:
+            changed = self.index.scan(self.force)
+            self.scanned.emit(self.index, changed)
+        except Exception as e:
+            self.failed.emit(self.index, str(e))
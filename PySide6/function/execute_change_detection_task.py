@@ -1,5 +1,168 @@
 import os
-from PySide6.QtGui import QPixmap
+import logging
+import threading
+import time
+
+import numpy as np
+from PySide6.QtCore import QObject, QRect, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtGui import QColor, QImage, QPainter, QPen, QPixmap, qRgb, qRgba
+
+from .workspace import KIND_CACHE, KIND_RESULTS, get_workspace
+from .artifact_registry import get_artifact_registry
+from .mask_postprocess import get_postprocess_settings
+from .probability_map import ProbabilityMap, threshold_level
+from .raster_io import open_raster, read_image_size
+from .telemetry import stage
+
+# 默认变化概率阈值
+DEFAULT_THRESHOLD = 0.5
+# 整幅检测时每次推理的窗口边长，控制一次解码和推理的内存
+DETECT_WINDOW_SIZE = 1024
+# 窗口四周额外读取的像素数，推理后裁掉，避免窗口边界处的卷积边缘效应
+DETECT_HALO = 64
+# CVA幅值直方图的分辨率（每单位幅值的级数）和级数，幅值最大为sqrt(3) * 255
+CVA_BINS_PER_UNIT = 2
+CVA_BINS = 1024
+# 区域检测结果叠加显示的颜色
+ROI_OVERLAY_COLOR = qRgba(255, 0, 0, 140)
+# 整幅检测结果的显示颜色：变化为白色，未变化为黑色
+MASK_CHANGED_COLOR = qRgb(255, 255, 255)
+MASK_UNCHANGED_COLOR = qRgb(0, 0, 0)
+
+
+def detection_windows(region, window_size=DETECT_WINDOW_SIZE):
+    """
+    将区域划分为推理窗口
+
+    Args:
+        region: (x, y, 宽度, 高度)
+
+    Returns:
+        list: 窗口(x, y, 宽度, 高度)列表，按行排列
+    """
+    x0, y0, width, height = region
+    return [(x0 + x, y0 + y, min(window_size, width - x), min(window_size, height - y))
+            for y in range(0, height, window_size) for x in range(0, width, window_size)]
+
+
+class _DetectionSignals(QObject):
+    """检测任务的信号载体"""
+    finished = Signal(object)  # 结果dict
+    failed = Signal(str)  # 错误信息
+    progress = Signal(int, int)  # 已完成数, 总数
+
+
+class _WindowDetectionTask(QRunnable):
+    """对前后时相影像的一个窗口分块执行变化检测
+
+    变化概率保存为ProbabilityMap，调整阈值时无需重新推理；同时按当前阈值写出二值结果。
+    """
+
+    def __init__(self, name, model, before_path, after_path, window, prob_path, output_path, threshold, signals):
+        super().__init__()
+        self.name = name
+        self.model = model
+        self.before_path = before_path
+        self.after_path = after_path
+        self.window = window
+        self.prob_path = prob_path
+        self.output_path = output_path
+        self.threshold = threshold
+        self.signals = signals
+
+    def run(self):
+        start = time.perf_counter()
+        prob_map = None
+        before = after = None
+        try:
+            x0, y0, width, height = self.window
+            prob_map = ProbabilityMap(width, height, self.prob_path, origin=(x0, y0))
+            # GeoTIFF/VRT按窗口读取并按整幅影像统一拉伸；其他格式只解码一次
+            before, after = open_raster(self.before_path), open_raster(self.after_path)
+            with stage(self.name, width=width, height=height):
+                cva_scale = self.model.cva_scale(before, after, self.window)
+                for window in detection_windows(self.window):
+                    with stage("detect.inference", width=window[2], height=window[3]):
+                        prob = self.model.predict_window(before, after, window, DETECT_HALO, cva_scale)
+                        prob_map.write(window[0] - x0, window[1] - y0, prob)
+                # 导出时按块并行做形态学后处理（参数见mask_postprocess）
+                with stage("detect.encode"):
+                    prob_map.export_mask(self.output_path, self.threshold, postprocess=get_postprocess_settings())
+
+            # 预览和级别直方图在工作线程中生成，界面线程调整阈值时只需替换颜色表
+            preview, scale = prob_map.preview()
+            self.signals.finished.emit({
+                "window": self.window,
+                "prob_map": prob_map,
+                "preview": preview,
+                "preview_scale": scale,
+                "histogram": prob_map.histogram(),
+                "output_path": self.output_path,
+                "threshold": self.threshold,
+                "model": self.model.description,
+                "elapsed": time.perf_counter() - start,
+            })
+        except Exception as e:
+            if prob_map is not None:
+                prob_map.close()
+            for path in (self.prob_path, self.output_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            import traceback
+            self.signals.failed.emit(f"{str(e)}\n{traceback.format_exc()}")
+        finally:
+            for reader in (before, after):
+                if reader is not None:
+                    reader.close()
+
+
+class _ThresholdExportTask(QRunnable):
+    """按新阈值从概率图重新导出结果（含后处理），不重新推理"""
+
+    def __init__(self, prob_map, output_path, threshold, signals):
+        super().__init__()
+        self.prob_map = prob_map
+        self.output_path = output_path
+        self.threshold = threshold
+        self.signals = signals
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            with stage("detect.reexport", threshold=self.threshold):
+                self.prob_map.export_mask(self.output_path, self.threshold, postprocess=get_postprocess_settings())
+            self.signals.finished.emit({
+                "output_path": self.output_path,
+                "threshold": self.threshold,
+                "elapsed": time.perf_counter() - start,
+            })
+        except Exception as e:
+            import traceback
+            self.signals.failed.emit(f"{str(e)}\n{traceback.format_exc()}")
+
+
+class _MultiDateTask(QRunnable):
+    """一幅基准影像与多个时相逐一比较，基准影像每个窗口只编码一次"""
+
+    def __init__(self, model, base_path, later_paths, output_dir, threshold, signals):
+        super().__init__()
+        self.model = model
+        self.base_path = base_path
+        self.later_paths = later_paths
+        self.output_dir = output_dir
+        self.threshold = threshold
+        self.signals = signals
+
+    def run(self):
+        from .multi_date import run_multi_date
+        try:
+            result = run_multi_date(self.base_path, self.later_paths, self.output_dir, self.model, self.threshold,
+                                    postprocess=get_postprocess_settings(), progress=self.signals.progress.emit)
+            self.signals.finished.emit(result)
+        except Exception as e:
+            import traceback
+            self.signals.failed.emit(f"{str(e)}\n{traceback.format_exc()}")
+
 
 class ExecuteChangeDetectionTask:
     def __init__(self, navigation_functions, label_output):
@@ -13,6 +176,62 @@ class ExecuteChangeDetectionTask:
         self.navigation_functions = navigation_functions
         self.label_output = label_output
         self.result_image_path = None
+        self.threshold = DEFAULT_THRESHOLD
+        self._model = None
+        
+        # 最近一次检测的概率图，调整阈值时重新着色和导出
+        self.prob_map = None
+        self._prob_hist = None
+        self._prob_image = None
+        self._result_threshold = None
+        self._result_model = None
+        self._threshold_slider = None
+        self._threshold_label = None
+        
+        # 检测在线程池中执行；区域检测时记录选择所在的标签，结果叠加到原图上
+        self._running = False
+        self._roi_label = None
+        self._roi_base = None
+        self._roi_target = None
+        self._signals = _DetectionSignals()
+        # 信号从工作线程发出，显式排队到界面线程处理
+        self._signals.finished.connect(self._on_detection_finished, Qt.QueuedConnection)
+        self._signals.failed.connect(self._on_detection_failed, Qt.QueuedConnection)
+        self._multi_signals = _DetectionSignals()
+        self._multi_signals.finished.connect(self._on_multi_date_finished, Qt.QueuedConnection)
+        self._multi_signals.failed.connect(self._on_detection_failed, Qt.QueuedConnection)
+        self._multi_signals.progress.connect(self._on_multi_date_progress, Qt.QueuedConnection)
+        self._multi_progress = -1
+        self._export_signals = _DetectionSignals()
+        self._export_signals.finished.connect(self._on_export_finished, Qt.QueuedConnection)
+        self._export_signals.failed.connect(self._on_export_failed, Qt.QueuedConnection)
+        self._export_callback = None
+        for label in (navigation_functions.label_before, navigation_functions.label_after):
+            if hasattr(label, 'selection_finished'):
+                label.selection_finished.connect(
+                    lambda area, label=label: self._on_selection_finished(label, area))
+        get_artifact_registry().track(self)
+    
+    def _get_model(self):
+        """首次检测时创建模型，权重在第一次推理时加载"""
+        if self._model is None:
+            self._model = ChangeDetectionModel()
+        return self._model
+    
+    def bind_threshold_slider(self, slider, label=None):
+        """
+        绑定阈值滑块，滑块取值为阈值的百分数
+
+        Args:
+            slider: QSlider，检测完成前不可用
+            label: 显示当前阈值和变化比例的QLabel
+        """
+        self._threshold_slider = slider
+        self._threshold_label = label
+        slider.setEnabled(False)
+        slider.setValue(int(round(self.threshold * 100)))
+        slider.valueChanged.connect(lambda value: self.set_threshold(value / 100.0))
+        self._update_threshold_label()
     
     def on_begin_clicked(self):
         """开始执行变化检测任务"""
@@ -22,43 +241,397 @@ class ExecuteChangeDetectionTask:
                 self.navigation_functions.log_message("请先导入前后时相影像")
                 self._show_styled_message_box("检测失败", "没有可用影像，请先导入前后时相影像", "warning")
                 return
+            if self._running:
+                self.navigation_functions.log_message("变化检测正在执行，请稍候")
+                return
             
             # 获取前后时相影像路径
             before_image_path = self.navigation_functions.file_path
             after_image_path = self.navigation_functions.file_path_after
-            
-            # 设置统一的输出路径
-            output_dir = "D:/VS_WORKBASE/PySide6/遥感影像变化检测系统V2.0/output_image"
-            os.makedirs(output_dir, exist_ok=True)
+            raster_size = self._common_size(before_image_path, after_image_path)
+            if raster_size is None:
+                return
             
             self.navigation_functions.log_message(f"执行变化检测: {before_image_path} 与 {after_image_path}")
-            self.navigation_functions.log_message(f"结果将保存到: {output_dir}")
-            
-            # 在这里添加模型推理代码
-            # ...
+            self._start_detection("detect.single", (0, 0) + tuple(raster_size), "change_detection_result")
             
-            # 模拟生成结果图像路径（实际应由模型生成）
-            import time
-            timestamp = int(time.time())
-            result_filename = f"change_detection_result_{timestamp}.png"
-            result_image_path = os.path.join(output_dir, result_filename)
-            
-            # TODO: 这里应该有实际的模型推理代码，将结果保存到result_image_path
+        except Exception as e:
+            self._running = False
+            self.navigation_functions.log_message(f"执行变化检测时出错: {str(e)}")
+            import traceback
+            self.navigation_functions.log_message(traceback.format_exc())
+            self._show_styled_message_box("检测失败", f"执行变化检测时出错: {str(e)}", "critical")
+    
+    def _common_size(self, before_path, after_path):
+        """返回前后时相共同的影像尺寸，尺寸不一致时提示并返回None"""
+        raster_size = read_image_size(before_path)
+        after_size = read_image_size(after_path)
+        if tuple(raster_size) != tuple(after_size):
+            message = f"前后时相影像尺寸不一致: {raster_size[0]}x{raster_size[1]} 与 {after_size[0]}x{after_size[1]}"
+            self.navigation_functions.log_message(message)
+            self._show_styled_message_box("检测失败", message, "warning")
+            return None
+        return raster_size
+    
+    def _start_detection(self, name, window, prefix, label=None):
+        """在线程池中检测影像窗口，label不为None时为区域检测"""
+        # 结果和概率图写到工作空间中，由工作空间统一管理空间配额和清理
+        workspace = get_workspace()
+        output_path = workspace.new_path(KIND_RESULTS, prefix, ".png")
+        prob_path = workspace.new_path(KIND_CACHE, f"{prefix}_probability", ".npy")
+        self.navigation_functions.log_message(f"结果将保存到: {os.path.dirname(output_path)}")
+        postprocess = get_postprocess_settings()
+        if postprocess.enabled:
+            self.navigation_functions.log_message(f"结果后处理: {postprocess.describe()}")
+        self._running = True
+        self._roi_label = label
+        QThreadPool.globalInstance().start(_WindowDetectionTask(
+            name, self._get_model(), self.navigation_functions.file_path, self.navigation_functions.file_path_after,
+            window, prob_path, output_path, self.threshold, self._signals))
+    
+    def start_selection_detection(self):
+        """进入区域检测：在前时相或后时相窗口中框选区域，松开鼠标后只检测该区域"""
+        if not self.navigation_functions.file_path or not self.navigation_functions.file_path_after:
+            self.navigation_functions.log_message("请先导入前后时相影像")
+            self._show_styled_message_box("区域检测", "没有可用影像，请先导入前后时相影像", "warning")
+            return
+        if self._running:
+            self.navigation_functions.log_message("变化检测正在执行，请稍候")
+            return
+        for label in (self.navigation_functions.label_before, self.navigation_functions.label_after):
+            if hasattr(label, 'enter_selection_mode'):
+                label.enter_selection_mode()
+        self.navigation_functions.log_message("请在前时相或后时相影像上拖动鼠标框选检测区域")
+    
+    def _on_selection_finished(self, label, area):
+        """框选完成后退出选择模式并开始区域检测"""
+        if not label.selection_mode:
+            return
+        for other in (self.navigation_functions.label_before, self.navigation_functions.label_after):
+            if hasattr(other, 'exit_selection_mode'):
+                other.exit_selection_mode()
+        self.detect_in_selection(area, label)
+    
+    def selection_window(self, area, label, raster_size):
+        """
+        将标签上的选择区域换算为影像的像素窗口
+
+        显示的图像可能是缩小后的预览，按原始图像与影像的尺寸比例换算，并裁剪到影像范围内。
+
+        Args:
+            area: get_selected_area返回的(x, y, 宽度, 高度)
+            label: 选择区域所在的ZoomableLabel
+            raster_size: 影像的(宽度, 高度)
+
+        Returns:
+            tuple: (x, y, 宽度, 高度)，区域为空时返回None
+        """
+        raster_width, raster_height = raster_size
+        scale_x = raster_width / label.original_pixmap.width()
+        scale_y = raster_height / label.original_pixmap.height()
+        x0 = max(0, min(raster_width, int(round(area[0] * scale_x))))
+        y0 = max(0, min(raster_height, int(round(area[1] * scale_y))))
+        x1 = max(0, min(raster_width, int(round((area[0] + area[2]) * scale_x))))
+        y1 = max(0, min(raster_height, int(round((area[1] + area[3]) * scale_y))))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+    
+    def detect_in_selection(self, area, label=None):
+        """
+        只对选择区域执行变化检测，结果叠加显示在原图对应位置
+
+        Args:
+            area: 选择区域(x, y, 宽度, 高度)，为标签中原始图像的坐标
+            label: 选择区域所在的标签，默认为前时相标签
+        """
+        try:
+            label = label or self.navigation_functions.label_before
+            before_path = self.navigation_functions.file_path
+            after_path = self.navigation_functions.file_path_after
+            if not before_path or not after_path or label.original_pixmap is None:
+                self.navigation_functions.log_message("请先导入前后时相影像")
+                return
+            if self._running:
+                self.navigation_functions.log_message("变化检测正在执行，请稍候")
+                return
             
-            # 假设模型推理完成并生成了结果
-            self.navigation_functions.log_message(f"检测完成，结果保存为: {result_image_path}")
+            # 前后时相按同一窗口读取，尺寸必须一致
+            raster_size = self._common_size(before_path, after_path)
+            if raster_size is None:
+                return
+            window = self.selection_window(area, label, raster_size)
+            if window is None:
+                self.navigation_functions.log_message("选择区域为空，请重新框选")
+                return
             
-            # 缓存结果路径以供导出
-            self.result_image_path = result_image_path
+            self.navigation_functions.log_message(
+                f"区域检测: 窗口 x={window[0]}, y={window[1]}, {window[2]}x{window[3]}")
+            self._start_detection("detect.roi", window, "roi_detection_result", label)
+        except Exception as e:
+            self._running = False
+            self.navigation_functions.log_message(f"区域检测时出错: {str(e)}")
+            import traceback
+            self.navigation_functions.log_message(traceback.format_exc())
+    
+    def _on_detection_finished(self, result):
+        """保存概率图并按当前阈值显示结果"""
+        self._running = False
+        label = self._roi_label
+        self._roi_label = None
+        try:
+            base = label.original_pixmap if label is not None else None
+            if label is not None and base is None:
+                # 检测期间界面被清空
+                result["prob_map"].close()
+                return
             
-            # 直接显示结果到解译窗口，无需确认
-            self.display_change_detection_result(result_image_path)
+            self._set_probability_map(result)
+            if base is not None:
+                # 影像窗口换算回显示图像坐标
+                raster_width, raster_height = read_image_size(self.navigation_functions.file_path)
+                scale_x = base.width() / raster_width
+                scale_y = base.height() / raster_height
+                x, y, width, height = result["window"]
+                self._roi_base = base
+                self._roi_target = QRect(int(x * scale_x), int(y * scale_y),
+                                         max(1, int(round(width * scale_x))), max(1, int(round(height * scale_y))))
+            else:
+                self._roi_base = None
+                self._roi_target = None
+            self._render_probability(reset_view=True)
             
+            self._keep_result(result["output_path"])
+            self._result_threshold = result["threshold"]
+            self._result_model = result["model"]
+            self._update_threshold_label()
+            kind = "区域检测" if base is not None else "检测"
+            self.navigation_functions.log_message(
+                f"{kind}完成（{result['model']}），用时 {result['elapsed']:.2f} 秒，"
+                f"变化像素占比 {self._changed_ratio() * 100:.2f}%，结果保存为: {result['output_path']}")
+            if self._model is not None and self._model.model_type == "CVA":
+                self.navigation_functions.log_message(
+                    f"未使用网络模型: 未能加载权重 {self._model.weights_path}，结果由变化向量分析(CVA)生成",
+                    logging.WARNING)
         except Exception as e:
-            self.navigation_functions.log_message(f"执行变化检测时出错: {str(e)}")
+            self.navigation_functions.log_message(f"显示变化检测结果时出错: {str(e)}")
             import traceback
             self.navigation_functions.log_message(traceback.format_exc())
-            self._show_styled_message_box("检测失败", f"执行变化检测时出错: {str(e)}", "critical")
+    
+    def start_multi_date(self):
+        """多时相检测：以前时相影像为基准，与选择的多个后续时相影像逐一比较"""
+        from PySide6.QtWidgets import QFileDialog
+        base_path = self.navigation_functions.file_path
+        if not base_path:
+            self.navigation_functions.log_message("请先导入前时相影像作为基准影像")
+            self._show_styled_message_box("多时相检测", "请先导入前时相影像作为基准影像", "warning")
+            return
+        if self._running:
+            self.navigation_functions.log_message("变化检测正在执行，请稍候")
+            return
+        later_paths, _ = QFileDialog.getOpenFileNames(
+            None, "选择后续时相影像（可多选）", os.path.dirname(base_path),
+            "图像文件 (*.png *.jpg *.jpeg *.tif *.tiff *.vrt);;所有文件 (*)")
+        if not later_paths:
+            self.navigation_functions.log_message("未选择后续时相影像")
+            return
+        output_dir = QFileDialog.getExistingDirectory(None, "选择结果保存目录", os.path.dirname(base_path))
+        if not output_dir:
+            self.navigation_functions.log_message("未选择保存目录")
+            return
+        
+        self.navigation_functions.log_message(
+            f"多时相检测: 基准影像 {base_path}，共 {len(later_paths)} 个后续时相，结果保存到: {output_dir}")
+        model = self._get_model()
+        if not model.supports_features():
+            self.navigation_functions.log_message("当前模型不支持编码特征缓存，每一对影像将完整推理")
+        self._running = True
+        self._multi_progress = -1
+        QThreadPool.globalInstance().start(_MultiDateTask(
+            model, base_path, later_paths, output_dir, self.threshold, self._multi_signals))
+    
+    def _on_multi_date_progress(self, done, total):
+        # 每完成10%记录一次
+        percent = done * 100 // total if total else 100
+        if percent // 10 > self._multi_progress:
+            self._multi_progress = percent // 10
+            self.navigation_functions.log_message(f"多时相检测进度: {done}/{total} ({percent}%)")
+    
+    def _on_multi_date_finished(self, result):
+        self._running = False
+        for path in result["outputs"]:
+            self.navigation_functions.log_message(f"已保存: {path}")
+        cache = result["cache"]
+        cache_text = (f"，编码 {cache['encoded']} 次，特征缓存命中 {cache['hits']} 次"
+                      if cache is not None else "")
+        self.navigation_functions.log_message(
+            f"多时相检测完成（{self._get_model().description}），用时 {result['elapsed']:.2f} 秒，"
+            f"共 {len(result['outputs'])} 个结果{cache_text}")
+    
+    def _on_detection_failed(self, error):
+        self._running = False
+        self._roi_label = None
+        self.navigation_functions.log_message(f"变化检测失败: {error}")
+    
+    def _set_probability_map(self, result):
+        """替换当前概率图，之前的概率图文件改为可淘汰"""
+        self._close_probability_map()
+        self.prob_map = result["prob_map"]
+        self._prob_hist = result["histogram"]
+        # 预览作为8位索引图像，阈值只影响颜色表
+        preview = np.ascontiguousarray(result["preview"])
+        self._prob_image = QImage(preview.data, preview.shape[1], preview.shape[0],
+                                  preview.strides[0], QImage.Format_Indexed8).copy()
+        if self.prob_map.path:
+            get_artifact_registry().track_file(self.prob_map.path)
+            get_workspace().acquire(self.prob_map.path)
+        if self._threshold_slider is not None:
+            self._threshold_slider.setEnabled(True)
+    
+    def _close_probability_map(self):
+        if self.prob_map is None:
+            return
+        path = self.prob_map.path
+        self.prob_map.close()
+        if path:
+            get_workspace().release(path, delete=True)
+        self.prob_map = None
+        self._prob_hist = None
+        self._prob_image = None
+    
+    def _changed_ratio(self):
+        """当前阈值下的变化像素比例，由级别直方图直接计算"""
+        if self._prob_hist is None or self.prob_map is None:
+            return 0.0
+        total = self.prob_map.width * self.prob_map.height
+        # 直方图包含边缘瓦片补零的像素，全部计入级别0
+        return float(self._prob_hist[threshold_level(self.threshold):].sum()) / total if total else 0.0
+    
+    def _render_probability(self, reset_view=False):
+        """按当前阈值给概率预览设置颜色表并显示"""
+        if self._prob_image is None:
+            return
+        level = threshold_level(self.threshold)
+        if self._roi_base is not None:
+            self._prob_image.setColorTable([0] * level + [ROI_OVERLAY_COLOR] * (256 - level))
+            pixmap = self._roi_base.copy()
+            painter = QPainter(pixmap)
+            painter.drawImage(self._roi_target, self._prob_image)
+            painter.setPen(QPen(QColor(255, 215, 0), 2))
+            painter.drawRect(self._roi_target)
+            painter.end()
+        else:
+            self._prob_image.setColorTable([MASK_UNCHANGED_COLOR] * level + [MASK_CHANGED_COLOR] * (256 - level))
+            pixmap = QPixmap.fromImage(self._prob_image)
+        if reset_view or not hasattr(self.label_output, 'replace_pixmap'):
+            self.label_output.set_pixmap(pixmap)
+        else:
+            self.label_output.replace_pixmap(pixmap)
+    
+    def set_threshold(self, threshold):
+        """
+        调整变化概率阈值，只重新着色显示的结果，不重新推理
+
+        Args:
+            threshold: 变化概率阈值(0~1)
+        """
+        self.threshold = float(threshold)
+        with stage("detect.threshold"):
+            self._render_probability()
+        self._update_threshold_label()
+    
+    def _update_threshold_label(self):
+        if self._threshold_label is None:
+            return
+        text = f"阈值 {self.threshold:.2f}"
+        if self.prob_map is not None:
+            text += f"  变化 {self._changed_ratio() * 100:.2f}%"
+            if self._result_model:
+                text += f"  {self._result_model}"
+        self._threshold_label.setText(text)
+    
+    def result_at_threshold(self, callback):
+        """
+        取得按当前阈值生成的结果路径后调用callback(路径)
+
+        阈值未变化时直接回调；阈值变化后在线程池中从概率图重新导出（不重新推理），
+        完成后在界面线程中回调。没有结果时不回调。
+
+        Args:
+            callback: 回调函数，参数为结果影像路径
+        """
+        if self.prob_map is None or self._result_threshold == self.threshold:
+            if self.result_image_path:
+                callback(self.result_image_path)
+            return
+        if self._running:
+            self.navigation_functions.log_message("变化检测正在执行，请稍候")
+            return
+        prefix = "roi_detection_result" if self._roi_base is not None else "change_detection_result"
+        output_path = get_workspace().new_path(KIND_RESULTS, prefix, ".png")
+        self.navigation_functions.log_message(f"正在按阈值 {self.threshold:.2f} 重新生成结果...")
+        self._running = True
+        self._export_callback = callback
+        QThreadPool.globalInstance().start(
+            _ThresholdExportTask(self.prob_map, output_path, self.threshold, self._export_signals))
+    
+    def _on_export_finished(self, result):
+        self._running = False
+        callback, self._export_callback = self._export_callback, None
+        output_path = result["output_path"]
+        if self.prob_map is None:
+            # 导出期间界面被清空
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return
+        self._keep_result(output_path)
+        self._result_threshold = result["threshold"]
+        self.navigation_functions.log_message(
+            f"已按阈值 {result['threshold']:.2f} 重新生成结果，用时 {result['elapsed']:.2f} 秒: {output_path}")
+        if callback is not None:
+            callback(output_path)
+    
+    def _on_export_failed(self, error):
+        self._running = False
+        self._export_callback = None
+        self.navigation_functions.log_message(f"重新生成结果失败: {error}")
+    
+    def release_resources(self):
+        """
+        清空界面时释放概率图和显示用的预览
+
+        Returns:
+            int: 释放的内存字节数
+        """
+        freed = 0
+        if self._prob_image is not None:
+            freed += self._prob_image.sizeInBytes()
+        if self.prob_map is not None and not self.prob_map.path:
+            freed += self.prob_map.nbytes
+        self._close_probability_map()
+        self._roi_base = None
+        self._roi_target = None
+        self._result_threshold = None
+        self._result_model = None
+        self.result_image_path = None
+        if self._threshold_slider is not None:
+            self._threshold_slider.setEnabled(False)
+        self._update_threshold_label()
+        return freed
+    
+    def _keep_result(self, result_image_path):
+        """登记当前显示的结果，供导出和工作空间配额管理"""
+        # 当前显示的结果在工作空间中保持引用，不被配额淘汰；之前的结果改为可淘汰
+        # 同时登记为本次会话的文件，清空界面时删除
+        get_artifact_registry().track_file(result_image_path)
+        workspace = get_workspace()
+        if self.result_image_path and self.result_image_path != result_image_path:
+            workspace.release(self.result_image_path)
+        if self.result_image_path != result_image_path:
+            workspace.acquire(result_image_path)
+        
+        # 保存结果路径以供后续导出
+        self.result_image_path = result_image_path
     
     def display_change_detection_result(self, result_image_path, stats=None):
         """显示变化检测结果
@@ -77,9 +650,7 @@ class ExecuteChangeDetectionTask:
             # 显示在解译结果区域
             self.label_output.set_pixmap(pixmap)
             self.navigation_functions.log_message("检测结果已加载到解译结果窗口")
-            
-            # 保存结果路径以供后续导出
-            self.result_image_path = result_image_path
+            self._keep_result(result_image_path)
             
         except Exception as e:
             self.navigation_functions.log_message(f"显示变化检测结果时出错: {str(e)}")
@@ -220,10 +791,266 @@ class ExecuteChangeDetectionTask:
         return dialog.exec_()
 
 class ChangeDetectionModel:
-    """变化检测模型类"""
-    def __init__(self):
+    """变化检测模型类
+    
+    存在TorchScript权重文件时使用BIT-CD网络推理；权重缺失或PyTorch不可用时，
+    退回到变化向量分析(CVA)，保证批量处理流程在没有模型的环境中也能运行。
+    实际使用的方法见description，界面和结果记录据此标明结果来自网络还是CVA。
+    
+    推理时只在锁内取得网络的局部引用，前向计算在锁外进行，多个工作线程可以同时推理；
+    release_resources卸载权重不影响正在进行的推理。
+    
+    孪生网络导出了编码和解码方法时（@torch.jit.export）：
+        encode(x: Tensor) -> List[Tensor]                    单幅影像的编码特征
+        decode(f1: List[Tensor], f2: List[Tensor]) -> Tensor  融合两个时相的特征，输出与forward相同
+    多时相检测时predict_window按影像和窗口缓存编码特征（见feature_cache），基准影像只编码一次。
+    """
+    
+    # 默认权重路径，可通过环境变量RSCD_MODEL_PATH覆盖
+    DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "bit_cd.pt")
+    
+    def __init__(self, weights_path=None):
+        """
+        初始化变化检测模型
+        
+        Args:
+            weights_path: TorchScript权重文件路径，为None时使用默认路径
+        """
         self.model_type = "BIT-CD"
         self.model_version = "1.0"
-        # 其他模型初始化代码...
+        self.weights_path = weights_path or os.environ.get("RSCD_MODEL_PATH", self.DEFAULT_WEIGHTS)
+        self._net = None
+        self._device = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.feature_cache = None
+        get_artifact_registry().track(self)
+        
+    def _network(self):
+        """
+        加载网络权重（只在第一次调用时执行），返回网络和设备的局部引用
+
+        Returns:
+            tuple: (网络, 设备)，使用CVA时网络为None
+        """
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                self._net = None
+                if not os.path.exists(self.weights_path):
+                    logging.warning(f"未找到模型权重 {self.weights_path}，使用变化向量分析(CVA)，结果不是网络推理结果")
+                else:
+                    try:
+                        import torch
+                        self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+                        self._net = torch.jit.load(self.weights_path, map_location=self._device).eval()
+                        logging.info(f"已加载变化检测模型: {self.weights_path} ({self._device})")
+                    except Exception as e:
+                        logging.warning(f"加载模型失败，使用变化向量分析(CVA): {str(e)}")
+                self.model_type = "BIT-CD" if self._net is not None else "CVA"
+            return self._net, self._device
+        
+    def load(self):
+        """加载网络权重，只在第一次推理时执行；返回是否使用网络推理"""
+        return self._network()[0] is not None
+        
+    @property
+    def description(self):
+        """最近一次加载确定的检测方法，用于界面显示和结果记录（不会触发加载）"""
+        if self.model_type == "CVA":
+            return "CVA（变化向量分析）"
+        return f"{self.model_type} {self.model_version}"
+        
+    def release_resources(self):
+        """
+        卸载网络权重，下次推理时重新加载
+        
+        Returns:
+            int: 释放的参数内存字节数
+        """
+        with self._lock:
+            freed = 0
+            if self._net is not None:
+                freed = sum(p.numel() * p.element_size() for p in self._net.parameters())
+                self._net = None
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            self._loaded = False
+            return freed
+        
+    def predict(self, before, after, cva_scale=None):
+        """
+        预测逐像素的变化概率
+        
+        Args:
+            before: 前时相RGB uint8数组，形状(H, W, 3)
+            after: 后时相RGB uint8数组，形状与before相同
+            cva_scale: CVA归一化尺度（见cva_scale），为None时按输入数组计算
+            
+        Returns:
+            numpy.ndarray: 形状(H, W)的float32变化概率，取值0~1
+        """
+        if before.shape != after.shape:
+            raise ValueError(f"前后时相影像尺寸不一致: {before.shape} 与 {after.shape}")
+        net, device = self._network()
+        if net is not None:
+            return self._predict_net(net, device, before, after)
+        return self._predict_cva(before, after, cva_scale)
+        
+    def supports_features(self):
+        """网络是否可以分开执行编码器和解码器"""
+        net = self._network()[0]
+        return net is not None and hasattr(net, "encode") and hasattr(net, "decode")
+        
+    def model_tag(self):
+        """模型标识，权重文件变化后缓存的特征不再复用"""
+        try:
+            return f"{os.path.abspath(self.weights_path)}:{os.path.getmtime(self.weights_path)}"
+        except OSError:
+            return os.path.abspath(self.weights_path)
+        
+    def predict_window(self, before, after, window=None, halo=0, cva_scale=None, cache_features=False):
+        """
+        按窗口预测变化概率
+
+        窗口四周多读取halo个像素（不超出影像范围）一起推理，输出时裁掉，相邻窗口拼接处
+        没有卷积边缘效应。cache_features为True且网络支持编码/解码分离时，两个时相的编码特征
+        分别从缓存读取或计算后缓存，只对这一对运行解码器；否则读取窗口后调用predict。
+
+        Args:
+            before: 前时相影像路径或RasterReader
+            after: 后时相影像路径或RasterReader
+            window: (x, y, 宽度, 高度)，为None时为整幅影像
+            halo: 窗口四周额外读取的像素数
+            cva_scale: CVA归一化尺度，分块检测时传入整幅影像的尺度（见cva_scale）
+            cache_features: 是否缓存编码特征，只在同一影像参与多对比较（多时相检测）时有收益
+
+        Returns:
+            numpy.ndarray: 形状(H, W)的float32变化概率
+        """
+        before, after = open_raster(before), open_raster(after)
+        x, y, width, height = window if window else (0, 0, before.width, before.height)
+        left, top = max(0, x - halo), max(0, y - halo)
+        padded = (left, top, min(before.width, x + width + halo) - left, min(before.height, y + height + halo) - top)
+        if cache_features and self.supports_features():
+            prob = self.decode(self.encode_cached(before, padded), self.encode_cached(after, padded))
+        else:
+            prob = self.predict(before.read(padded), after.read(padded), cva_scale)
+        return prob[y - top:y - top + height, x - left:x - left + width]
+        
+    def cva_scale(self, before, after, region=None):
+        """
+        计算区域内CVA幅值的99%分位数，分块检测时各窗口使用同一归一化尺度
+
+        按窗口累计幅值直方图，不在内存中保留整幅影像的幅值。
+
+        Args:
+            before: 前时相影像路径或RasterReader
+            after: 后时相影像路径或RasterReader
+            region: (x, y, 宽度, 高度)，为None时为整幅影像
+
+        Returns:
+            float: 归一化尺度，网络可用时返回None
+        """
+        if self.load():
+            return None
+        before, after = open_raster(before), open_raster(after)
+        hist = np.zeros(CVA_BINS, dtype=np.int64)
+        with stage("detect.cva_scale"):
+            for window in detection_windows(region or (0, 0, before.width, before.height)):
+                magnitude = self._cva_magnitude(before.read(window), after.read(window))
+                levels = np.minimum((magnitude * CVA_BINS_PER_UNIT).astype(np.int64), CVA_BINS - 1)
+                hist += np.bincount(levels.ravel(), minlength=CVA_BINS)
+        total = int(hist.sum())
+        if total == 0:
+            return 0.0
+        # 取累计数达到99%的级别的上界
+        level = int(np.searchsorted(np.cumsum(hist), 0.99 * total))
+        return (level + 1) / CVA_BINS_PER_UNIT
+        
+    def encode_cached(self, reader, window=None):
+        """读取影像窗口的编码特征，缓存中没有时读取影像并编码"""
+        if self.feature_cache is None:
+            from .feature_cache import get_feature_cache
+            self.feature_cache = get_feature_cache()
+        key = self.feature_cache.key(reader.path, window, self.model_tag())
+        features, _ = self.feature_cache.get_or_compute(key, lambda: self.encode(reader.read(window)))
+        return features
+        
+    def encode(self, image):
+        """
+        运行编码器
+
+        Args:
+            image: RGB uint8数组，形状(H, W, 3)
+
+        Returns:
+            tuple: 各层特征，float16数组（去掉批次维），可直接缓存
+        """
+        import torch
+        net, device = self._network()
+        if net is None:
+            raise RuntimeError("网络权重不可用，无法单独运行编码器")
+        with torch.no_grad(), stage("detect.encoder", width=image.shape[1], height=image.shape[0]):
+            features = net.encode(self._to_tensor(image, device))
+            return tuple(f[0].to(torch.float16).cpu().numpy() for f in features)
+        
+    def decode(self, features_before, features_after):
+        """
+        融合两个时相的编码特征并输出变化概率
+
+        Returns:
+            numpy.ndarray: 形状(H, W)的float32变化概率
+        """
+        import torch
+        if [f.shape for f in features_before] != [f.shape for f in features_after]:
+            raise ValueError("前后时相影像尺寸不一致，编码特征形状不同")
+        net, device = self._network()
+        if net is None:
+            raise RuntimeError("网络权重不可用，无法单独运行解码器")
+        
+        def to_device(features):
+            return [torch.from_numpy(f).unsqueeze(0).to(device).float() for f in features]
+        
+        with torch.no_grad(), stage("detect.decoder"):
+            logits = net.decode(to_device(features_before), to_device(features_after))
+            return self._probability(logits)
+        
+    @staticmethod
+    def _to_tensor(array, device):
+        import torch
+        tensor = torch.from_numpy(np.ascontiguousarray(array.transpose(2, 0, 1))).float().div_(255.0)
+        return tensor.unsqueeze(0).to(device)
+        
+    @staticmethod
+    def _probability(logits):
+        import torch
+        # 兼容二分类双通道输出和单通道输出
+        if logits.shape[1] == 2:
+            prob = torch.softmax(logits, dim=1)[:, 1]
+        else:
+            prob = torch.sigmoid(logits[:, 0])
+        return prob[0].cpu().numpy().astype(np.float32)
+        
+    def _predict_net(self, net, device, before, after):
+        import torch
+        with torch.no_grad():
+            logits = net(self._to_tensor(before, device), self._to_tensor(after, device))
+            return self._probability(logits)
+        
+    @staticmethod
+    def _cva_magnitude(before, after):
+        """像素光谱差的幅值"""
+        diff = after.astype(np.float32) - before.astype(np.float32)
+        return np.sqrt(np.sum(diff * diff, axis=2))
         
-    # 其他模型方法...
+    def _predict_cva(self, before, after, scale=None):
+        """变化向量分析：以像素光谱差的幅值作为变化强度"""
+        magnitude = self._cva_magnitude(before, after)
+        # 以99%分位数归一化，避免少数极端像素压低整体概率；分块时使用整幅影像的尺度
+        if scale is None:
+            scale = float(np.percentile(magnitude, 99)) if magnitude.size else 0.0
+        if scale <= 0:
+            return np.zeros(magnitude.shape, dtype=np.float32)
+        return np.clip(magnitude / scale, 0.0, 1.0).astype(np.float32)
@@ -0,0 +1,207 @@
+"""
+编码特征缓存模块 - 缓存孪生网络编码器对每幅影像、每个窗口的输出特征
+
+同一幅基准影像与多个时相比较（T0与T1、T2、T3…）时，基准影像的编码特征只需计算一次，
+之后每一对只运行融合/解码部分。只有多时相检测使用该缓存，单次检测和批量处理的影像对
+各自只比较一次，缓存特征没有收益。特征以float16保存，键由影像路径、文件签名（大小和修改时间）、
+窗口和模型标识组成，影像被替换或换用其他权重后自动失效。
+
+缓存分两级：
+    内存    按最近最少使用（LRU）淘汰，容量由RSCD_FEATURE_CACHE_MB设置（默认512MB）
+    磁盘    RSCD_FEATURE_CACHE_DISK=1时，内存淘汰的特征写入工作空间cache/features目录的.npz文件，
+            由工作空间按配额淘汰；默认不写磁盘
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .job_manifest import file_signature
+from .trace_events import span
+from .workspace import KIND_CACHE, get_workspace
+
+DEFAULT_MEMORY_MB = 512
+
+
+class FeatureCache:
+    """两级编码特征缓存
+
+    用法:
+        cache = get_feature_cache()
+        key = cache.key(path, window, model_tag)
+        features = cache.get_or_compute(key, lambda: model.encode(image))
+    """
+
+    def __init__(self, memory_bytes=None, disk=None):
+        """
+        Args:
+            memory_bytes: 内存容量（字节），默认读取RSCD_FEATURE_CACHE_MB
+            disk: 内存淘汰的特征是否写入磁盘，默认读取RSCD_FEATURE_CACHE_DISK
+        """
+        if memory_bytes is None:
+            memory_bytes = int(float(os.environ.get("RSCD_FEATURE_CACHE_MB", DEFAULT_MEMORY_MB)) * 1024 * 1024)
+        if disk is None:
+            disk = os.environ.get("RSCD_FEATURE_CACHE_DISK", "0").strip().lower() in ("1", "true", "yes", "on")
+        self.memory_bytes = memory_bytes
+        self.disk = disk
+
+        self._entries = OrderedDict()  # 键 -> 特征元组，最久未使用的在最前面
+        self._size = 0
+        self._pending = {}  # 正在计算的键 -> threading.Event
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(path, window, model_tag):
+        """
+        生成缓存键
+
+        Args:
+            path: 影像路径
+            window: (x, y, 宽度, 高度)，整幅影像为None
+            model_tag: 模型标识，不同权重的特征互不复用
+        """
+        path = os.path.abspath(path)
+        text = f"{path}|{file_signature(path)}|{tuple(window) if window else None}|{model_tag}"
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _disk_path(self, key):
+        directory = os.path.join(get_workspace().directory(KIND_CACHE), "features")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{key}.npz")
+
+    @staticmethod
+    def _nbytes(features):
+        return sum(f.nbytes for f in features)
+
+    def get(self, key):
+        """读取缓存的特征，内存中没有时从磁盘读取，都没有时返回None"""
+        with self._lock:
+            features = self._entries.get(key)
+            if features is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return features
+        if self.disk:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    with span("features.load", "io"), np.load(path) as data:
+                        features = tuple(data[f"f{i}"] for i in range(len(data.files)))
+                    get_workspace().touch(path)
+                    with self._lock:
+                        self._disk_hits += 1
+                    self._store(key, features)
+                    return features
+                except (OSError, ValueError, KeyError) as e:
+                    logging.warning(f"读取特征缓存失败: {path}, 错误: {str(e)}")
+        return None
+
+    def put(self, key, features):
+        """保存特征（float16数组元组）"""
+        self._store(key, tuple(np.ascontiguousarray(f) for f in features))
+
+    def _store(self, key, features):
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= self._nbytes(old)
+            self._entries[key] = features
+            self._size += self._nbytes(features)
+            while self._size > self.memory_bytes and len(self._entries) > 1:
+                old_key, old_features = self._entries.popitem(last=False)
+                self._size -= self._nbytes(old_features)
+                evicted.append((old_key, old_features))
+        # 淘汰的特征在锁外写入磁盘
+        for old_key, old_features in evicted:
+            self._spill(old_key, old_features)
+
+    def _spill(self, key, features):
+        if not self.disk:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        temp_path = f"{path[:-4]}.part.npz"
+        try:
+            with span("features.spill", "io", bytes=self._nbytes(features)):
+                np.savez(temp_path, **{f"f{i}": f for i, f in enumerate(features)})
+                os.replace(temp_path, path)
+            get_workspace().register(path, KIND_CACHE)
+        except OSError as e:
+            logging.warning(f"写入特征缓存失败: {path}, 错误: {str(e)}")
+
+    def get_or_compute(self, key, compute):
+        """
+        读取特征，缓存中没有时调用compute()计算并保存
+
+        多个线程同时请求同一个键时只计算一次，其余线程等待结果。
+
+        Returns:
+            tuple: (特征元组, 是否命中缓存)
+        """
+        while True:
+            features = self.get(key)
+            if features is not None:
+                return features, True
+            with self._lock:
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    break
+            event.wait()
+        # 只有真正计算时才记为未命中，等待其他线程计算的结果不重复计数
+        with self._lock:
+            self._misses += 1
+        try:
+            features = tuple(compute())
+            self.put(key, features)
+            return features, False
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            event.set()
+
+    def stats(self):
+        """
+        返回缓存统计
+
+        Returns:
+            dict: entries、memory_bytes、hits（内存命中）、disk_hits、misses（实际计算的次数）
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "memory_bytes": self._size,
+                    "hits": self._hits, "disk_hits": self._disk_hits, "misses": self._misses}
+
+    def release_resources(self):
+        """
+        清空内存中的特征（磁盘上的特征由工作空间管理）
+
+        Returns:
+            int: 释放的内存字节数
+        """
+        with self._lock:
+            freed = self._size
+            self._entries.clear()
+            self._size = 0
+            return freed
+
+
+_feature_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_feature_cache():
+    """获取进程共享的特征缓存"""
+    global _feature_cache
+    with _cache_lock:
+        if _feature_cache is None:
+            from .artifact_registry import get_artifact_registry
+            _feature_cache = get_artifact_registry().track(FeatureCache())
+        return _feature_cache
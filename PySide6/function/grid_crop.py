@@ -1,4 +1,5 @@
 import os
+import logging
 import cv2
 import numpy as np
 from pathlib import Path
@@ -6,6 +7,11 @@ from PySide6.QtWidgets import QFileDialog, QInputDialog, QMessageBox
 from osgeo import gdal
 import traceback
 
+from .grid_cropping import CROP_MODE_PHYSICAL, CROP_MODE_STORE, CROP_MODE_VIRTUAL
+from .tile_store import DEFAULT_STORE_NAME, write_grid_store
+from .tile_writer import TileWriter
+from .virtual_tiles import write_virtual_grid
+
 class GridCrop:
     def __init__(self, navigation_functions):
         """
@@ -44,6 +50,13 @@ class GridCrop:
                 self.navigation_functions.log_message("未指定网格大小")
                 return []
             
+            # 选择裁剪方式：虚拟裁剪只写出VRT和瓦片索引，不复制像素
+            mode, ok = QInputDialog.getItem(None, "裁剪方式", "请选择裁剪方式:",
+                                            [CROP_MODE_PHYSICAL, CROP_MODE_VIRTUAL, CROP_MODE_STORE], 0, False)
+            if not ok:
+                self.navigation_functions.log_message("未选择裁剪方式")
+                return []
+            
             # 选择保存目录
             save_dir = QFileDialog.getExistingDirectory(None, "选择保存目录")
             if not save_dir:
@@ -58,8 +71,21 @@ class GridCrop:
             is_geotiff = file_path.lower().endswith(('.tif', '.tiff'))
             generated_files = []
             
+            if mode == CROP_MODE_VIRTUAL:
+                # 虚拟裁剪，检测时直接按窗口读取源影像
+                file_name = os.path.splitext(os.path.basename(file_path))[0]
+                generated_files, info = write_virtual_grid(file_path, grid_size, save_dir, f"{file_name}_grid")
+                self.navigation_functions.log_message(f"瓦片索引: {info['index_csv']}、{info['index_geojson']}")
+            elif mode == CROP_MODE_STORE:
+                # 不区分前后时相，每个源影像写入单独的HDF5文件（before组）；没有可显示的裁剪块
+                file_name = os.path.splitext(os.path.basename(file_path))[0]
+                store_path = os.path.join(save_dir, f"{file_name}_{DEFAULT_STORE_NAME}")
+                info = write_grid_store(file_path, grid_size, store_path, "before")
+                self.navigation_functions.log_message(
+                    f"分块存储完成: {store_path}，共 {info['count']} 个 {info['tile_width']}x{info['tile_height']} 瓦片")
+                return [store_path]
             # 尝试使用GDAL裁剪GeoTIFF文件
-            if is_geotiff:
+            elif is_geotiff:
                 try:
                     self.navigation_functions.log_message("检测到GeoTIFF文件，尝试使用GDAL进行裁剪...")
                     generated_files = self._crop_geotiff_grid(file_path, save_dir, grid_size)
@@ -146,37 +172,37 @@ class GridCrop:
             base_name = os.path.basename(image_path)
             file_name, ext = os.path.splitext(base_name)
             
-            # 裁剪并保存每个网格
-            for i in range(grid_size):
-                for j in range(grid_size):
-                    # 计算裁剪区域
-                    x = j * cell_width
-                    y = i * cell_height
-                    # 确保不会超出图像边界
-                    crop_width = min(cell_width, width - x)
-                    crop_height = min(cell_height, height - y)
-                    
-                    if crop_width <= 0 or crop_height <= 0:
-                        continue
-                    
-                    # 裁剪图像
-                    crop = img[y:y+crop_height, x:x+crop_width]
-                    
-                    # 构建输出文件名
-                    output_filename = f"{file_name}_grid_{i+1}_{j+1}{ext}"
-                    output_path = Path(save_dir) / output_filename
-                    
-                    try:
-                        # 使用imencode和tofile处理中文路径
-                        is_success, im_buf_arr = cv2.imencode(ext, crop)
-                        if is_success:
-                            im_buf_arr.tofile(str(output_path))
-                            self.navigation_functions.log_message(f"已保存: {output_path}")
-                            generated_files.append(str(output_path))
-                        else:
-                            self.navigation_functions.log_message(f"编码图像失败: {output_path}")
-                    except Exception as e:
-                        self.navigation_functions.log_message(f"保存图像失败: {str(e)}")
+            # 裁剪并保存每个网格，编码和写文件在线程池中并行完成
+            submitted = []
+            with TileWriter() as writer:
+                for i in range(grid_size):
+                    for j in range(grid_size):
+                        # 计算裁剪区域
+                        x = j * cell_width
+                        y = i * cell_height
+                        # 确保不会超出图像边界
+                        crop_width = min(cell_width, width - x)
+                        crop_height = min(cell_height, height - y)
+                        
+                        if crop_width <= 0 or crop_height <= 0:
+                            continue
+                        
+                        # 裁剪图像
+                        crop = img[y:y+crop_height, x:x+crop_width]
+                        
+                        # 构建输出文件名
+                        output_filename = f"{file_name}_grid_{i+1}_{j+1}{ext}"
+                        output_path = Path(save_dir) / output_filename
+                        submitted.append((output_path, writer.submit(str(output_path), crop)))
+            
+            for output_path, future in submitted:
+                try:
+                    future.result()
+                    self.navigation_functions.log_message(f"已保存: {output_path}", logging.DEBUG)
+                    generated_files.append(str(output_path))
+                except Exception as e:
+                    self.navigation_functions.log_message(f"保存图像失败: {str(e)}")
+            self.navigation_functions.log_message(writer.summary())
             
             return generated_files
             
@@ -229,36 +255,53 @@ class GridCrop:
             base_name = os.path.basename(geotiff_path)
             file_name, ext = os.path.splitext(base_name)
             
-            # 裁剪并保存每个网格
-            for i in range(grid_size):
-                for j in range(grid_size):
-                    # 计算裁剪区域
-                    x = j * cell_width
-                    y = i * cell_height
-                    # 确保不会超出图像边界
-                    crop_width = min(cell_width, width - x)
-                    crop_height = min(cell_height, height - y)
-                    
-                    if crop_width <= 0 or crop_height <= 0:
-                        continue
-                    
-                    try:
+            # 无效值按波段保留；投影与源影像一致
+            projection = ds.GetProjection()
+            nodata = [ds.GetRasterBand(band_idx).GetNoDataValue() for band_idx in range(1, bands_count + 1)]
+            
+            # 数据集只在当前线程按窗口读取（GDAL数据集不能跨线程共享），
+            # GeoTIFF编码和写文件在线程池中并行完成，压缩参数与其他裁剪方式一致
+            submitted = []
+            with TileWriter() as writer:
+                for i in range(grid_size):
+                    for j in range(grid_size):
+                        # 计算裁剪区域
+                        x = j * cell_width
+                        y = i * cell_height
+                        # 确保不会超出图像边界
+                        crop_width = min(cell_width, width - x)
+                        crop_height = min(cell_height, height - y)
+                        
+                        if crop_width <= 0 or crop_height <= 0:
+                            continue
+                        
                         # 构建输出文件名
                         output_filename = f"{file_name}_grid_{i+1}_{j+1}{ext}"
                         output_path = os.path.join(save_dir, output_filename)
                         
-                        # 使用GDAL的Translate方法裁剪并保存
-                        gdal.Translate(
-                            output_path, 
-                            ds, 
-                            srcWin=[x, y, crop_width, crop_height],
-                            options=gdal.TranslateOptions(format='GTiff')
-                        )
+                        # 网格左上角的地理坐标
+                        new_geotransform = None
+                        if geotransform is not None:
+                            new_geotransform = list(geotransform)
+                            new_geotransform[0] = geotransform[0] + x * geotransform[1] + y * geotransform[2]
+                            new_geotransform[3] = geotransform[3] + x * geotransform[4] + y * geotransform[5]
+                            new_geotransform = tuple(new_geotransform)
                         
-                        self.navigation_functions.log_message(f"已保存: {output_path}")
-                        generated_files.append(output_path)
-                    except Exception as e:
-                        self.navigation_functions.log_message(f"裁剪和保存网格 ({i+1},{j+1}) 时出错: {str(e)}")
+                        # 读取全部波段（保留原始数据类型）
+                        data = ds.ReadAsArray(x, y, crop_width, crop_height)
+                        data = data[..., None] if data.ndim == 2 else np.moveaxis(data, 0, -1)
+                        future = writer.submit_geotiff(output_path, data, new_geotransform, projection, nodata)
+                        submitted.append((i, j, output_path, future))
+            
+            # 按网格顺序收集结果
+            for i, j, output_path, future in submitted:
+                try:
+                    future.result()
+                    self.navigation_functions.log_message(f"已保存: {output_path}", logging.DEBUG)
+                    generated_files.append(output_path)
+                except Exception as e:
+                    self.navigation_functions.log_message(f"裁剪和保存网格 ({i+1},{j+1}) 时出错: {str(e)}")
+            self.navigation_functions.log_message(writer.summary())
             
             # 关闭数据集
             ds = None
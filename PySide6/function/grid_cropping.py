@@ -1,4 +1,5 @@
 import os
+import logging
 import sys
 import cv2
 import numpy as np
@@ -9,12 +10,26 @@ from pathlib import Path
 
 from PIL import Image
 from PySide6.QtWidgets import QFileDialog, QInputDialog, QMessageBox, QDialog, QVBoxLayout, QPushButton, QLabel, QHBoxLayout, QWidget
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QColor, QFont, QImage, QPainter, QPen, QPixmap
 from PySide6.QtWidgets import QApplication
 # from PySide6.theme_manager import ThemeManager
 # 使用相对导入
 from .theme_utils import ThemeManager
+from .tile_prefetcher import TilePrefetcher
+from .thumbnail_service import ThumbnailGridView
+from .telemetry import record_bytes, stage, timed
+from .raster_io import read_overview_rgb
+from .tile_store import DEFAULT_STORE_NAME, write_grid_store
+from .tile_writer import TileWriter
+from .virtual_tiles import write_virtual_grid
+
+CROP_MODE_PHYSICAL = "实体裁剪（写出裁剪块影像）"
+CROP_MODE_VIRTUAL = "虚拟裁剪（VRT和瓦片索引，不复制像素）"
+CROP_MODE_STORE = "分块存储（单个HDF5文件）"
+
+# 网格示意图的最长边（像素），按屏幕分辨率生成
+GRID_PREVIEW_MAX_EDGE = 1600
 
 class GridCropping:
     def __init__(self, navigation_functions):
@@ -45,6 +60,13 @@ class GridCropping:
             self.navigation_functions.log_message("未设置网格参数，裁剪操作取消")
             return
         
+        # 选择裁剪方式：虚拟裁剪只写出VRT和瓦片索引，不复制像素
+        mode, ok = QInputDialog.getItem(None, "网格裁剪设置", "请选择裁剪方式:",
+                                        [CROP_MODE_PHYSICAL, CROP_MODE_VIRTUAL, CROP_MODE_STORE], 0, False)
+        if not ok:
+            self.navigation_functions.log_message("未选择裁剪方式，裁剪操作取消")
+            return
+        
         # 让用户选择保存的目标文件夹
         save_dir = QFileDialog.getExistingDirectory(None, "选择保存裁剪结果的文件夹")
         if not save_dir:
@@ -60,7 +82,15 @@ class GridCropping:
             last_files = []
             
             # 处理不同类型的图像
-            if file_ext in ['.tif', '.tiff']:
+            if mode == CROP_MODE_VIRTUAL:
+                last_files = self._crop_virtual_grid(file_path, grid_size, save_dir, is_before)
+                if last_files:
+                    grid_preview_path = self._generate_grid_preview(file_path, grid_size, save_dir)
+            elif mode == CROP_MODE_STORE:
+                # 分块存储没有单独的裁剪块文件，只提供网格示意图
+                if self._crop_to_store(file_path, grid_size, save_dir, is_before):
+                    grid_preview_path = self._generate_grid_preview(file_path, grid_size, save_dir)
+            elif file_ext in ['.tif', '.tiff']:
                 # 处理GeoTIFF格式
                 self.navigation_functions.log_message("检测到GeoTIFF格式，使用GDAL处理...")
                 last_files = self._crop_geotiff_grid(file_path, grid_size, save_dir, is_before)
@@ -124,6 +154,7 @@ class GridCropping:
                 btn_preview.setStyleSheet(button_style)
                 btn_cropped.setStyleSheet(button_style)
                 btn_cancel.setStyleSheet(button_style)
+                btn_cropped.setEnabled(bool(last_files))
                 
                 # 添加按钮到布局
                 button_layout.addStretch()
@@ -166,7 +197,7 @@ class GridCropping:
         # 导入Qt库
         from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QScrollArea, QWidget, QHBoxLayout
         from PySide6.QtCore import Qt, QSize
-        from PySide6.QtGui import QPixmap, QImage
+        from PySide6.QtGui import QPixmap, QKeySequence, QShortcut
         
         # 检查是否使用深色主题
         is_dark_theme = hasattr(self.navigation_functions, 'is_dark_theme') and self.navigation_functions.is_dark_theme
@@ -217,6 +248,14 @@ class GridCropping:
         # 添加图像容器到主布局
         main_layout.addWidget(image_container)
         
+        # 创建缩略图条，只为可见的缩略图生成图像，点击可跳转到对应裁剪块
+        thumbnail_strip = ThumbnailGridView(max_edge=96, wrapping=False)
+        thumbnail_strip.setFixedHeight(140)
+        thumbnail_strip.setFocusPolicy(Qt.NoFocus)  # 方向键留给翻页快捷键
+        thumbnail_strip.setStyleSheet(ThemeManager.get_list_widget_style(is_dark_theme))
+        thumbnail_strip.set_paths(file_list)
+        main_layout.addWidget(thumbnail_strip)
+        
         # 创建导航按钮容器
         nav_container = QWidget()
         nav_container.setStyleSheet(ThemeManager.get_container_style(is_dark_theme))
@@ -240,6 +279,22 @@ class GridCropping:
         current_index = [0]  # 使用列表以便在闭包中修改
         total_images = len(file_list)
         
+        # 后台预取前后相邻的裁剪块，翻页时直接从缓存取图
+        prefetcher = TilePrefetcher(file_list, radius=4, capacity=32)
+        
+        def show_tile(qimg):
+            if qimg.isNull():
+                image_label.setText("无法加载图像")
+            else:
+                image_label.setPixmap(QPixmap.fromImage(qimg))
+        
+        def on_tile_ready(index, qimg):
+            # 只显示当前索引的图像，快速翻页时跳过已经翻过的图像
+            if index == current_index[0]:
+                show_tile(qimg)
+        
+        prefetcher.image_ready.connect(on_tile_ready)
+        
         # 更新图像显示函数
         def update_image_display():
             if not file_list or current_index[0] >= len(file_list):
@@ -250,21 +305,13 @@ class GridCropping:
             
             # 更新信息文本
             info_label.setText(f"图像 {current_index[0]+1}/{total_images}: {file_name}")
+            thumbnail_strip.select_row(current_index[0])
             
-            # 加载并显示图像
-            try:
-                img = cv2.imread(current_path)
-                if img is not None:
-                    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                    qimg = QImage(img.data, img.shape[1], img.shape[0], img.shape[1] * 3, QImage.Format_RGB888)
-                    pixmap = QPixmap.fromImage(qimg)
-                    
-                    # 调整图像大小以适应显示区域，保持宽高比
-                    image_label.setPixmap(pixmap.scaled(image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
-                else:
-                    image_label.setText("无法加载图像")
-            except Exception as e:
-                image_label.setText(f"加载错误: {str(e)}")
+            # 从预取缓存获取已缩放到显示区域大小的图像，未命中时等待image_ready信号
+            prefetcher.set_target_size(image_label.size())
+            qimg = prefetcher.request(current_index[0])
+            if qimg is not None:
+                show_tile(qimg)
         
         # 设置按钮点击事件
         def on_prev_clicked():
@@ -279,6 +326,16 @@ class GridCropping:
         btn_prev.clicked.connect(on_prev_clicked)
         btn_next.clicked.connect(on_next_clicked)
         
+        def on_thumbnail_activated(row, path):
+            current_index[0] = row
+            update_image_display()
+        
+        thumbnail_strip.thumbnail_activated.connect(on_thumbnail_activated)
+        
+        # 方向键翻页，长按时快捷键自动重复触发
+        QShortcut(QKeySequence(Qt.Key_Left), browser, on_prev_clicked)
+        QShortcut(QKeySequence(Qt.Key_Right), browser, on_next_clicked)
+        
         # 添加按钮到导航布局
         nav_layout.addStretch()
         nav_layout.addWidget(btn_prev)
@@ -334,6 +391,9 @@ class GridCropping:
         
         # 显示对话框
         browser.exec()
+        
+        # 关闭浏览器后停止预取并释放缓存
+        prefetcher.shutdown()
     
     def _show_preview_image(self, image_path, parent_dialog=None):
         """显示网格预览图像
@@ -576,8 +636,9 @@ class GridCropping:
         # 显示对话框
         browser.exec()
     
+    @timed("crop.preview")
     def _generate_grid_preview(self, file_path, grid_size, save_dir):
-        """生成网格划分示意图，在原图上绘制网格并保存
+        """生成网格划分示意图：按屏幕分辨率读取缩小的影像，用QPainter绘制网格和编号后保存为PNG
         
         Args:
             file_path: 原始图像路径
@@ -594,92 +655,64 @@ class GridCropping:
             
             self.navigation_functions.log_message(f"正在生成网格示意图...")
             
-            # 读取原始图像
+            # 从金字塔或缩小解码读取预览，不再解码全分辨率影像
             try:
-                img_pil = Image.open(file_path_obj)
-                img = np.array(img_pil)
-                if len(img.shape) == 3 and img.shape[2] == 3:
-                    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)  # PIL是RGB，OpenCV是BGR
+                preview, (width, height) = read_overview_rgb(str(file_path_obj), GRID_PREVIEW_MAX_EDGE)
             except Exception as e:
-                self.navigation_functions.log_message(f"使用PIL读取失败: {str(e)}，尝试使用OpenCV")
-                img = cv2.imread(str(file_path_obj))
-            
-            if img is None:
-                self.navigation_functions.log_message(f"无法读取图像，无法生成网格示意图")
+                self.navigation_functions.log_message(f"无法读取图像，无法生成网格示意图: {str(e)}")
                 return None
+            preview_height, preview_width = preview.shape[:2]
+            image = QImage(preview.data, preview_width, preview_height, preview_width * 3,
+                           QImage.Format_RGB888).convertToFormat(QImage.Format_ARGB32_Premultiplied)
             
-            # 获取图像尺寸
-            height, width = img.shape[:2]
-            
-            # 创建原始图像的副本
-            grid_preview = img.copy()
-            
-            # 计算每个网格的大小
+            # 网格按原始尺寸划分（与裁剪一致），再按预览比例换算
+            scale_x = preview_width / width
+            scale_y = preview_height / height
             grid_width = width // grid_size
             grid_height = height // grid_size
+            cell_width = grid_width * scale_x
+            cell_height = grid_height * scale_y
             
-            # 设置网格线的颜色和粗细，颜色是BGR格式
-            line_color = (0, 0, 255)  # 红色线条 (BGR)
-            line_thickness = max(2, min(width, height) // 200)  # 加粗线条
-            
-            # 设置文字样式，使文字为红色
-            text_color = (0, 0, 255)  # 红色文字 (BGR)
-            # 使用更精致的字体 - FONT_HERSHEY_SIMPLEX比较美观，或者尝试FONT_HERSHEY_TRIPLEX
-            font = cv2.FONT_HERSHEY_TRIPLEX  
-            font_scale = max(0.5, min(width, height) / 600)  # 字体稍大一些
-            font_thickness = max(1, min(width, height) // 500)  # 字体粗细
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setRenderHint(QPainter.TextAntialiasing)
             
-            # 绘制水平线
+            # 红色网格线，线宽随预览尺寸变化
+            pen = QPen(QColor(255, 0, 0))
+            pen.setWidthF(max(1.5, min(preview_width, preview_height) / 400))
+            painter.setPen(pen)
             for i in range(1, grid_size):
-                y = i * grid_height
-                cv2.line(grid_preview, (0, y), (width, y), line_color, line_thickness)
+                y = i * cell_height
+                painter.drawLine(QPointF(0, y), QPointF(preview_width, y))
+                x = i * cell_width
+                painter.drawLine(QPointF(x, 0), QPointF(x, preview_height))
             
-            # 绘制垂直线
-            for i in range(1, grid_size):
-                x = i * grid_width
-                cv2.line(grid_preview, (x, 0), (x, height), line_color, line_thickness)
-            
-            # 每个网格添加索引标签
+            # 每个网格添加索引标签，字号按网格大小调整
+            font = QFont()
+            font.setPixelSize(max(9, int(min(cell_width, cell_height) / 6)))
+            painter.setFont(font)
             for row in range(grid_size):
                 for col in range(grid_size):
-                    # 计算文本位置
-                    text_x = col * grid_width + grid_width // 10  # 动态调整文本位置
-                    text_y = row * grid_height + grid_height // 6  # 动态调整文本位置
-                    
-                    # 添加网格索引文本 - 直接添加，不使用背景
-                    text = f"{row+1}_{col+1}"
-                    cv2.putText(grid_preview, text, 
-                               (text_x, text_y), font, font_scale, text_color, 
-                               font_thickness, cv2.LINE_AA)
-            
-            # 创建输出文件名
-            filename = file_path_obj.stem
-            ext = file_path_obj.suffix
-            output_filename = f"{filename}_grid_preview{ext}"
-            output_path = save_dir_obj / output_filename
+                    text_x = col * cell_width + cell_width / 10
+                    text_y = row * cell_height + cell_height / 6
+                    painter.drawText(QPointF(text_x, text_y), f"{row+1}_{col+1}")
+            painter.end()
+            
+            # 创建输出文件名，示意图统一保存为PNG
+            output_path = save_dir_obj / f"{file_path_obj.stem}_grid_preview.png"
             
             # 确保保存目录存在
             if not save_dir_obj.exists():
                 save_dir_obj.mkdir(parents=True, exist_ok=True)
-                
-            # 保存示意图
-            try:
-                # 使用PIL保存，避免中文路径问题
-                grid_preview_rgb = cv2.cvtColor(grid_preview, cv2.COLOR_BGR2RGB)
-                img_pil = Image.fromarray(grid_preview_rgb)
-                img_pil.save(str(output_path))
-                self.navigation_functions.log_message(f"网格示意图已保存到: {output_path}")
-                return str(output_path)
-            except Exception as e:
-                self.navigation_functions.log_message(f"PIL保存网格示意图失败: {str(e)}，尝试使用OpenCV")
-                try:
-                    # 如果PIL保存失败，尝试使用OpenCV
-                    cv2.imwrite(str(output_path), grid_preview)
-                    self.navigation_functions.log_message(f"使用OpenCV保存网格示意图: {output_path}")
-                    return str(output_path)
-                except Exception as e2:
-                    self.navigation_functions.log_message(f"保存网格示意图失败: {str(e2)}")
-                    return None
+            
+            # QImage.save支持中文路径
+            if not image.save(str(output_path), "PNG"):
+                self.navigation_functions.log_message(f"保存网格示意图失败: {output_path}")
+                return None
+            self.navigation_functions.log_message(
+                f"网格示意图已保存到: {output_path} ({preview_width}x{preview_height}, 原图 {width}x{height})")
+            record_bytes(written=os.path.getsize(output_path))
+            return str(output_path)
                 
         except Exception as e:
             self.navigation_functions.log_message(f"生成网格示意图时出错: {str(e)}")
@@ -687,6 +720,7 @@ class GridCropping:
             self.navigation_functions.log_message(traceback.format_exc())
             return None
             
+    @timed("crop.cv2")
     def _crop_image_grid_cv2(self, file_path, grid_size, save_dir, is_before=True):
         """使用OpenCV将普通图像裁剪为网格
         
@@ -703,6 +737,7 @@ class GridCropping:
             
             # 记录日志
             self.navigation_functions.log_message(f"使用OpenCV裁剪图像: {file_path_obj}")
+            record_bytes(read=os.path.getsize(file_path))
             
             # 使用PIL读取图像以避免中文路径问题
             try:
@@ -710,6 +745,8 @@ class GridCropping:
                 img = np.array(img_pil)
                 if len(img.shape) == 3 and img.shape[2] == 3:
                     img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)  # PIL是RGB，OpenCV是BGR
+                elif len(img.shape) == 3 and img.shape[2] == 4:
+                    img = cv2.cvtColor(img, cv2.COLOR_RGBA2BGRA)
                 self.navigation_functions.log_message("使用PIL成功读取图像")
             except Exception as e:
                 self.navigation_functions.log_message(f"使用PIL读取失败: {str(e)}，尝试使用OpenCV")
@@ -748,50 +785,44 @@ class GridCropping:
                 save_dir_obj.mkdir(parents=True, exist_ok=True)
                 self.navigation_functions.log_message(f"创建保存目录: {save_dir_obj}")
             
-            # 裁剪并保存每个网格
+            # 裁剪并保存每个网格，编码和写文件在线程池中并行完成
             count = 0
-            for row in range(grid_size):
-                for col in range(grid_size):
-                    count += 1
-                    
-                    # 计算当前网格的坐标
-                    x_start = col * grid_width
-                    y_start = row * grid_height
-                    
-                    # 确保不超出图像边界
-                    current_width = min(grid_width, width - x_start)
-                    current_height = min(grid_height, height - y_start)
-                    
-                    if current_width <= 0 or current_height <= 0:
-                        continue  # 跳过无效的网格
-                    
-                    # 裁剪当前网格
-                    crop_img = img[y_start:y_start+current_height, x_start:x_start+current_width]
-                    
-                    # 创建输出文件名
-                    output_filename = f"{prefix}_{row+1}_{col+1}{ext}"
-                    output_path = save_dir_obj / output_filename
-                    
-                    # 保存裁剪结果
-                    try:
-                        # 使用PIL保存，以避免中文路径问题
-                        if len(crop_img.shape) == 3 and crop_img.shape[2] == 3:
-                            crop_img_rgb = cv2.cvtColor(crop_img, cv2.COLOR_BGR2RGB)
-                        else:
-                            crop_img_rgb = crop_img
-                        img_pil = Image.fromarray(crop_img_rgb)
-                        img_pil.save(str(output_path))
-                        self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 到: {output_path}")
-                        generated_files.append(str(output_path))
-                    except Exception as e:
-                        self.navigation_functions.log_message(f"PIL保存失败: {str(e)}，尝试使用OpenCV")
-                        try:
-                            # 如果PIL保存失败，尝试使用OpenCV（虽然对中文路径支持可能有问题）
-                            cv2.imwrite(str(output_path), crop_img)
-                            self.navigation_functions.log_message(f"使用OpenCV保存网格 {row+1}_{col+1} 到: {output_path}")
-                            generated_files.append(str(output_path))
-                        except Exception as e2:
-                            self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 失败: {str(e2)}")
+            submitted = []
+            with TileWriter() as writer:
+                for row in range(grid_size):
+                    with stage("crop.tile_row", row=row + 1):
+                        for col in range(grid_size):
+                            count += 1
+                        
+                            # 计算当前网格的坐标
+                            x_start = col * grid_width
+                            y_start = row * grid_height
+                        
+                            # 确保不超出图像边界
+                            current_width = min(grid_width, width - x_start)
+                            current_height = min(grid_height, height - y_start)
+                        
+                            if current_width <= 0 or current_height <= 0:
+                                continue  # 跳过无效的网格
+                        
+                            # 裁剪当前网格
+                            crop_img = img[y_start:y_start+current_height, x_start:x_start+current_width]
+                        
+                            # 创建输出文件名
+                            output_filename = f"{prefix}_{row+1}_{col+1}{ext}"
+                            output_path = save_dir_obj / output_filename
+                            submitted.append((row, col, output_path, writer.submit(str(output_path), crop_img)))
+            
+            # 按网格顺序收集结果
+            for row, col, output_path, future in submitted:
+                try:
+                    future.result()
+                    self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 到: {output_path}", logging.DEBUG)
+                    generated_files.append(str(output_path))
+                    record_bytes(written=os.path.getsize(output_path))
+                except Exception as e:
+                    self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 失败: {str(e)}")
+            self.navigation_functions.log_message(writer.summary())
             
             self.navigation_functions.log_message(f"网格裁剪完成，共生成 {count} 个子图像，保存在: {save_dir_obj}")
             
@@ -803,6 +834,7 @@ class GridCropping:
             self.navigation_functions.log_message(traceback.format_exc())
             return []
 
+    @timed("crop.geotiff")
     def _crop_geotiff_grid(self, file_path, grid_size, save_dir, is_before=True):
         """使用GDAL将GeoTIFF图像裁剪为网格
         
@@ -821,6 +853,7 @@ class GridCropping:
             
             # 记录日志
             self.navigation_functions.log_message(f"使用GDAL裁剪GeoTIFF图像: {file_path_obj}")
+            record_bytes(read=os.path.getsize(file_path))
             
             # 打开数据集 - 使用字符串路径但先进行规范化
             ds = gdal.Open(str(file_path_obj.resolve()), gdal.GA_ReadOnly)
@@ -861,82 +894,60 @@ class GridCropping:
                 save_dir_obj.mkdir(parents=True, exist_ok=True)
                 self.navigation_functions.log_message(f"创建保存目录: {save_dir_obj}")
             
-            # 创建驱动程序
-            driver = gdal.GetDriverByName('GTiff')
+            # 无效值按波段保留
+            nodata = [ds.GetRasterBand(band_idx).GetNoDataValue() for band_idx in range(1, bands + 1)]
             
-            # 裁剪并保存每个网格
+            # 裁剪并保存每个网格：数据集只在当前线程读取（GDAL数据集不能跨线程共享），
+            # GeoTIFF编码和写文件在线程池中并行完成
             count = 0
-            for row in range(grid_size):
-                for col in range(grid_size):
-                    count += 1
-                    
-                    # 计算当前网格的坐标
-                    x_start = col * grid_width
-                    y_start = row * grid_height
-                    
-                    # 确保不超出图像边界
-                    current_width = min(grid_width, width - x_start)
-                    current_height = min(grid_height, height - y_start)
-                    
-                    if current_width <= 0 or current_height <= 0:
-                        continue  # 跳过无效的网格
-                    
-                    # 创建输出文件名
-                    output_filename = f"{prefix}_{row+1}_{col+1}{ext}"
-                    output_path = save_dir_obj / output_filename
-                    output_path_str = str(output_path.resolve())  # 获取规范化的绝对路径
-                    
-                    # 创建目标数据集
-                    try:
-                        # 使用规范化的绝对路径，避免中文路径问题
-                        dst_ds = driver.Create(output_path_str, current_width, current_height, bands, gdal.GDT_Byte)
+            submitted = []
+            with TileWriter() as writer:
+                for row in range(grid_size):
+                    with stage("crop.geotiff_row", row=row + 1):
+                        for col in range(grid_size):
+                            count += 1
+                        
+                            # 计算当前网格的坐标
+                            x_start = col * grid_width
+                            y_start = row * grid_height
+                        
+                            # 确保不超出图像边界
+                            current_width = min(grid_width, width - x_start)
+                            current_height = min(grid_height, height - y_start)
+                        
+                            if current_width <= 0 or current_height <= 0:
+                                continue  # 跳过无效的网格
                         
-                        # 计算新的地理变换参数
-                        if geo_transform is not None:
-                            new_geo_transform = list(geo_transform)
-                            # 调整左上角x坐标
-                            new_geo_transform[0] = geo_transform[0] + x_start * geo_transform[1]
-                            # 调整左上角y坐标
-                            new_geo_transform[3] = geo_transform[3] + y_start * geo_transform[5]
-                            dst_ds.SetGeoTransform(tuple(new_geo_transform))
-                            
-                        # 设置投影
-                        if projection:
-                            dst_ds.SetProjection(projection)
-                            
-                        # 复制波段数据
-                        for band_idx in range(1, bands + 1):
-                            band = ds.GetRasterBand(band_idx)
-                            data = band.ReadAsArray(x_start, y_start, current_width, current_height)
-                            dst_band = dst_ds.GetRasterBand(band_idx)
-                            dst_band.WriteArray(data)
-                            
-                        # 清理资源
-                        dst_ds = None
-                        self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 到: {output_path}")
-                        generated_files.append(str(output_path))
-                    except Exception as e:
-                        self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 失败: {str(e)}")
-                        # 尝试使用替代方法保存
-                        try:
-                            # 读取数据到内存
-                            data_arrays = []
-                            for band_idx in range(1, bands + 1):
-                                band = ds.GetRasterBand(band_idx)
-                                data_arrays.append(band.ReadAsArray(x_start, y_start, current_width, current_height))
-                            
-                            # 如果是标准RGB图像（3波段），使用PIL保存
-                            if bands == 3:
-                                # 组合数组并转换为PIL图像
-                                img_array = np.dstack(data_arrays)
-                                img_pil = Image.fromarray(img_array)
-                                img_pil.save(str(output_path))
-                                self.navigation_functions.log_message(f"使用PIL保存网格 {row+1}_{col+1} 到: {output_path}")
-                                generated_files.append(str(output_path))
-                            else:
-                                self.navigation_functions.log_message(f"无法使用替代方法保存非RGB的GeoTIFF图像")
-                        except Exception as e2:
-                            self.navigation_functions.log_message(f"使用替代方法保存失败: {str(e2)}")
+                            # 创建输出文件名
+                            output_filename = f"{prefix}_{row+1}_{col+1}{ext}"
+                            output_path = save_dir_obj / output_filename
+                        
+                            # 计算新的地理变换参数：调整左上角坐标
+                            new_geo_transform = None
+                            if geo_transform is not None:
+                                new_geo_transform = list(geo_transform)
+                                new_geo_transform[0] = geo_transform[0] + x_start * geo_transform[1]
+                                new_geo_transform[3] = geo_transform[3] + y_start * geo_transform[5]
+                                new_geo_transform = tuple(new_geo_transform)
+                        
+                            # 读取全部波段（保留原始数据类型）
+                            data = ds.ReadAsArray(x_start, y_start, current_width, current_height)
+                            data = data[..., None] if data.ndim == 2 else np.moveaxis(data, 0, -1)
+                            # 使用规范化的绝对路径，避免中文路径问题
+                            future = writer.submit_geotiff(str(output_path.resolve()), data, new_geo_transform,
+                                                           projection, nodata)
+                            submitted.append((row, col, output_path, future))
+            
+            # 按网格顺序收集结果
+            for row, col, output_path, future in submitted:
+                try:
+                    future.result()
+                    self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 到: {output_path}", logging.DEBUG)
+                    generated_files.append(str(output_path))
+                    record_bytes(written=os.path.getsize(output_path))
+                except Exception as e:
+                    self.navigation_functions.log_message(f"保存网格 {row+1}_{col+1} 失败: {str(e)}")
+            self.navigation_functions.log_message(writer.summary())
             
             # 清理资源
             ds = None
@@ -951,6 +962,71 @@ class GridCropping:
             self.navigation_functions.log_message(traceback.format_exc())
             return []
 
+    @timed("crop.virtual")
+    def _crop_virtual_grid(self, file_path, grid_size, save_dir, is_before=True):
+        """虚拟裁剪：每个网格块写成引用源影像窗口的VRT，并写出CSV和GeoJSON瓦片索引
+        
+        Returns:
+            list: 生成的VRT文件路径列表
+        """
+        try:
+            self.navigation_functions.log_message(f"虚拟裁剪图像: {file_path}")
+            prefix = f"{'before' if is_before else 'after'}_grid"
+            generated_files, info = write_virtual_grid(file_path, grid_size, save_dir, prefix)
+            
+            # 存储原始图像尺寸信息
+            if is_before:
+                self.navigation_functions.before_image_original_size = (info["width"], info["height"])
+            else:
+                self.navigation_functions.after_image_original_size = (info["width"], info["height"])
+            
+            self.navigation_functions.log_message(f"原始图像尺寸: {info['width']}x{info['height']}, 波段数: {info['bands']}")
+            self.navigation_functions.log_message(f"每个网格尺寸: {info['width'] // grid_size}x{info['height'] // grid_size}")
+            self.navigation_functions.log_message(
+                f"虚拟裁剪完成，共生成 {len(generated_files)} 个VRT，瓦片索引: {info['index_csv']}、{info['index_geojson']}")
+            return generated_files
+        except Exception as e:
+            self.navigation_functions.log_message(f"虚拟裁剪图像时出错: {str(e)}")
+            import traceback
+            self.navigation_functions.log_message(traceback.format_exc())
+            return []
+
+    @timed("crop.store")
+    def _crop_to_store(self, file_path, grid_size, save_dir, is_before=True):
+        """网格裁剪并写入save_dir中的HDF5瓦片存储，前后时相分别保存为before、after组
+        
+        Returns:
+            str: 存储文件路径，失败时返回None
+        """
+        try:
+            store_path = os.path.join(save_dir, DEFAULT_STORE_NAME)
+            phase = "before" if is_before else "after"
+            self.navigation_functions.log_message(f"写入分块瓦片存储: {store_path} [{phase}]")
+            record_bytes(read=os.path.getsize(file_path))
+            
+            def on_progress(done, total):
+                self.navigation_functions.log_message(f"已写入 {done}/{total} 个瓦片", logging.DEBUG)
+            
+            info = write_grid_store(file_path, grid_size, store_path, phase, progress=on_progress)
+            record_bytes(written=info["bytes_written"])
+            
+            # 存储原始图像尺寸信息
+            if is_before:
+                self.navigation_functions.before_image_original_size = (info["width"], info["height"])
+            else:
+                self.navigation_functions.after_image_original_size = (info["width"], info["height"])
+            
+            self.navigation_functions.log_message(f"原始图像尺寸: {info['width']}x{info['height']}, 波段数: {info['channels']}")
+            self.navigation_functions.log_message(
+                f"分块存储完成，共 {info['count']} 个 {info['tile_width']}x{info['tile_height']} 瓦片 ({info['dtype']})，"
+                f"文件大小 {info['bytes_written'] / (1024 * 1024):.2f} MB")
+            return store_path
+        except Exception as e:
+            self.navigation_functions.log_message(f"写入分块瓦片存储时出错: {str(e)}")
+            import traceback
+            self.navigation_functions.log_message(traceback.format_exc())
+            return None
+
     def _load_as_time(self, image_path, is_before, dialog=None):
         """加载图像为特定时相
         
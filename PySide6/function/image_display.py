@@ -7,6 +7,9 @@ from PySide6.QtGui import QPixmap, QImage
 from PySide6.QtCore import Qt
 import cv2
 
+from .raster_io import read_rgb
+from .telemetry import record_bytes, stage, timed
+
 class ImageDisplay:
     def __init__(self, navigation_functions):
         """
@@ -17,6 +20,7 @@ class ImageDisplay:
         """
         self.navigation_functions = navigation_functions
         
+    @timed("display.load_image")
     def display_image(self, file_path, is_before=True):
         """
         显示图像
@@ -26,8 +30,10 @@ class ImageDisplay:
             is_before: 是否为前时相图像
         """
         try:
-            # 优先使用GDAL处理GeoTIFF文件
-            if file_path.lower().endswith(('.tif', '.tiff')):
+            record_bytes(read=os.path.getsize(file_path))
+            
+            # 优先使用GDAL处理GeoTIFF文件和虚拟裁剪块（VRT）
+            if file_path.lower().endswith(('.tif', '.tiff', '.vrt')):
                 self.navigation_functions.log_message(f"检测到TIFF格式图像，使用GDAL进行处理...")
                 
                 try:
@@ -226,7 +232,7 @@ class ImageDisplay:
                     
                     # 回退到常规方法
                     self.navigation_functions.log_message("尝试使用常规方法加载图像...")
-                    pixmap = QPixmap(file_path)
+                    pixmap = self._virtual_tile_pixmap(file_path) if file_path.lower().endswith('.vrt') else QPixmap(file_path)
             else:
                 # 非TIFF格式，使用常规方法
                 pixmap = QPixmap(file_path)
@@ -237,7 +243,8 @@ class ImageDisplay:
                 
                 # 设置图像到可缩放标签
                 if hasattr(label, 'set_pixmap'):
-                    label.set_pixmap(pixmap)
+                    with stage("display.render", width=pixmap.width(), height=pixmap.height()):
+                        label.set_pixmap(pixmap)
                     self.navigation_functions.log_message(f"{'前' if is_before else '后'}时相影像加载成功 (放大图像后，双击可恢复原始视图)")
                 else:
                     # 如果标签不是可缩放标签，则直接设置
@@ -259,6 +266,13 @@ class ImageDisplay:
             import traceback
             self.navigation_functions.log_message(traceback.format_exc())
             
+    def _virtual_tile_pixmap(self, file_path):
+        """GDAL不可用时，按虚拟裁剪块引用的源影像窗口读取并转换为QPixmap"""
+        img_array = read_rgb(file_path)
+        height, width = img_array.shape[:2]
+        q_img = QImage(img_array.data, width, height, 3 * width, QImage.Format_RGB888)
+        return QPixmap.fromImage(q_img.copy())
+    
     def read_geotiff_info(self, image_path):
         """
         读取图像信息，返回图像数据和地理变换参数
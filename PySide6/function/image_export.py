@@ -1,15 +1,17 @@
 import os
 import sys
-import shutil
+import time
 from pathlib import Path
 
 # 添加项目根目录到Python路径
 # sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from PySide6.QtWidgets import QFileDialog, QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QWidget
+from PySide6.QtWidgets import (QFileDialog, QMessageBox, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QWidget,
+                               QInputDialog, QProgressDialog, QApplication)
 from PySide6.QtCore import Qt
 # 从theme_utils导入ThemeManager
 from .theme_utils import ThemeManager
+from .raster_io import EXPORT_FORMATS, convert_raster, export_format_for
 
 class ImageExport:
     def __init__(self, navigation_functions):
@@ -20,7 +22,6 @@ class ImageExport:
             navigation_functions: NavigationFunctions实例，用于日志记录和图像显示
         """
         self.navigation_functions = navigation_functions
-        self.temp_output_dir = "D:/VS_WORKBASE/PySide6/遥感影像变化检测系统V2.0/output_image"
     
     def export_result_image(self, result_image_path=None):
         """
@@ -43,38 +44,76 @@ class ImageExport:
                 self._show_styled_message_box("导出失败", "没有可导出的结果图像，请先执行变化检测。", "warning")
                 return False
                 
-            # 获取原始文件名
-            original_filename = os.path.basename(result_image_path)
+            # 获取原始文件名，默认导出为GeoTIFF
+            original_name = os.path.splitext(os.path.basename(result_image_path))[0]
             
             # 弹出文件保存对话框
+            filters = {
+                "GeoTIFF/COG (*.tif *.tiff)": "GeoTIFF",
+                "JPEG (*.jpg *.jpeg)": "JPEG",
+                "PNG (*.png)": "PNG",
+                "GeoPackage (*.gpkg)": "GeoPackage",
+            }
             options = QFileDialog.Options()
-            save_path, _ = QFileDialog.getSaveFileName(
+            save_path, selected_filter = QFileDialog.getSaveFileName(
                 None,
                 "保存检测结果",
-                original_filename,
-                "图像文件 (*.png *.jpg *.jpeg *.tif *.tiff);;所有文件 (*)",
+                original_name + EXPORT_FORMATS["GeoTIFF"][0],
+                ";;".join(filters),
                 options=options
             )
             
             if not save_path:
                 self.navigation_functions.log_message("用户取消导出操作")
                 return False
+            
+            # 以扩展名为准确定导出格式，扩展名无法识别时使用所选的过滤器并补全扩展名
+            format_name = export_format_for(save_path)
+            if format_name is None:
+                format_name = filters.get(selected_filter, "GeoTIFF")
+                save_path += EXPORT_FORMATS[format_name][0]
+            
+            png_level, jpeg_quality = 6, 90
+            if format_name == "PNG":
+                png_level, ok = QInputDialog.getInt(None, "PNG压缩级别", "请输入压缩级别(0-9，越大文件越小、越慢)", 6, 0, 9, 1)
+                if not ok:
+                    return False
+            elif format_name == "JPEG":
+                jpeg_quality, ok = QInputDialog.getInt(None, "JPEG质量", "请输入图像质量(1-100)", 90, 1, 100, 1)
+                if not ok:
+                    return False
                 
             # 确保目标目录存在
             target_dir = os.path.dirname(save_path)
             os.makedirs(target_dir, exist_ok=True)
             
-            # 移动（剪切）文件到新位置
-            shutil.move(result_image_path, save_path)
-            self.navigation_functions.log_message(f"结果图像已导出到: {save_path}")
+            # 按块转换格式写出，保留缓存的结果图像供后续显示
+            progress_dialog = QProgressDialog("正在导出结果图像...", "取消", 0, 100)
+            progress_dialog.setWindowTitle("导出结果")
+            progress_dialog.setWindowModality(Qt.ApplicationModal)
+            progress_dialog.setMinimumDuration(500)
+            
+            def on_progress(complete):
+                progress_dialog.setValue(int(complete * 100))
+                QApplication.processEvents()
+                return not progress_dialog.wasCanceled()
+            
+            start_time = time.perf_counter()
+            try:
+                completed = convert_raster(result_image_path, save_path, format_name,
+                                           png_level=png_level, jpeg_quality=jpeg_quality,
+                                           reference_path=getattr(self.navigation_functions, 'file_path', None),
+                                           progress=on_progress)
+            finally:
+                progress_dialog.close()
+            
+            if not completed:
+                self.navigation_functions.log_message("用户取消导出操作")
+                return False
             
-            # 检查临时目录是否为空，如果为空则删除
-            if os.path.exists(self.temp_output_dir) and len(os.listdir(self.temp_output_dir)) == 0:
-                try:
-                    os.rmdir(self.temp_output_dir)
-                    self.navigation_functions.log_message(f"已删除临时目录: {self.temp_output_dir}")
-                except Exception as e:
-                    self.navigation_functions.log_message(f"尝试删除临时目录时出错: {str(e)}")
+            size_mb = os.path.getsize(save_path) / (1024 * 1024)
+            self.navigation_functions.log_message(
+                f"结果图像已导出到: {save_path}（{format_name}，{size_mb:.1f} MB，耗时 {time.perf_counter() - start_time:.2f} 秒）")
             
             # 显示成功消息
             self._show_styled_message_box("导出成功", f"结果图像已成功导出到:\n{save_path}", "information")
@@ -5,11 +5,13 @@ from pathlib import Path
 # 添加项目根目录到Python路径
 # sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from PIL import Image
-from PySide6.QtWidgets import QFileDialog, QMessageBox, QInputDialog, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QWidget
+from PySide6.QtWidgets import QFileDialog, QMessageBox, QInputDialog, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QWidget, QProgressDialog
 from PySide6.QtCore import Qt
 # 从theme_utils导入ThemeManager
 from .theme_utils import ThemeManager
+from .batch_standardization import BatchStandardizationThread, plan_jobs
+from .raster_io import read_image_size
+from .resampling import kernel_names, resample_raster
 
 class ImageStandardization:
     def __init__(self, navigation_functions):
@@ -20,9 +22,20 @@ class ImageStandardization:
             navigation_functions: NavigationFunctions实例，用于日志记录和图像显示
         """
         self.navigation_functions = navigation_functions
+        self.batch_thread = None
+        self.batch_progress = None
     
     def standardize_image(self):
         """将图像标准化为用户自定义尺寸"""
+        # 选择处理单个文件还是整个目录
+        mode, ok = QInputDialog.getItem(None, "影像分割", "请选择处理方式:",
+                                        ["单个文件", "整个目录（批量）"], 0, False)
+        if not ok:
+            self.navigation_functions.log_message("未选择处理方式，标准化操作取消")
+            return
+        if mode != "单个文件":
+            return self.standardize_directory()
+        
         # 弹出文件选择对话框
         file_path, _ = QFileDialog.getOpenFileName(None, 
                                        "选择要标准化的图像", 
@@ -36,11 +49,8 @@ class ImageStandardization:
             # 转换为Path对象处理路径
             file_path_obj = Path(file_path)
             
-            # 打开原始图像
-            img = Image.open(file_path)
-            
-            # 记录原始尺寸
-            original_size = img.size
+            # 记录原始尺寸（只读取文件头）
+            original_size = read_image_size(file_path)
             self.navigation_functions.log_message(f"原始图像尺寸: {original_size[0]}x{original_size[1]}")
             
             # 获取用户输入的宽度
@@ -65,8 +75,10 @@ class ImageStandardization:
                 self.navigation_functions.log_message("未指定高度，标准化操作取消")
                 return
             
-            # 使用用户指定的尺寸调整图像
-            standardized_img = img.resize((width, height), Image.LANCZOS)
+            kernel = self._select_kernel()
+            if kernel is None:
+                self.navigation_functions.log_message("未选择重采样方式，标准化操作取消")
+                return
             
             # 生成输出文件名
             file_name = file_path_obj.stem
@@ -77,9 +89,10 @@ class ImageStandardization:
             output_dir = file_path_obj.parent
             output_path = output_dir / output_filename
             
-            # 保存标准化图像
-            standardized_img.save(str(output_path))
-            self.navigation_functions.log_message(f"图像已裁剪为{width}x{height}，保存至: {output_path}")
+            # 分块重采样并保存标准化图像
+            result = resample_raster(str(file_path_obj), str(output_path), width, height, kernel=kernel)
+            self.navigation_functions.log_message(
+                f"图像已裁剪为{width}x{height}，保存至: {output_path}（重采样引擎: {result['engine']}）")
             
             # 检查是否使用深色主题
             is_dark_theme = hasattr(self.navigation_functions, 'is_dark_theme') and self.navigation_functions.is_dark_theme
@@ -151,6 +164,90 @@ class ImageStandardization:
             self.navigation_functions.log_message(traceback.format_exc())
             return False
             
+    def _select_kernel(self):
+        """选择重采样核函数，默认Lanczos；取消时返回None"""
+        names = kernel_names()
+        labels = [label for _, label in names]
+        default = [name for name, _ in names].index("lanczos")
+        label, ok = QInputDialog.getItem(None, "重采样方式", "请选择重采样方式:", labels, default, False)
+        if not ok:
+            return None
+        return names[labels.index(label)][0]
+    
+    def standardize_directory(self):
+        """按同一尺寸批量标准化整个目录树，在进程池中并行处理"""
+        if self.batch_thread is not None and self.batch_thread.isRunning():
+            self.navigation_functions.log_message("批量标准化正在进行中")
+            return False
+        
+        source_dir = QFileDialog.getExistingDirectory(None, "选择要标准化的影像目录")
+        if not source_dir:
+            self.navigation_functions.log_message("未选择目录，批量标准化操作取消")
+            return False
+        
+        # 取消选择输出目录时，结果保存在源文件旁边（与单文件标准化一致）
+        output_dir = QFileDialog.getExistingDirectory(None, "选择输出目录（取消则保存在源文件旁边）") or None
+        
+        width, ok = QInputDialog.getInt(None, "输入宽度", "请输入裁剪后影像的尺寸大小", 256, 1, 10000, 1)
+        if not ok:
+            self.navigation_functions.log_message("未指定宽度，批量标准化操作取消")
+            return False
+        height, ok = QInputDialog.getInt(None, "输入高度", "请输入裁剪后影像的尺寸大小", 256, 1, 10000, 1)
+        if not ok:
+            self.navigation_functions.log_message("未指定高度，批量标准化操作取消")
+            return False
+        kernel = self._select_kernel()
+        if kernel is None:
+            self.navigation_functions.log_message("未选择重采样方式，批量标准化操作取消")
+            return False
+        
+        jobs = plan_jobs(source_dir, width, height, output_dir)
+        if not jobs:
+            self.navigation_functions.log_message(f"目录中没有可标准化的影像: {source_dir}")
+            return False
+        self.navigation_functions.log_message(
+            f"开始批量标准化: {len(jobs)} 个文件, 目标尺寸 {width}x{height}, 重采样: {kernel}, 输出: {output_dir or '源文件旁边'}")
+        
+        self.batch_progress = QProgressDialog("正在批量标准化影像...", "取消", 0, len(jobs))
+        self.batch_progress.setWindowTitle("批量标准化")
+        self.batch_progress.setMinimumDuration(500)
+        
+        self.batch_thread = BatchStandardizationThread(jobs, width, height, kernel=kernel)
+        self.batch_thread.progress.connect(self.on_batch_progress)
+        self.batch_thread.file_done.connect(self.on_batch_file_done)
+        self.batch_thread.message.connect(self.navigation_functions.log_message)
+        self.batch_thread.finished_standardization.connect(self.on_batch_finished)
+        self.batch_progress.canceled.connect(self.batch_thread.requestInterruption)
+        self.batch_thread.start()
+        return True
+    
+    def on_batch_progress(self, done, total):
+        """更新批量标准化进度"""
+        if self.batch_progress is not None:
+            self.batch_progress.setValue(done)
+    
+    def on_batch_file_done(self, result):
+        """记录单个文件的耗时和吞吐量"""
+        seconds = result["seconds"]
+        throughput = result["megapixels"] / seconds if seconds > 0 else 0.0
+        self.navigation_functions.log_message(
+            f"已标准化: {os.path.basename(result['source'])} -> {result['output']} "
+            f"({seconds:.2f} 秒, {throughput:.1f} 百万像素/秒)")
+    
+    def on_batch_finished(self, summary):
+        """输出批量标准化汇总"""
+        if self.batch_progress is not None:
+            self.batch_progress.close()
+            self.batch_progress = None
+        seconds = summary["seconds"]
+        files_per_second = summary["done"] / seconds if seconds > 0 else 0.0
+        megapixels_per_second = summary["megapixels"] / seconds if seconds > 0 else 0.0
+        state = "已取消" if summary["cancelled"] else "完成"
+        self.navigation_functions.log_message(
+            f"批量标准化{state}: 处理 {summary['done']} 个, 跳过 {summary['skipped']} 个, "
+            f"失败 {summary['failed']} 个, 共 {summary['total']} 个, 耗时 {seconds:.1f} 秒, "
+            f"{files_per_second:.2f} 个/秒, {megapixels_per_second:.1f} 百万像素/秒")
+    
     def _display_standardized_image(self, image_path, is_before, dialog):
         """显示标准化后的图像
         
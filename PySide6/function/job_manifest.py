@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# 作业清单文件名，保存在结果输出目录中
+MANIFEST_FILENAME = ".rscd_job.sqlite"
+
+# 计算文件指纹时读取的首尾字节数
+FINGERPRINT_CHUNK = 64 * 1024
+
+
+def file_signature(path):
+    """
+    获取文件的快速签名（大小和修改时间），用于判断文件是否可能被修改
+
+    Returns:
+        str: "大小:修改时间纳秒"，文件不存在时返回None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def file_fingerprint(path):
+    """
+    计算文件内容指纹
+
+    只读取文件大小及首尾各64KB计算BLAKE2哈希，上万个大影像也能快速完成，
+    足以识别同名文件被替换的情况。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if size > 2 * FINGERPRINT_CHUNK:
+            f.seek(-FINGERPRINT_CHUNK, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+class JobManifest:
+    """批量作业清单
+
+    使用SQLite记录每组影像的状态、输入指纹、输出路径、耗时和错误信息。
+    重新启动同一作业时跳过已完成且输入未变化的影像对，失败的影像对按指数退避重试。
+    当前配对结果中已不存在的影像对标记为removed，不再执行，也不计入统计。
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    REMOVED = "removed"
+
+    def __init__(self, db_path, max_attempts=3, base_backoff=5.0):
+        """
+        初始化作业清单
+
+        Args:
+            db_path: SQLite数据库路径
+            max_attempts: 每组影像的最大尝试次数
+            base_backoff: 第一次重试前的等待秒数，之后每次翻倍
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+
+        self._conn = sqlite3.connect(db_path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS job (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS pairs (
+                pair_key TEXT PRIMARY KEY,
+                before_path TEXT NOT NULL,
+                after_path TEXT NOT NULL,
+                before_signature TEXT,
+                after_signature TEXT,
+                before_hash TEXT,
+                after_hash TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output_path TEXT,
+                started_at REAL,
+                finished_at REAL,
+                duration REAL,
+                error TEXT,
+                next_retry_at REAL NOT NULL DEFAULT 0,
+                model TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_pairs_status ON pairs(status, next_retry_at);
+        """)
+        # 早期版本的清单没有model列
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(pairs)")}
+        if "model" not in columns:
+            self._conn.execute("ALTER TABLE pairs ADD COLUMN model TEXT")
+        self._conn.commit()
+
+    @staticmethod
+    def path_for(output_dir):
+        """返回输出目录对应的作业清单路径"""
+        return os.path.join(output_dir, MANIFEST_FILENAME)
+
+    @staticmethod
+    def exists(output_dir):
+        return os.path.exists(JobManifest.path_for(output_dir))
+
+    def get_meta(self):
+        """读取作业参数"""
+        rows = self._conn.execute("SELECT name, value FROM job").fetchall()
+        return {row["name"]: json.loads(row["value"]) for row in rows}
+
+    def set_meta(self, meta):
+        """保存作业参数"""
+        self._conn.executemany("INSERT OR REPLACE INTO job VALUES (?, ?)",
+                               [(name, json.dumps(value)) for name, value in meta.items()])
+        self._conn.commit()
+
+    def reset(self):
+        """清空作业记录，开始新的作业"""
+        self._conn.execute("DELETE FROM pairs")
+        self._conn.execute("DELETE FROM job")
+        self._conn.commit()
+
+    def recover(self):
+        """
+        重新启动作业前的恢复：上次异常退出时仍处于执行中的影像对恢复为待处理，
+        已用完重试次数的失败影像对重新获得重试机会
+
+        Returns:
+            int: 恢复为待处理的影像对数量
+        """
+        cursor = self._conn.execute("UPDATE pairs SET status=? WHERE status=?", (self.PENDING, self.RUNNING))
+        self._conn.execute("UPDATE pairs SET attempts=0, next_retry_at=0 WHERE status=? AND attempts>=?",
+                           (self.FAILED, self.max_attempts))
+        self._conn.commit()
+        return cursor.rowcount
+
+    def sync_pairs(self, pairs, output_path_for):
+        """
+        将当前配对结果同步到作业清单
+
+        新影像对加入为待处理；已完成的影像对若输出缺失或输入文件签名变化且内容指纹不同，则重新处理；
+        不在当前配对结果中的影像对标记为已移除，再次出现时重新处理。
+
+        Args:
+            pairs: [(配对键, 前时相路径, 后时相路径)]
+            output_path_for: 根据配对键生成输出路径的函数
+
+        Returns:
+            dict: {"added": 新增数, "reset": 需重新处理数, "skipped": 可跳过的已完成数,
+                   "removed": 本次标记为已移除的数量}
+        """
+        existing = {row["pair_key"]: row for row in self._conn.execute("SELECT * FROM pairs")}
+        added = reset = skipped = 0
+        current = set()
+        for key, before_path, after_path in pairs:
+            current.add(key)
+            row = existing.get(key)
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO pairs (pair_key, before_path, after_path, status, output_path) VALUES (?, ?, ?, ?, ?)",
+                    (key, before_path, after_path, self.PENDING, output_path_for(key)))
+                added += 1
+                continue
+
+            paths_changed = row["before_path"] != before_path or row["after_path"] != after_path
+            if row["status"] == self.DONE:
+                if (not paths_changed and row["output_path"] and os.path.exists(row["output_path"])
+                        and self._input_unchanged(before_path, row["before_signature"], row["before_hash"])
+                        and self._input_unchanged(after_path, row["after_signature"], row["after_hash"])):
+                    skipped += 1
+                    continue
+                reset += 1
+            elif row["status"] == self.REMOVED:
+                added += 1
+            elif not paths_changed:
+                continue
+            self._conn.execute(
+                "UPDATE pairs SET before_path=?, after_path=?, status=?, attempts=0, error=NULL, next_retry_at=0 "
+                "WHERE pair_key=?", (before_path, after_path, self.PENDING, key))
+        
+        # 之前的配对结果中有、现在没有的影像对不再处理
+        stale = [(self.REMOVED, key) for key, row in existing.items()
+                 if key not in current and row["status"] != self.REMOVED]
+        self._conn.executemany("UPDATE pairs SET status=? WHERE pair_key=?", stale)
+        self._conn.commit()
+        return {"added": added, "reset": reset, "skipped": skipped, "removed": len(stale)}
+
+    @staticmethod
+    def _input_unchanged(path, signature, fingerprint):
+        """签名一致时直接认为未变化；签名不同再比较内容指纹，避免仅修改时间变化导致重复处理"""
+        current = file_signature(path)
+        if current is None:
+            return False
+        if current == signature:
+            return True
+        try:
+            return fingerprint is not None and file_fingerprint(path) == fingerprint
+        except OSError:
+            return False
+
+    def next_ready(self, limit, now=None):
+        """
+        取出可以执行的影像对：待处理的，以及未超过重试次数且退避时间已到的失败影像对
+
+        Returns:
+            list: sqlite3.Row列表
+        """
+        now = time.time() if now is None else now
+        return self._conn.execute(
+            "SELECT * FROM pairs WHERE status=? OR (status=? AND attempts<? AND next_retry_at<=?) "
+            "ORDER BY attempts, pair_key LIMIT ?",
+            (self.PENDING, self.FAILED, self.max_attempts, now, limit)).fetchall()
+
+    def next_retry_time(self):
+        """返回最早一次可重试的时间，没有可重试的影像对时返回None"""
+        row = self._conn.execute(
+            "SELECT MIN(next_retry_at) FROM pairs WHERE status=? AND attempts<?",
+            (self.FAILED, self.max_attempts)).fetchone()
+        return row[0]
+
+    def mark_running(self, key):
+        self._conn.execute("UPDATE pairs SET status=?, started_at=? WHERE pair_key=? AND status!=?",
+                           (self.RUNNING, time.time(), key, self.REMOVED))
+        self._conn.commit()
+
+    def mark_done(self, key, output_path, duration, fingerprints=None, model=None):
+        """
+        记录影像对处理完成
+
+        Args:
+            key: 配对键
+            output_path: 结果路径
+            duration: 处理耗时（秒）
+            fingerprints: (前时相指纹, 后时相指纹)，在工作线程中计算
+            model: 生成结果的检测方法（ChangeDetectionModel.description）
+        """
+        # 执行期间被移除的影像对不再记录结果
+        row = self._conn.execute("SELECT before_path, after_path FROM pairs WHERE pair_key=? AND status!=?",
+                                 (key, self.REMOVED)).fetchone()
+        if row is None:
+            return
+        before_hash, after_hash = fingerprints or (None, None)
+        self._conn.execute(
+            "UPDATE pairs SET status=?, output_path=?, finished_at=?, duration=?, error=NULL, "
+            "before_signature=?, after_signature=?, before_hash=?, after_hash=?, model=? WHERE pair_key=?",
+            (self.DONE, output_path, time.time(), duration,
+             file_signature(row["before_path"]), file_signature(row["after_path"]),
+             before_hash, after_hash, model, key))
+        self._conn.commit()
+
+    def mark_failed(self, key, error):
+        """记录影像对处理失败，并按指数退避计算下次重试时间"""
+        row = self._conn.execute("SELECT attempts FROM pairs WHERE pair_key=? AND status!=?",
+                                 (key, self.REMOVED)).fetchone()
+        if row is None:
+            return
+        attempts = row["attempts"] + 1
+        next_retry_at = time.time() + self.base_backoff * (2 ** (attempts - 1))
+        self._conn.execute(
+            "UPDATE pairs SET status=?, attempts=?, finished_at=?, error=?, next_retry_at=? WHERE pair_key=?",
+            (self.FAILED, attempts, time.time(), error, next_retry_at, key))
+        self._conn.commit()
+
+    def summary(self):
+        """
+        统计作业进度
+
+        Returns:
+            dict: 各状态的数量，另含total和exhausted（已用完重试次数的失败数），不含已移除的影像对
+        """
+        counts = {self.PENDING: 0, self.RUNNING: 0, self.DONE: 0, self.FAILED: 0}
+        for row in self._conn.execute("SELECT status, COUNT(*) FROM pairs WHERE status!=? GROUP BY status",
+                                      (self.REMOVED,)):
+            counts[row[0]] = row[1]
+        counts["total"] = sum(counts.values())
+        counts["exhausted"] = self._conn.execute(
+            "SELECT COUNT(*) FROM pairs WHERE status=? AND attempts>=?",
+            (self.FAILED, self.max_attempts)).fetchone()[0]
+        return counts
+
+    def completed_outputs(self):
+        """返回已完成影像对的结果路径，按配对键排序"""
+        return [row[0] for row in self._conn.execute(
+            "SELECT output_path FROM pairs WHERE status=? ORDER BY pair_key", (self.DONE,))]
+
+    def completed_rows(self):
+        """返回已完成影像对的完整记录，按配对键排序"""
+        return self._conn.execute(
+            "SELECT * FROM pairs WHERE status=? ORDER BY pair_key", (self.DONE,)).fetchall()
+
+    def close(self):
+        self._conn.close()
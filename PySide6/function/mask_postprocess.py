@@ -0,0 +1,410 @@
+"""
+变化掩膜后处理模块 - 分块执行形态学开闭运算、去除小图斑和填充孔洞
+
+整幅掩膜一次处理时内存占用很高，这里按块并行处理，结果与整幅处理一致：
+    1. 形态学：每块向外多读取halo像素（开运算和闭运算半径之和的两倍），运算后只保留块内部分，
+       块边缘的结果与整幅运算相同
+    2. 连通域标记：每块分别标记前景（8邻域）和背景（4邻域）连通域，记录各连通域面积和块边缘
+       上的标签；块间按相邻边缘的标签对用并查集合并，得到跨块连通域的总面积
+    3. 输出：按合并结果生成每个块的查找表，面积不足min_area的图斑置为背景，被保留图斑包围且
+       面积不超过hole_area的孔洞置为前景。孔洞外边界所属的图斑由孔洞最上方一行最左侧像素的
+       上邻像素确定，孔洞内部的岛状图斑不会被误认为外围图斑
+
+OpenCV的形态学和连通域函数会释放GIL，各阶段在线程池中并行执行。默认不做后处理，需要时
+通过环境变量RSCD_POSTPROCESS启用，例如：
+    RSCD_POSTPROCESS="opening=1,closing=2,min_area=64,hole_area=256"
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .trace_events import span
+
+# 分块边长，为概率图瓦片边长的整数倍时各块写入互不重叠的瓦片
+BLOCK_SIZE = 2048
+
+
+class PostprocessSettings:
+    """掩膜后处理参数"""
+
+    def __init__(self, opening=0, closing=0, min_area=0, hole_area=0):
+        """
+        Args:
+            opening: 开运算半径（像素），去除细小噪声，0为不做开运算
+            closing: 闭运算半径（像素），连接断开的图斑，0为不做闭运算
+            min_area: 最小图斑面积（像素），更小的连通域置为背景
+            hole_area: 填充的最大孔洞面积（像素），0为不填充，-1为填充全部孔洞
+        """
+        self.opening = int(opening)
+        self.closing = int(closing)
+        self.min_area = int(min_area)
+        self.hole_area = int(hole_area)
+        if min(self.opening, self.closing, self.min_area) < 0 or self.hole_area < -1:
+            raise ValueError("后处理参数不能为负数")
+
+    @classmethod
+    def from_env(cls, value=None):
+        """从RSCD_POSTPROCESS环境变量（逗号分隔的name=value）读取参数，未设置的项为0（不处理）"""
+        value = os.environ.get("RSCD_POSTPROCESS", "") if value is None else value
+        if value.strip().lower() in ("off", "none", "0"):
+            return cls(0, 0, 0, 0)
+        options = {}
+        for item in filter(None, (part.strip() for part in value.split(","))):
+            name, _, text = item.partition("=")
+            name = name.strip()
+            if name not in ("opening", "closing", "min_area", "hole_area"):
+                raise ValueError(f"未知的后处理参数: {name}")
+            options[name] = int(text)
+        return cls(**options)
+
+    @property
+    def enabled(self):
+        return bool(self.opening or self.closing or self.min_area or self.hole_area)
+
+    @property
+    def needs_labels(self):
+        """是否需要连通域标记（去除小图斑或填充孔洞）"""
+        return self.min_area > 0 or self.hole_area != 0
+
+    @property
+    def halo(self):
+        """形态学运算影响的邻域范围：开、闭运算各包含一次腐蚀和一次膨胀"""
+        return 2 * (self.opening + self.closing)
+
+    def describe(self):
+        holes = {0: "不填充", -1: "全部"}.get(self.hole_area, f"≤{self.hole_area}")
+        return (f"开运算半径={self.opening}, 闭运算半径={self.closing}, "
+                f"最小图斑={self.min_area}, 孔洞填充={holes}")
+
+
+_default_settings = None
+_settings_lock = threading.Lock()
+
+
+def get_postprocess_settings():
+    """获取进程共享的后处理参数，首次调用时按环境变量创建"""
+    global _default_settings
+    with _settings_lock:
+        if _default_settings is None:
+            _default_settings = PostprocessSettings.from_env()
+        return _default_settings
+
+
+def _kernel(radius):
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+
+
+class _UnionFind:
+    """数组实现的并查集，节点0保留为背景"""
+
+    def __init__(self, size):
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union_pairs(self, pairs):
+        """合并形状(N, 2)的节点对"""
+        for a, b in pairs:
+            root_a, root_b = self.find(a), self.find(b)
+            if root_a != root_b:
+                # 较小的编号作为根，结果与合并顺序无关
+                if root_a < root_b:
+                    self.parent[root_b] = root_a
+                else:
+                    self.parent[root_a] = root_b
+
+    def roots(self):
+        """所有节点的根（指针跳跃，向量化完成）"""
+        parent = self.parent
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                return parent
+            parent = grand
+
+
+class _ArrayBlocks:
+    """按窗口读写内存中的二维数组"""
+
+    def __init__(self, array):
+        self.array = array
+        self.height, self.width = array.shape[:2]
+
+    def read(self, x, y, width, height):
+        return self.array[y:y + height, x:x + width]
+
+    def write(self, x, y, block):
+        self.array[y:y + block.shape[0], x:x + block.shape[1]] = block
+
+
+def _label(binary):
+    """标记前景（8邻域）和背景（4邻域）连通域，返回(前景标签, 前景面积, 背景标签, 背景面积)"""
+    _, fg_labels, fg_stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8, ltype=cv2.CV_32S)
+    background = np.where(binary > 0, 0, 1).astype(np.uint8)
+    _, bg_labels, bg_stats, _ = cv2.connectedComponentsWithStats(background, connectivity=4, ltype=cv2.CV_32S)
+    return fg_labels, fg_stats[:, cv2.CC_STAT_AREA], bg_labels, bg_stats[:, cv2.CC_STAT_AREA]
+
+
+def postprocess_blocks(source, target, width, height, settings=None, block_size=BLOCK_SIZE,
+                       max_workers=None, progress=None):
+    """
+    分块后处理二值掩膜
+
+    Args:
+        source: 输入掩膜，提供read(x, y, 宽度, 高度)，返回非零为变化的uint8数组
+        target: 输出掩膜，提供read和write(x, y, 数组)，写入0/255；不能与source相同（各块读取halo时
+                相邻块可能已写入）
+        width: 掩膜宽度
+        height: 掩膜高度
+        settings: PostprocessSettings，默认使用get_postprocess_settings()
+        block_size: 分块边长
+        max_workers: 线程数，默认为CPU核数
+        progress: 进度回调progress(阶段名称, 已完成块数, 总块数)
+
+    Returns:
+        dict: blocks、components（合并后的图斑数）、removed（去除的图斑数）、
+              holes_filled（填充的孔洞数）、seconds
+    """
+    settings = settings or get_postprocess_settings()
+    start = time.perf_counter()
+    blocks = [(x, y, min(block_size, width - x), min(block_size, height - y))
+              for y in range(0, height, block_size) for x in range(0, width, block_size)]
+    cols = -(-width // block_size)
+    halo = settings.halo
+    open_kernel = _kernel(settings.opening) if settings.opening else None
+    close_kernel = _kernel(settings.closing) if settings.closing else None
+
+    def report(name, done):
+        if progress is not None:
+            progress(name, done, len(blocks))
+
+    def morph(block):
+        x, y, w, h = block
+        # 读取带halo的窗口，影像边缘处不外扩（OpenCV在边界外按不影响结果的值处理）
+        x0, y0 = max(0, x - halo), max(0, y - halo)
+        x1, y1 = min(width, x + w + halo), min(height, y + h + halo)
+        with span("postprocess.morph", "compute", x=x, y=y):
+            data = np.where(source.read(x0, y0, x1 - x0, y1 - y0) > 0, 255, 0).astype(np.uint8)
+            if open_kernel is not None:
+                data = cv2.morphologyEx(data, cv2.MORPH_OPEN, open_kernel)
+            if close_kernel is not None:
+                data = cv2.morphologyEx(data, cv2.MORPH_CLOSE, close_kernel)
+            target.write(x, y, np.ascontiguousarray(data[y - y0:y - y0 + h, x - x0:x - x0 + w]))
+
+    def scan(block):
+        x, y, w, h = block
+        with span("postprocess.label", "compute", x=x, y=y):
+            fg_labels, fg_area, bg_labels, bg_area = _label(np.ascontiguousarray(target.read(x, y, w, h)))
+            # 位于影像边界上的背景连通域不是孔洞
+            border = np.zeros(len(bg_area), dtype=bool)
+            if y == 0:
+                border[bg_labels[0]] = True
+            if y + h == height:
+                border[bg_labels[-1]] = True
+            if x == 0:
+                border[bg_labels[:, 0]] = True
+            if x + w == width:
+                border[bg_labels[:, -1]] = True
+            # 每个背景连通域在块内最上方一行最左侧的像素（按行优先顺序第一次出现的位置）及其上邻的
+            # 前景标签；该像素位于块的第一行时上邻在上方块中，记为-1，合并时从上方块的下边缘读取
+            first_key = np.full(len(bg_area), np.iinfo(np.int64).max, dtype=np.int64)
+            first_col = np.zeros(len(bg_area), dtype=np.int64)
+            above = np.full(len(bg_area), -1, dtype=np.int64)
+            labels, first = np.unique(bg_labels.ravel(), return_index=True)
+            first_rows, first_cols = np.divmod(first, w)
+            first_key[labels] = (y + first_rows) * width + (x + first_cols)
+            first_col[labels] = first_cols
+            inner = first_rows > 0
+            above[labels[inner]] = fg_labels[first_rows[inner] - 1, first_cols[inner]]
+            return {
+                "fg_area": fg_area, "bg_area": bg_area, "bg_border": border,
+                "bg_first": (first_key, first_col, above),
+                "fg_edges": (fg_labels[0].copy(), fg_labels[-1].copy(), fg_labels[:, 0].copy(), fg_labels[:, -1].copy()),
+                "bg_edges": (bg_labels[0].copy(), bg_labels[-1].copy(), bg_labels[:, 0].copy(), bg_labels[:, -1].copy()),
+            }
+
+    workers = max_workers or os.cpu_count() or 2
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mask-postprocess") as executor:
+        for index, _ in enumerate(executor.map(morph, blocks), start=1):
+            report("morph", index)
+        if not settings.needs_labels:
+            return {"blocks": len(blocks), "components": None, "removed": 0, "holes_filled": 0,
+                    "seconds": time.perf_counter() - start}
+
+        infos = []
+        for index, info in enumerate(executor.map(scan, blocks), start=1):
+            infos.append(info)
+            report("label", index)
+
+        with span("postprocess.merge", "compute", blocks=len(blocks)):
+            keep_fg, fill_bg, stats = _merge(blocks, infos, cols, settings)
+
+        def apply(item):
+            block, fg_offset, bg_offset, info = item
+            x, y, w, h = block
+            with span("postprocess.apply", "compute", x=x, y=y):
+                fg_labels, _, bg_labels, _ = _label(np.ascontiguousarray(target.read(x, y, w, h)))
+                fg_lut = keep_fg[fg_offset:fg_offset + len(info["fg_area"])].copy()
+                bg_lut = fill_bg[bg_offset:bg_offset + len(info["bg_area"])].copy()
+                fg_lut[0] = bg_lut[0] = False
+                result = fg_lut[fg_labels] | bg_lut[bg_labels]
+                target.write(x, y, np.where(result, 255, 0).astype(np.uint8))
+
+        fg_offsets = np.cumsum([0] + [len(info["fg_area"]) for info in infos])
+        bg_offsets = np.cumsum([0] + [len(info["bg_area"]) for info in infos])
+        items = [(block, fg_offsets[i], bg_offsets[i], infos[i]) for i, block in enumerate(blocks)]
+        for index, _ in enumerate(executor.map(apply, items), start=1):
+            report("apply", index)
+
+    stats["blocks"] = len(blocks)
+    stats["seconds"] = time.perf_counter() - start
+    logging.debug(f"掩膜后处理完成: {stats}（{settings.describe()}）")
+    return stats
+
+
+def _merge(blocks, infos, cols, settings):
+    """
+    用并查集合并跨块的连通域，返回按全局编号的前景保留表、背景填充表和统计
+
+    每块的局部标签按块顺序依次编号为全局节点（各块的标签0也占一个节点，始终为背景）。
+    """
+    fg_offsets = np.cumsum([0] + [len(info["fg_area"]) for info in infos])
+    bg_offsets = np.cumsum([0] + [len(info["bg_area"]) for info in infos])
+    fg_uf = _UnionFind(int(fg_offsets[-1]))
+    bg_uf = _UnionFind(int(bg_offsets[-1]))
+
+    def edge_pairs(a, b, diagonal):
+        """相邻两条边上的标签对；前景为8邻域时还要连接斜对角的像素"""
+        pairs = [np.stack([a, b], axis=1)]
+        if diagonal:
+            pairs.append(np.stack([a[:-1], b[1:]], axis=1))
+            pairs.append(np.stack([a[1:], b[:-1]], axis=1))
+        pairs = np.concatenate(pairs)
+        return np.unique(pairs[(pairs[:, 0] > 0) & (pairs[:, 1] > 0)], axis=0)
+
+    def link(i, j, side_i, side_j):
+        fi, fj = infos[i]["fg_edges"], infos[j]["fg_edges"]
+        bi, bj = infos[i]["bg_edges"], infos[j]["bg_edges"]
+        fg_pairs = edge_pairs(fi[side_i], fj[side_j], True)
+        fg_uf.union_pairs(fg_pairs + [fg_offsets[i], fg_offsets[j]])
+        bg_pairs = edge_pairs(bi[side_i], bj[side_j], False)
+        bg_uf.union_pairs(bg_pairs + [bg_offsets[i], bg_offsets[j]])
+
+    for i, (x, y, w, h) in enumerate(blocks):
+        row, col = divmod(i, cols)
+        if col + 1 < cols:
+            link(i, i + 1, 3, 2)  # 右边缘 - 右侧块的左边缘
+        below = i + cols
+        if below < len(blocks):
+            link(i, below, 1, 0)  # 下边缘 - 下方块的上边缘
+            # 8邻域的斜对角：只在块角点处相接
+            fg = infos[i]["fg_edges"][1]
+            if col + 1 < cols and fg[-1] > 0:
+                other = infos[below + 1]["fg_edges"][0][0]
+                if other > 0:
+                    fg_uf.union_pairs([(fg[-1] + fg_offsets[i], other + fg_offsets[below + 1])])
+            if col > 0 and fg[0] > 0:
+                other = infos[below - 1]["fg_edges"][0][-1]
+                if other > 0:
+                    fg_uf.union_pairs([(fg[0] + fg_offsets[i], other + fg_offsets[below - 1])])
+
+    fg_roots = fg_uf.roots()
+    bg_roots = bg_uf.roots()
+    fg_area = np.concatenate([info["fg_area"] for info in infos]).astype(np.int64)
+    bg_area = np.concatenate([info["bg_area"] for info in infos]).astype(np.int64)
+    # 每块的标签0是背景占位，不参与统计
+    fg_valid = np.ones(len(fg_area), dtype=bool)
+    fg_valid[fg_offsets[:-1]] = False
+    bg_valid = np.ones(len(bg_area), dtype=bool)
+    bg_valid[bg_offsets[:-1]] = False
+
+    fg_total = np.bincount(fg_roots[fg_valid], weights=fg_area[fg_valid], minlength=len(fg_area))
+    keep_root = fg_total >= settings.min_area
+    keep_fg = keep_root[fg_roots] & fg_valid
+    component_roots = np.unique(fg_roots[fg_valid])
+
+    fill_bg = np.zeros(len(bg_area), dtype=bool)
+    holes_filled = 0
+    if settings.hole_area != 0:
+        bg_total = np.bincount(bg_roots[bg_valid], weights=bg_area[bg_valid], minlength=len(bg_area))
+        border = np.zeros(len(bg_area), dtype=bool)
+        border[bg_roots[np.concatenate([info["bg_border"] for info in infos])]] = True
+        enclosing = _enclosing_components(infos, cols, bg_offsets, fg_offsets, bg_roots, fg_roots, bg_valid)
+        hole_root = (~border) & (enclosing >= 0)
+        hole_root[enclosing >= 0] &= keep_root[enclosing[enclosing >= 0]]
+        if settings.hole_area > 0:
+            hole_root &= bg_total <= settings.hole_area
+        fill_bg = hole_root[bg_roots] & bg_valid
+        holes_filled = int(np.count_nonzero(hole_root & (bg_total > 0)))
+
+    stats = {"components": int(len(component_roots)),
+             "removed": int(np.count_nonzero(~keep_root[component_roots])),
+             "holes_filled": holes_filled}
+    return keep_fg, fill_bg, stats
+
+
+def _enclosing_components(infos, cols, bg_offsets, fg_offsets, bg_roots, fg_roots, bg_valid):
+    """
+    确定每个合并后背景连通域外边界所属的前景图斑
+
+    孔洞最上方一行最左侧像素的上邻像素一定是前景（背景按4邻域连通），且位于孔洞内部任何岛状
+    图斑的上方，因此属于包围孔洞的图斑。与孔洞相邻的其他前景可能是孔洞内的岛，不能用来判断。
+
+    Returns:
+        numpy.ndarray: 按背景根节点索引的外围图斑根节点，不存在时为-1
+    """
+    keys = np.concatenate([info["bg_first"][0] for info in infos])
+    columns = np.concatenate([info["bg_first"][1] for info in infos])
+    above = np.concatenate([info["bg_first"][2] for info in infos])
+    no_pixel = np.iinfo(np.int64).max
+    keys[~bg_valid] = no_pixel
+
+    # 每个根节点取全局行优先顺序最靠前的像素所在的节点
+    root_first = np.full(len(keys), no_pixel, dtype=np.int64)
+    np.minimum.at(root_first, bg_roots, keys)
+    nodes = np.nonzero(bg_valid & (keys == root_first[bg_roots]) & (keys != no_pixel))[0]
+    node_blocks = np.searchsorted(bg_offsets, nodes, side="right") - 1
+
+    fg_nodes = np.full(len(nodes), -1, dtype=np.int64)
+    inner = above[nodes] > 0
+    fg_nodes[inner] = above[nodes[inner]] + fg_offsets[node_blocks[inner]]
+    # 像素位于块的第一行：上邻在上方块的最后一行（影像第一行的连通域位于边界，不是孔洞）
+    for k in np.nonzero(above[nodes] < 0)[0]:
+        upper = node_blocks[k] - cols
+        if upper >= 0:
+            label = infos[upper]["fg_edges"][1][columns[nodes[k]]]
+            if label > 0:
+                fg_nodes[k] = label + fg_offsets[upper]
+
+    enclosing = np.full(len(keys), -1, dtype=np.int64)
+    found = fg_nodes >= 0
+    enclosing[bg_roots[nodes[found]]] = fg_roots[fg_nodes[found]]
+    return enclosing
+
+
+def postprocess_array(mask, settings=None, **kwargs):
+    """
+    后处理内存中的掩膜数组
+
+    Args:
+        mask: 二维数组，非零为变化
+        settings: PostprocessSettings，默认使用get_postprocess_settings()
+        **kwargs: 传给postprocess_blocks的其他参数
+
+    Returns:
+        numpy.ndarray: 0/255的uint8掩膜
+    """
+    height, width = mask.shape[:2]
+    target = _ArrayBlocks(np.zeros((height, width), dtype=np.uint8))
+    postprocess_blocks(_ArrayBlocks(mask), target, width, height, settings, **kwargs)
+    return target.array
@@ -0,0 +1,103 @@
+"""
+多时相检测模块 - 一幅基准影像（T0）与多个后续时相（T1、T2、T3…）逐一比较
+
+按窗口遍历影像，每个窗口内依次与各时相比较：基准影像该窗口的编码特征第一次计算后留在
+特征缓存中，之后各时相只编码自身并运行解码器。窗口在外层循环，同时在内存中的特征只有
+当前窗口的，不随时相数量增长。每个时相的变化概率写入各自的分块概率图，全部窗口完成后
+按阈值导出掩膜。
+
+GeoTIFF/VRT按窗口读取；PNG/JPEG等无法按窗口解码的格式每幅只解码一次并在整个过程中
+保留在内存中。
+"""
+import os
+import time
+
+from .execute_change_detection_task import DETECT_HALO, DETECT_WINDOW_SIZE, detection_windows
+from .probability_map import ProbabilityMap
+from .raster_io import open_raster
+from .telemetry import stage
+from .workspace import KIND_CACHE, get_workspace
+
+
+def run_multi_date(base_path, later_paths, output_dir, model, threshold=0.5, window_size=DETECT_WINDOW_SIZE,
+                   postprocess=None, progress=None):
+    """
+    基准影像与多个后续时相逐一检测
+
+    Args:
+        base_path: 基准影像路径
+        later_paths: 后续时相影像路径列表，尺寸须与基准影像一致
+        output_dir: 结果保存目录，结果命名为{基准影像名}__{时相影像名}_change.png
+        model: ChangeDetectionModel
+        threshold: 变化概率阈值
+        window_size: 推理窗口边长
+        postprocess: mask_postprocess.PostprocessSettings，为None时不做后处理
+        progress: 进度回调progress(已完成的窗口对数, 总数)
+
+    Returns:
+        dict: outputs（结果路径列表）、elapsed（秒）、
+              cache（encoded、hits，模型不支持特征缓存时为None）
+    """
+    start = time.perf_counter()
+    readers = []
+    prob_maps = []
+    try:
+        base = open_raster(base_path)
+        readers.append(base)
+        width, height = base.width, base.height
+        for path in later_paths:
+            reader = open_raster(path)
+            readers.append(reader)
+            if (reader.width, reader.height) != (width, height):
+                raise ValueError(f"影像尺寸与基准影像不一致: {path} "
+                                 f"({reader.width}x{reader.height}，基准为 {width}x{height})")
+        laters = readers[1:]
+
+        feature_cache = None
+        if model.supports_features():
+            from .feature_cache import get_feature_cache
+            feature_cache = get_feature_cache()
+        cache_before = feature_cache.stats() if feature_cache is not None else None
+        windows = detection_windows((0, 0, width, height), window_size)
+        total = len(windows) * len(later_paths)
+
+        workspace = get_workspace()
+        prob_maps = [ProbabilityMap(width, height, workspace.new_path(KIND_CACHE, "multi_date_probability", ".npy"))
+                     for _ in later_paths]
+        done = 0
+        with stage("detect.multi_date", dates=len(later_paths), width=width, height=height):
+            # CVA各时相使用各自整幅影像的归一化尺度，网络推理时为None
+            scales = [model.cva_scale(base, later) for later in laters]
+            for window in windows:
+                for later, prob_map, scale in zip(laters, prob_maps, scales):
+                    with stage("detect.inference", width=window[2], height=window[3]):
+                        prob_map.write(window[0], window[1],
+                                       model.predict_window(base, later, window, DETECT_HALO, scale,
+                                                            cache_features=True))
+                    done += 1
+                    if progress is not None:
+                        progress(done, total)
+
+            os.makedirs(output_dir, exist_ok=True)
+            base_name = os.path.splitext(os.path.basename(base_path))[0]
+            outputs = []
+            for path, prob_map in zip(later_paths, prob_maps):
+                name = os.path.splitext(os.path.basename(path))[0]
+                output_path = os.path.join(output_dir, f"{base_name}__{name}_change.png")
+                with stage("detect.encode"):
+                    prob_map.export_mask(output_path, threshold, postprocess=postprocess)
+                outputs.append(output_path)
+    finally:
+        for prob_map in prob_maps:
+            prob_map.close()
+            if os.path.exists(prob_map.path):
+                os.remove(prob_map.path)
+        for reader in readers:
+            reader.close()
+
+    cache = None
+    if feature_cache is not None:
+        after, before = feature_cache.stats(), cache_before
+        cache = {"encoded": after["misses"] - before["misses"],
+                 "hits": after["hits"] + after["disk_hits"] - before["hits"] - before["disk_hits"]}
+    return {"outputs": outputs, "elapsed": time.perf_counter() - start, "cache": cache}
@@ -0,0 +1,271 @@
+"""
+变化概率图模块 - 保存逐像素变化概率，调整阈值时无需重新推理
+
+概率量化为uint8（级别 = round(概率 * 255)），每像素1字节，只有float32的1/4。数据按瓦片
+连续存放，形状为(瓦片行数, 瓦片列数, 瓦片边长, 瓦片边长)，读取一个瓦片只访问一段连续内存；
+指定路径时保存为工作空间中的.npy内存映射文件，超过内存的大图由操作系统按需换页。
+
+阈值只决定哪些量化级别算作变化：阈值t对应的最低变化级别为ceil(t * 255)。显示和导出都通过
+256项查找表把级别映射为输出值，界面调整阈值时只需替换索引图像的颜色表（见threshold_lut）。
+"""
+import math
+import os
+
+import numpy as np
+
+from .trace_events import span
+
+# 瓦片边长
+TILE_SIZE = 256
+# 显示用预览的最长边
+PREVIEW_MAX_EDGE = 2048
+
+
+def quantize(prob):
+    """将0~1的变化概率量化为uint8级别"""
+    return np.clip(np.rint(np.asarray(prob, dtype=np.float32) * 255.0), 0, 255).astype(np.uint8)
+
+
+def threshold_level(threshold):
+    """返回阈值对应的最低变化级别，级别大于等于该值的像素判为变化"""
+    return int(min(255, max(0, math.ceil(threshold * 255.0 - 1e-6))))
+
+
+def threshold_lut(threshold, changed=255, unchanged=0):
+    """
+    生成阈值查找表
+
+    Args:
+        threshold: 变化概率阈值
+        changed: 变化像素的输出值
+        unchanged: 未变化像素的输出值
+
+    Returns:
+        numpy.ndarray: 长度256的uint8查找表
+    """
+    lut = np.full(256, unchanged, dtype=np.uint8)
+    lut[threshold_level(threshold):] = changed
+    return lut
+
+
+class ProbabilityMap:
+    """分块保存的uint8变化概率图
+
+    用法:
+        prob_map = ProbabilityMap(width, height, path)
+        prob_map.write(x, y, prob)          # 按窗口写入推理结果
+        preview, scale = prob_map.preview()  # 显示用的缩小预览
+        prob_map.export_mask(path, 0.6)      # 按新阈值导出二值掩膜
+    """
+
+    def __init__(self, width, height, path=None, tile_size=TILE_SIZE, origin=(0, 0)):
+        """
+        Args:
+            width: 概率图宽度
+            height: 概率图高度
+            path: .npy内存映射文件路径，为None时保存在内存中
+            tile_size: 瓦片边长
+            origin: 概率图左上角在源影像中的像素坐标（区域检测时为选择窗口的位置）
+        """
+        self.width = int(width)
+        self.height = int(height)
+        self.tile_size = int(tile_size)
+        self.origin = tuple(origin)
+        self.path = path
+        self.rows = -(-self.height // self.tile_size)
+        self.cols = -(-self.width // self.tile_size)
+        shape = (self.rows, self.cols, self.tile_size, self.tile_size)
+        if path:
+            self._tiles = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+        else:
+            self._tiles = np.zeros(shape, dtype=np.uint8)
+
+    @property
+    def nbytes(self):
+        return self._tiles.nbytes
+
+    def _tile_ranges(self, start, length):
+        """窗口在一个方向上覆盖的瓦片：(瓦片序号, 瓦片内起点, 窗口内起点, 长度)"""
+        if length <= 0:
+            return
+        end = start + length
+        first = start // self.tile_size
+        last = (end - 1) // self.tile_size
+        for index in range(first, last + 1):
+            tile_start = index * self.tile_size
+            lo = max(start, tile_start)
+            hi = min(end, tile_start + self.tile_size)
+            yield index, lo - tile_start, lo - start, hi - lo
+
+    def write(self, x, y, prob):
+        """
+        写入一个窗口的变化概率
+
+        Args:
+            x, y: 窗口在概率图中的左上角坐标
+            prob: 形状(h, w)的float概率或已量化的uint8级别
+        """
+        levels = prob if prob.dtype == np.uint8 else quantize(prob)
+        height, width = levels.shape
+        for row, ty, wy, h in self._tile_ranges(y, height):
+            for col, tx, wx, w in self._tile_ranges(x, width):
+                self._tiles[row, col, ty:ty + h, tx:tx + w] = levels[wy:wy + h, wx:wx + w]
+
+    def read(self, x, y, width, height):
+        """读取窗口的量化级别，形状(height, width)的uint8数组"""
+        width = min(width, self.width - x)
+        height = min(height, self.height - y)
+        out = np.empty((height, width), dtype=np.uint8)
+        for row, ty, wy, h in self._tile_ranges(y, height):
+            for col, tx, wx, w in self._tile_ranges(x, width):
+                out[wy:wy + h, wx:wx + w] = self._tiles[row, col, ty:ty + h, tx:tx + w]
+        return out
+
+    def tile(self, row, col):
+        """读取单个瓦片（边缘瓦片包含补零的部分）"""
+        return self._tiles[row, col]
+
+    def iter_strips(self):
+        """
+        按瓦片行遍历整幅概率图
+
+        Yields:
+            tuple: (条带起始行, 形状(条带高度, width)的uint8数组)
+        """
+        for row in range(self.rows):
+            y = row * self.tile_size
+            height = min(self.tile_size, self.height - y)
+            # (瓦片列数, 边长, 边长) -> (边长, 瓦片列数 * 边长)，再去掉右侧和底部补零
+            strip = self._tiles[row].transpose(1, 0, 2).reshape(self.tile_size, -1)
+            yield y, strip[:height, :self.width]
+
+    def histogram(self):
+        """返回256个量化级别的像素数，用于即时计算任意阈值下的变化比例"""
+        hist = np.zeros(256, dtype=np.int64)
+        for _, strip in self.iter_strips():
+            hist += np.bincount(strip.ravel(), minlength=256)
+        return hist
+
+    def preview(self, max_edge=PREVIEW_MAX_EDGE):
+        """
+        生成显示用的预览（最近邻抽样，保留量化级别）
+
+        Returns:
+            tuple: (形状(h, w)的uint8级别数组, 预览相对概率图的缩放比例)
+        """
+        scale = min(1.0, max_edge / max(self.width, self.height))
+        preview_width = max(1, round(self.width * scale))
+        preview_height = max(1, round(self.height * scale))
+        xs = np.minimum((np.arange(preview_width) / scale).astype(np.int64), self.width - 1)
+        ys = np.minimum((np.arange(preview_height) / scale).astype(np.int64), self.height - 1)
+        out = np.empty((preview_height, preview_width), dtype=np.uint8)
+        with span("prob.preview", "paint", width=preview_width, height=preview_height):
+            # 按瓦片行取出需要的行，每个瓦片行只读取一次
+            tile_rows = ys // self.tile_size
+            for row in np.unique(tile_rows):
+                selected = np.nonzero(tile_rows == row)[0]
+                strip = self._tiles[row].transpose(1, 0, 2).reshape(self.tile_size, -1)
+                out[selected] = strip[ys[selected] - row * self.tile_size][:, xs]
+        return out, scale
+
+    def thresholded(self, threshold):
+        """返回按阈值读取二值窗口的视图，read(x, y, 宽度, 高度)返回0/255的uint8数组"""
+        return _ThresholdedView(self, threshold_lut(threshold))
+
+    def export_mask(self, path, threshold, geo_transform=None, projection=None, settings=None, postprocess=None):
+        """
+        按阈值导出二值掩膜（变化为255），不需要重新推理
+
+        GeoTIFF由GDAL按条带写出，不在内存中拼接整幅掩膜；其他格式拼接后编码。
+        先写临时文件再重命名，中断时不会留下不完整的结果。
+
+        Args:
+            path: 输出路径，扩展名决定格式
+            threshold: 变化概率阈值
+            geo_transform: 掩膜左上角对应的地理变换（GeoTIFF）
+            projection: 投影WKT（GeoTIFF）
+            settings: tile_writer.EncoderSettings，默认使用get_encoder_settings()
+            postprocess: mask_postprocess.PostprocessSettings，为None或未启用时不做后处理
+
+        Returns:
+            int: 变化像素数
+        """
+        from .tile_writer import get_encoder_settings
+        settings = settings or get_encoder_settings()
+        root, ext = os.path.splitext(path)
+        temp_path = f"{root}.part{ext}"
+        changed = 0
+
+        source, lut = self, threshold_lut(threshold)
+        processed_path = None
+        try:
+            if postprocess is not None and postprocess.enabled:
+                # 后处理结果写到同样分块的临时概率图中（0/255），再按中间阈值导出
+                from .mask_postprocess import postprocess_blocks
+                processed_path = f"{os.path.splitext(self.path)[0]}.postprocess.npy" if self.path else None
+                source = ProbabilityMap(self.width, self.height, processed_path, self.tile_size, self.origin)
+                postprocess_blocks(self.thresholded(threshold), source, self.width, self.height, postprocess)
+                lut = threshold_lut(0.5)
+
+            gdal = None
+            if ext.lower() in ('.tif', '.tiff'):
+                try:
+                    from osgeo import gdal
+                except ImportError:
+                    gdal = None
+
+            with span("prob.export", "encode", width=self.width, height=self.height, threshold=threshold):
+                if gdal is not None:
+                    ds = gdal.GetDriverByName("GTiff").Create(
+                        temp_path, self.width, self.height, 1, gdal.GDT_Byte,
+                        settings.gdal_options() + ["TILED=YES"])
+                    if ds is None:
+                        raise IOError(f"无法创建GeoTIFF: {path}")
+                    if geo_transform is not None:
+                        ds.SetGeoTransform(geo_transform)
+                    if projection:
+                        ds.SetProjection(projection)
+                    band = ds.GetRasterBand(1)
+                    for y, strip in source.iter_strips():
+                        mask = lut[strip]
+                        changed += int(np.count_nonzero(mask))
+                        band.WriteArray(mask, 0, y)
+                    ds.FlushCache()
+                    ds = None
+                else:
+                    from .raster_io import write_image
+                    mask = np.empty((self.height, self.width), dtype=np.uint8)
+                    for y, strip in source.iter_strips():
+                        mask[y:y + strip.shape[0]] = lut[strip]
+                    changed = int(np.count_nonzero(mask))
+                    write_image(temp_path, mask, settings.cv2_params(ext or ".png"))
+            os.replace(temp_path, path)
+        except BaseException:
+            # 中断或出错时不留下不完整的结果
+            ds = None
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            if source is not self:
+                source.close()
+            if processed_path and os.path.exists(processed_path):
+                os.remove(processed_path)
+        return changed
+
+    def close(self):
+        """释放数据，内存映射文件写回磁盘后关闭"""
+        if isinstance(self._tiles, np.memmap):
+            self._tiles.flush()
+        self._tiles = None
+
+
+class _ThresholdedView:
+    """按阈值查找表读取概率图窗口"""
+
+    def __init__(self, prob_map, lut):
+        self.prob_map = prob_map
+        self.lut = lut
+
+    def read(self, x, y, width, height):
+        return self.lut[self.prob_map.read(x, y, width, height)]
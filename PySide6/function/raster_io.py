@@ -0,0 +1,417 @@
+"""
+栅格读写工具模块 - 为后台任务提供不依赖界面的影像读写函数
+"""
+import os
+
+import cv2
+import numpy as np
+
+from .trace_events import span
+
+GEOTIFF_EXTENSIONS = ('.tif', '.tiff')
+# 优先使用GDAL读取的格式，VRT为虚拟裁剪块
+GDAL_EXTENSIONS = GEOTIFF_EXTENSIONS + ('.vrt',)
+
+
+def _open_gdal(path):
+    """使用GDAL打开影像，GDAL不可用或无法打开时返回None"""
+    try:
+        from osgeo import gdal
+    except ImportError:
+        return None
+    return gdal.Open(path, gdal.GA_ReadOnly)
+
+
+def read_image_size(path):
+    """
+    读取影像尺寸，不解码像素数据
+
+    Returns:
+        tuple: (宽度, 高度)
+    """
+    ds = _open_gdal(path) if path.lower().endswith(GDAL_EXTENSIONS) else None
+    if ds is not None:
+        return ds.RasterXSize, ds.RasterYSize
+    if path.lower().endswith('.vrt'):
+        from .virtual_tiles import read_vrt_window
+        return read_vrt_window(path)[1][2:]
+    from PIL import Image
+    with Image.open(path) as img:
+        return img.size
+
+
+def read_rgb(path, window=None):
+    """
+    读取影像为RGB uint8数组
+
+    GeoTIFF和VRT使用GDAL按窗口读取，只解码需要的区域；其他格式整体解码后再截取窗口。
+    GDAL不可用时，虚拟裁剪块按其引用的源影像窗口读取。
+
+    Args:
+        path: 影像路径（支持中文路径）
+        window: (x, y, 宽度, 高度)，为None时读取整幅影像
+
+    Returns:
+        numpy.ndarray: 形状为(H, W, 3)的uint8数组
+    """
+    ds = _open_gdal(path) if path.lower().endswith(GDAL_EXTENSIONS) else None
+    if ds is None and path.lower().endswith('.vrt'):
+        from .virtual_tiles import read_vrt_window
+        source_path, (x, y, width, height) = read_vrt_window(path)
+        if window:
+            x, y, width, height = x + window[0], y + window[1], window[2], window[3]
+        return read_rgb(source_path, (x, y, width, height))
+    if ds is not None:
+        x, y, width, height = window if window else (0, 0, ds.RasterXSize, ds.RasterYSize)
+        with span("gdal.read", "io", path=os.path.basename(path), width=width, height=height):
+            bands = [to_uint8(ds.GetRasterBand(band_idx).ReadAsArray(x, y, width, height))
+                     for band_idx in range(1, min(ds.RasterCount, 3) + 1)]
+            ds = None
+            return _stack_bands(bands)
+
+    with span("cv2.decode", "io", path=os.path.basename(path)):
+        img = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise IOError(f"无法读取图像: {path}")
+    if window:
+        x, y, width, height = window
+        img = img[y:y + height, x:x + width]
+    return np.ascontiguousarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+
+
+def read_overview_rgb(path, max_edge):
+    """
+    读取缩小到指定最长边以内的RGB预览，不解码全分辨率影像
+
+    GeoTIFF和VRT由GDAL按输出尺寸读取（有金字塔时直接读取金字塔层级），JPEG按1/2、1/4、1/8
+    比例解码，其他格式解码后缩小。
+
+    Args:
+        path: 影像路径
+        max_edge: 预览的最长边
+
+    Returns:
+        tuple: (形状为(h, w, 3)的uint8数组, (原始宽度, 原始高度))
+    """
+    ds = _open_gdal(path) if path.lower().endswith(GDAL_EXTENSIONS) else None
+    if ds is not None:
+        width, height = ds.RasterXSize, ds.RasterYSize
+        scale = min(1.0, max_edge / max(width, height))
+        buf_width, buf_height = max(1, round(width * scale)), max(1, round(height * scale))
+        with span("gdal.read", "io", path=os.path.basename(path), width=buf_width, height=buf_height):
+            bands = [to_uint8(ds.GetRasterBand(band_idx).ReadAsArray(
+                         0, 0, width, height, buf_xsize=buf_width, buf_ysize=buf_height))
+                     for band_idx in range(1, min(ds.RasterCount, 3) + 1)]
+        return _stack_bands(bands), (width, height)
+
+    width, height = read_image_size(path)
+    data = np.fromfile(path, dtype=np.uint8)
+    flags = cv2.IMREAD_COLOR
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                             (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if max(width, height) // factor >= max_edge:
+                flags = flag
+                break
+    with span("cv2.decode", "io", path=os.path.basename(path)):
+        img = cv2.imdecode(data, flags)
+    if img is None:
+        raise IOError(f"无法读取图像: {path}")
+    scale = min(1.0, max_edge / max(img.shape[:2]))
+    if scale < 1.0:
+        img = cv2.resize(img, (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale))),
+                         interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)), (width, height)
+
+
+def geojson_crs(projection):
+    """
+    GeoJSON输出的坐标系信息，结果打包的变化图斑图层和虚拟裁剪的瓦片索引共用
+
+    Args:
+        projection: 投影WKT，为空时坐标为像素坐标
+
+    Returns:
+        tuple: (图层文件名后缀, GeoJSON的crs成员或None)
+    """
+    if not projection:
+        return "pixel", None
+    try:
+        from osgeo import osr
+        srs = osr.SpatialReference()
+        srs.ImportFromWkt(projection)
+        srs.AutoIdentifyEPSG()
+        authority, code = srs.GetAuthorityName(None), srs.GetAuthorityCode(None)
+    except Exception:
+        authority = code = None
+    if authority and code:
+        return f"{authority}_{code}", {"type": "name", "properties": {"name": f"urn:ogc:def:crs:{authority}::{code}"}}
+    # 无法识别为EPSG等编码的坐标系直接写出WKT
+    return None, {"type": "name", "properties": {"name": projection}}
+
+
+def _stack_bands(bands):
+    """将1~3个uint8波段组合为RGB：单波段复制为灰度RGB，双波段补零波段"""
+    while len(bands) < 3:
+        bands.append(bands[0] if len(bands) == 1 else np.zeros_like(bands[0]))
+    return np.ascontiguousarray(np.dstack(bands[:3]))
+
+
+class RasterReader:
+    """按窗口读取同一幅影像，各窗口使用相同的拉伸
+
+    GeoTIFF和VRT由GDAL按窗口读取，非uint8波段按整幅影像的最小/最大值拉伸，相邻窗口之间
+    没有接缝；其他格式无法按窗口解码，第一次读取时整体解码一次，之后的窗口从内存中截取。
+    GDAL不可用时，虚拟裁剪块按其引用的源影像读取。
+
+    GDAL数据集不是线程安全的，每个读取器只在一个线程中使用。
+
+    用法:
+        reader = RasterReader(path)
+        rgb = reader.read((x, y, width, height))
+        reader.close()
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: 影像路径
+        """
+        self.path = path
+        self._ds = _open_gdal(path) if path.lower().endswith(GDAL_EXTENSIONS) else None
+        self._ranges = None
+        self._image = None
+        self._source = None
+        self._offset = (0, 0)
+        if self._ds is not None:
+            self.width, self.height = self._ds.RasterXSize, self._ds.RasterYSize
+        elif path.lower().endswith('.vrt'):
+            from .virtual_tiles import read_vrt_window
+            source_path, (x, y, width, height) = read_vrt_window(path)
+            self._source = RasterReader(source_path)
+            self._offset = (x, y)
+            self.width, self.height = width, height
+        else:
+            self.width, self.height = read_image_size(path)
+
+    def _band_ranges(self):
+        """整幅影像各波段的(最小值, 最大值)，uint8波段为None"""
+        if self._ranges is None:
+            from osgeo import gdal
+            ranges = []
+            with span("gdal.minmax", "io", path=os.path.basename(self.path)):
+                for band_idx in range(1, min(self._ds.RasterCount, 3) + 1):
+                    band = self._ds.GetRasterBand(band_idx)
+                    ranges.append(None if band.DataType == gdal.GDT_Byte else band.ComputeRasterMinMax(False))
+            self._ranges = ranges
+        return self._ranges
+
+    def read(self, window=None):
+        """
+        读取窗口为RGB uint8数组
+
+        Args:
+            window: (x, y, 宽度, 高度)，为None时读取整幅影像
+
+        Returns:
+            numpy.ndarray: 形状为(H, W, 3)的uint8数组
+        """
+        x, y, width, height = window if window else (0, 0, self.width, self.height)
+        if self._source is not None:
+            return self._source.read((x + self._offset[0], y + self._offset[1], width, height))
+        if self._ds is not None:
+            ranges = self._band_ranges()
+            with span("gdal.read", "io", path=os.path.basename(self.path), width=width, height=height):
+                bands = [to_uint8(self._ds.GetRasterBand(band_idx).ReadAsArray(x, y, width, height),
+                                  ranges[band_idx - 1])
+                         for band_idx in range(1, len(ranges) + 1)]
+            return _stack_bands(bands)
+        if self._image is None:
+            self._image = read_rgb(self.path)
+        return np.ascontiguousarray(self._image[y:y + height, x:x + width])
+
+    def close(self):
+        """关闭数据集并释放整体解码的影像"""
+        if self._source is not None:
+            self._source.close()
+        self._ds = None
+        self._image = None
+
+
+def open_raster(source):
+    """返回影像读取器，source已经是RasterReader时原样返回"""
+    return source if isinstance(source, RasterReader) else RasterReader(source)
+
+
+def to_uint8(array, value_range=None):
+    """
+    将任意数值类型的波段线性拉伸到uint8
+
+    Args:
+        array: 波段数组
+        value_range: 拉伸使用的(最小值, 最大值)，为None时使用数组自身的最小/最大值
+    """
+    if array.dtype == np.uint8:
+        return array
+    if value_range is not None:
+        min_val, max_val = float(value_range[0]), float(value_range[1])
+    else:
+        min_val = float(array.min())
+        max_val = float(array.max())
+    if max_val <= min_val:
+        return np.zeros(array.shape, dtype=np.uint8)
+    return np.clip((array - min_val) * 255.0 / (max_val - min_val), 0, 255).astype(np.uint8)
+
+
+def write_image(path, array, params=None):
+    """
+    编码并写入影像，通过imencode+tofile支持中文路径
+
+    Args:
+        path: 输出路径，扩展名决定编码格式
+        array: RGB或灰度数组
+        params: cv2.imencode的编码参数
+    """
+    ext = os.path.splitext(path)[1] or ".png"
+    if array.ndim == 3 and array.shape[2] == 3:
+        array = cv2.cvtColor(array, cv2.COLOR_RGB2BGR)
+    with span("cv2.encode", "encode", format=ext, width=array.shape[1], height=array.shape[0]):
+        ok, buffer = cv2.imencode(ext, array, params or [])
+    if not ok:
+        raise IOError(f"编码图像失败: {path}")
+    with span("file.write", "io", bytes=buffer.size):
+        buffer.tofile(path)
+
+
+# 导出格式: 名称 -> (默认扩展名, 可识别的扩展名, GDAL驱动)
+EXPORT_FORMATS = {
+    "GeoTIFF": ('.tif', ('.tif', '.tiff'), 'COG'),
+    "JPEG": ('.jpg', ('.jpg', '.jpeg'), 'JPEG'),
+    "PNG": ('.png', ('.png',), 'PNG'),
+    "GeoPackage": ('.gpkg', ('.gpkg',), 'GPKG'),
+}
+
+
+def export_format_for(path):
+    """根据扩展名判断导出格式名称，无法识别时返回None"""
+    ext = os.path.splitext(path)[1].lower()
+    for name, (_, extensions, _) in EXPORT_FORMATS.items():
+        if ext in extensions:
+            return name
+    return None
+
+
+def export_creation_options(format_name, png_level=6, jpeg_quality=90):
+    """
+    生成导出格式对应的GDAL创建参数
+
+    Args:
+        format_name: EXPORT_FORMATS中的格式名称
+        png_level: PNG压缩级别(0-9)
+        jpeg_quality: JPEG质量(1-100)
+
+    Returns:
+        list: GDAL创建参数
+    """
+    if format_name == "GeoTIFF":
+        return ["COMPRESS=DEFLATE", "PREDICTOR=2", "BLOCKSIZE=512", "BIGTIFF=IF_SAFER", "NUM_THREADS=ALL_CPUS"]
+    if format_name == "JPEG":
+        return [f"QUALITY={jpeg_quality}"]
+    if format_name == "PNG":
+        return [f"ZLEVEL={png_level}"]
+    if format_name == "GeoPackage":
+        return ["TILE_FORMAT=PNG", "BLOCKSIZE=512"]
+    return []
+
+
+def convert_raster(src_path, dst_path, format_name, png_level=6, jpeg_quality=90,
+                   reference_path=None, progress=None):
+    """
+    将影像转换为指定格式写出，源文件保持不变
+
+    使用GDAL时按块读取源影像并直接写入目标格式，不在内存中解码整幅影像；
+    reference_path为尺寸相同的GeoTIFF时，为输出附加其地理参考。
+    GDAL不可用时，PNG/JPEG退回到OpenCV整体解码后重新编码。
+
+    Args:
+        src_path: 源影像路径
+        dst_path: 目标路径
+        format_name: EXPORT_FORMATS中的格式名称
+        png_level: PNG压缩级别(0-9)
+        jpeg_quality: JPEG质量(1-100)
+        reference_path: 提供地理参考的影像路径
+        progress: 进度回调progress(比例)，返回False时取消导出
+
+    Returns:
+        bool: 是否完成导出（被取消时返回False）
+    """
+    if format_name not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {format_name}")
+
+    try:
+        from osgeo import gdal
+    except ImportError:
+        gdal = None
+
+    if gdal is None:
+        return _convert_raster_cv2(src_path, dst_path, format_name, png_level, jpeg_quality)
+
+    src = gdal.Open(src_path, gdal.GA_ReadOnly)
+    if src is None:
+        raise IOError(f"无法读取图像: {src_path}")
+
+    vrt_path = None
+    ref = _open_gdal(reference_path) if reference_path and reference_path.lower().endswith(GEOTIFF_EXTENSIONS) else None
+    if ref is not None and (ref.RasterXSize, ref.RasterYSize) == (src.RasterXSize, src.RasterYSize):
+        # 用VRT附加地理参考，像素数据仍按块从源文件读取
+        vrt_path = f"/vsimem/rscd_export_{id(src)}.vrt"
+        vrt = gdal.Translate(vrt_path, src, format="VRT")
+        geotransform = ref.GetGeoTransform(can_return_null=True)
+        if geotransform is not None:
+            vrt.SetGeoTransform(geotransform)
+        if ref.GetProjection():
+            vrt.SetProjection(ref.GetProjection())
+        vrt = None
+        src = vrt_path
+    ref = None
+
+    def callback(complete, message, data):
+        return 1 if progress is None or progress(complete) is not False else 0
+
+    try:
+        if os.path.exists(dst_path):
+            # GeoPackage会向已有文件追加图层，覆盖时先删除旧文件
+            os.remove(dst_path)
+        result = gdal.Translate(dst_path, src, format=EXPORT_FORMATS[format_name][2],
+                                creationOptions=export_creation_options(format_name, png_level, jpeg_quality),
+                                callback=callback)
+        if result is None:
+            if os.path.exists(dst_path):
+                os.remove(dst_path)
+            return False
+        result = None
+        return True
+    finally:
+        if vrt_path is not None:
+            gdal.Unlink(vrt_path)
+
+
+def _convert_raster_cv2(src_path, dst_path, format_name, png_level, jpeg_quality):
+    """GDAL不可用时的PNG/JPEG导出"""
+    if format_name not in ("PNG", "JPEG"):
+        raise RuntimeError(f"导出为{format_name}需要安装GDAL")
+
+    img = cv2.imdecode(np.fromfile(src_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise IOError(f"无法读取图像: {src_path}")
+    if format_name == "PNG":
+        params = [cv2.IMWRITE_PNG_COMPRESSION, png_level]
+    else:
+        params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        if img.ndim == 3 and img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    ok, buffer = cv2.imencode(EXPORT_FORMATS[format_name][0], img, params)
+    if not ok:
+        raise IOError(f"编码图像失败: {dst_path}")
+    buffer.tofile(dst_path)
+    return True
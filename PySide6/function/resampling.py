@@ -0,0 +1,383 @@
+"""
+重采样模块 - 分块流式的影像缩放引擎，供单文件标准化、批量标准化共用
+
+两种实现：
+    gdal    使用gdal.Translate按块读取并重采样，源影像有金字塔时自动从合适的层级读取，
+            地理变换随输出尺寸自动调整
+    tiled   按输出行带逐段处理：先对源影像做整数倍的块平均（抗混叠），再用所选核函数
+            按精确的像素中心映射插值；每段向上下多读取核函数半径的行（halo），段与段之间
+            没有接缝。GeoTIFF通过GDAL按窗口读取，JPEG按1/2、1/4、1/8比例解码，
+            内存占用只与输出尺寸和单段大小有关
+
+engine="auto"时，GDAL可用且能打开源影像则使用gdal，否则使用tiled。
+"""
+import math
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from .raster_io import read_image_size
+from .trace_events import span
+
+Kernel = namedtuple("Kernel", ["cv2_flag", "gdal_name", "halo", "label"])
+
+# 核函数: cv2插值方式, GDAL重采样名称, 插值所需的邻域半径（行）, 界面显示名称
+KERNELS = {
+    "nearest": Kernel(cv2.INTER_NEAREST, "nearest", 1, "最近邻"),
+    "bilinear": Kernel(cv2.INTER_LINEAR, "bilinear", 1, "双线性"),
+    "cubic": Kernel(cv2.INTER_CUBIC, "cubic", 2, "双三次"),
+    "area": Kernel(cv2.INTER_LINEAR, "average", 1, "区域平均"),
+    "lanczos": Kernel(cv2.INTER_LANCZOS4, "lanczos", 4, "Lanczos"),
+}
+
+GEOTIFF_EXTENSIONS = ('.tif', '.tiff')
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+# 输出格式: 扩展名 -> (GDAL驱动, 创建参数)
+_GDAL_OUTPUTS = {
+    '.tif': ("GTiff", ["TILED=YES", "COMPRESS=DEFLATE", "BIGTIFF=IF_SAFER"]),
+    '.tiff': ("GTiff", ["TILED=YES", "COMPRESS=DEFLATE", "BIGTIFF=IF_SAFER"]),
+    '.png': ("PNG", []),
+    '.jpg': ("JPEG", ["QUALITY=95"]),
+    '.jpeg': ("JPEG", ["QUALITY=95"]),
+}
+
+# tiled引擎单次转换为浮点数处理的源像素数（元素个数），约32MB
+CHUNK_ELEMENTS = 8 * 1024 * 1024
+# tiled引擎每段输出的最大行数和列数
+BAND_ROWS = 256
+BAND_COLS = 4096
+
+
+def kernel_names():
+    """返回可选核函数的(名称, 显示名称)列表"""
+    return [(name, kernel.label) for name, kernel in KERNELS.items()]
+
+
+def scaled_geotransform(geo_transform, scale_x, scale_y):
+    """
+    按缩放比例调整地理变换：左上角坐标不变，像元大小（含旋转项）乘以缩放比例
+
+    Args:
+        geo_transform: 源影像的地理变换
+        scale_x, scale_y: 源尺寸与输出尺寸之比
+    """
+    return (geo_transform[0], geo_transform[1] * scale_x, geo_transform[2] * scale_y,
+            geo_transform[3], geo_transform[4] * scale_x, geo_transform[5] * scale_y)
+
+
+def _gdal():
+    try:
+        from osgeo import gdal
+        return gdal
+    except ImportError:
+        return None
+
+
+class _GdalSource:
+    """按行窗口读取GDAL数据集，可选从金字塔层级读取"""
+
+    def __init__(self, ds, width, height):
+        self.ds = ds
+        self.full_size = (ds.RasterXSize, ds.RasterYSize)
+        self.geo_transform = ds.GetGeoTransform(can_return_null=True)
+        self.projection = ds.GetProjection()
+        self.bands = [ds.GetRasterBand(index) for index in range(1, ds.RasterCount + 1)]
+        self.nodata = [band.GetNoDataValue() for band in self.bands]
+        self.dtype = self.bands[0].ReadAsArray(0, 0, 1, 1).dtype
+
+        # 选择不小于输出尺寸的最小金字塔层级，减少读取量
+        first = self.bands[0]
+        best = None
+        for index in range(first.GetOverviewCount()):
+            overview = first.GetOverview(index)
+            if overview.XSize >= width and overview.YSize >= height:
+                if best is None or overview.XSize < first.GetOverview(best).XSize:
+                    best = index
+        if best is not None:
+            self.bands = [band.GetOverview(best) for band in self.bands]
+        self.width = self.bands[0].XSize
+        self.height = self.bands[0].YSize
+        self.channels = len(self.bands)
+
+    def read_rows(self, y0, y1):
+        """读取[y0, y1)行，返回形状(行数, 宽度, 波段数)的数组"""
+        with span("gdal.read", "io", rows=y1 - y0, width=self.width):
+            layers = [band.ReadAsArray(0, y0, self.width, y1 - y0) for band in self.bands]
+        return np.dstack(layers) if len(layers) > 1 else layers[0][..., None]
+
+    def close(self):
+        self.bands = []
+        self.ds = None
+
+
+class _ArraySource:
+    """整体解码的普通图像（JPEG按缩放比例降采样解码），波段顺序为RGB"""
+
+    def __init__(self, path, width, height):
+        data = np.fromfile(path, dtype=np.uint8)
+        flags = cv2.IMREAD_UNCHANGED
+        full_size = None
+        if path.lower().endswith(JPEG_EXTENSIONS):
+            # JPEG解码器可以直接输出1/2、1/4、1/8尺寸，取不小于输出尺寸的最大缩小比例
+            full_size = read_image_size(path)
+            for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                 (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                if full_size[0] // factor >= width and full_size[1] // factor >= height:
+                    flags = flag
+                    break
+        with span("cv2.decode", "io", path=os.path.basename(path)):
+            image = cv2.imdecode(data, flags)
+        if image is None:
+            raise IOError(f"无法读取图像: {path}")
+        if image.ndim == 2:
+            image = image[..., None]
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+        self.image = image
+        self.height, self.width = image.shape[:2]
+        self.channels = image.shape[2]
+        self.full_size = full_size or (self.width, self.height)
+        self.dtype = image.dtype
+        self.geo_transform = None
+        self.projection = ""
+        self.nodata = []
+
+    def read_rows(self, y0, y1):
+        return self.image[y0:y1]
+
+    def close(self):
+        self.image = None
+
+
+def _open_source(path, width, height):
+    gdal = _gdal()
+    if gdal is not None and not path.lower().endswith(JPEG_EXTENSIONS):
+        ds = gdal.Open(path, gdal.GA_ReadOnly)
+        if ds is not None:
+            return _GdalSource(ds, width, height)
+    return _ArraySource(path, width, height)
+
+
+class _GdalWriter:
+    """按行写入GeoTIFF，附加调整后的地理参考"""
+
+    def __init__(self, path, width, height, source, dtype):
+        gdal = _gdal()
+        from osgeo import gdal_array
+        driver, options = _GDAL_OUTPUTS[os.path.splitext(path)[1].lower()]
+        self.ds = gdal.GetDriverByName(driver).Create(
+            path, width, height, source.channels, gdal_array.NumericTypeCodeToGDALTypeCode(dtype), options)
+        if source.geo_transform is not None:
+            self.ds.SetGeoTransform(scaled_geotransform(source.geo_transform, source.full_size[0] / width,
+                                                        source.full_size[1] / height))
+        if source.projection:
+            self.ds.SetProjection(source.projection)
+        for index, nodata in enumerate(source.nodata, start=1):
+            if nodata is not None:
+                self.ds.GetRasterBand(index).SetNoDataValue(nodata)
+
+    def write_rows(self, y0, rows):
+        for index in range(rows.shape[2]):
+            self.ds.GetRasterBand(index + 1).WriteArray(rows[:, :, index], 0, y0)
+
+    def close(self):
+        self.ds.FlushCache()
+        self.ds = None
+
+
+class _ArrayWriter:
+    """在内存中组装输出影像（输出尺寸），结束时用OpenCV编码写出"""
+
+    def __init__(self, path, width, height, channels, dtype):
+        self.path = path
+        self.image = np.empty((height, width, channels), dtype=dtype)
+
+    def write_rows(self, y0, rows):
+        self.image[y0:y0 + rows.shape[0]] = rows
+
+    def close(self):
+        image = self.image
+        if image.shape[2] == 1:
+            image = image[:, :, 0]
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGRA)
+        ok, buffer = cv2.imencode(os.path.splitext(self.path)[1] or ".png", image)
+        if not ok:
+            raise IOError(f"编码图像失败: {self.path}")
+        buffer.tofile(self.path)
+        self.image = None
+
+
+def _box_reduce(rows, fx, fy):
+    """整数倍块平均，行数和列数不足整数倍时复制边缘像素补齐，返回float32"""
+    rows = rows.astype(np.float32)
+    if fx == 1 and fy == 1:
+        return rows
+    height, width, channels = rows.shape
+    pad_y = -height % fy
+    pad_x = -width % fx
+    if pad_y or pad_x:
+        rows = np.pad(rows, ((0, pad_y), (0, pad_x), (0, 0)), mode="edge")
+    height, width = rows.shape[:2]
+    return rows.reshape(height // fy, fy, width // fx, fx, channels).mean(axis=(1, 3))
+
+
+def _remap(reduced, map_x, map_y, flag):
+    """按映射坐标插值，OpenCV单次最多处理4个通道，多波段分组处理"""
+    channels = reduced.shape[2]
+    parts = []
+    for start in range(0, channels, 4):
+        group = np.ascontiguousarray(reduced[:, :, start:start + 4])
+        result = cv2.remap(group, map_x, map_y, flag, borderMode=cv2.BORDER_REPLICATE)
+        parts.append(result if result.ndim == 3 else result[..., None])
+    return np.concatenate(parts, axis=2) if len(parts) > 1 else parts[0]
+
+
+def _cast(array, dtype):
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return np.clip(np.rint(array), info.min, info.max).astype(dtype)
+    return array.astype(dtype)
+
+
+def _resample_tiled(source, writer, width, height, kernel, progress):
+    """按输出行带流式重采样，返回False表示被取消"""
+    spec = KERNELS[kernel]
+    scale_x = source.width / width
+    scale_y = source.height / height
+    # 缩小2倍以上时先做整数倍块平均以抗混叠，最近邻保持取样语义不做平均
+    fx = int(scale_x) if kernel != "nearest" and scale_x >= 2 else 1
+    fy = int(scale_y) if kernel != "nearest" and scale_y >= 2 else 1
+    reduced_width = math.ceil(source.width / fx)
+    reduced_height = math.ceil(source.height / fy)
+    channels = source.channels
+
+    # 输出像素中心在块平均后坐标系中的位置
+    xs = (np.arange(width, dtype=np.float64) + 0.5) * scale_x / fx - 0.5
+    # 每次转换为浮点数的源行数，以及每段输出行数（块平均后的行带宽度为整幅宽度，按内存预算限制行数）
+    chunk_rows = max(1, CHUNK_ELEMENTS // max(1, source.width * channels * fy))
+    band_rows = max(16, min(BAND_ROWS, int(CHUNK_ELEMENTS / (reduced_width * channels * max(1.0, scale_y / fy)))))
+
+    cache_start, cache = 0, None  # 已完成块平均的行，相邻行带重叠的halo行不重复读取
+    for out_y0 in range(0, height, band_rows):
+        out_y1 = min(height, out_y0 + band_rows)
+        ys = (np.arange(out_y0, out_y1, dtype=np.float64) + 0.5) * scale_y / fy - 0.5
+        first = max(0, int(math.floor(ys[0])) - spec.halo)
+        last = min(reduced_height, int(math.ceil(ys[-1])) + spec.halo + 1)
+
+        parts = []
+        next_row = first
+        if cache is not None and cache_start <= first < cache_start + cache.shape[0]:
+            parts.append(cache[first - cache_start:last - cache_start])
+            next_row = cache_start + cache.shape[0]
+        while next_row < last:
+            stop = min(last, next_row + chunk_rows)
+            rows = source.read_rows(next_row * fy, min(source.height, stop * fy))
+            parts.append(_box_reduce(rows, fx, fy))
+            next_row = stop
+        cache_start, cache = first, (np.concatenate(parts, axis=0) if len(parts) > 1 else parts[0])
+
+        # cv2.remap要求输入输出边长小于32767，按列分段插值
+        result = np.empty((out_y1 - out_y0, width, channels), dtype=source.dtype)
+        map_y = np.repeat((ys - first).astype(np.float32)[:, None], min(width, BAND_COLS), axis=1)
+        with span("resample.band", "compute", rows=out_y1 - out_y0, kernel=kernel):
+            for out_x0 in range(0, width, BAND_COLS):
+                out_x1 = min(width, out_x0 + BAND_COLS)
+                left = max(0, int(math.floor(xs[out_x0])) - spec.halo)
+                right = min(reduced_width, int(math.ceil(xs[out_x1 - 1])) + spec.halo + 1)
+                map_x = np.repeat((xs[out_x0:out_x1] - left).astype(np.float32)[None, :], out_y1 - out_y0, axis=0)
+                segment = _remap(cache[:, left:right], map_x,
+                                 np.ascontiguousarray(map_y[:, :out_x1 - out_x0]), spec.cv2_flag)
+                result[:, out_x0:out_x1] = _cast(segment, source.dtype)
+        writer.write_rows(out_y0, result)
+
+        if progress is not None and progress(out_y1 / height) is False:
+            return False
+    return True
+
+
+def _resample_gdal(gdal, source_path, output_path, width, height, kernel, progress):
+    """使用gdal.Translate重采样，返回源尺寸；取消时返回None"""
+    ext = os.path.splitext(output_path)[1].lower()
+    driver, options = _GDAL_OUTPUTS[ext]
+    src = gdal.Open(source_path, gdal.GA_ReadOnly)
+    source_size = (src.RasterXSize, src.RasterYSize)
+
+    def callback(complete, message, data):
+        return 1 if progress is None or progress(complete) is not False else 0
+
+    with span("resample.gdal", "compute", kernel=kernel, width=width, height=height):
+        result = gdal.Translate(output_path, src, format=driver, width=width, height=height,
+                                resampleAlg=KERNELS[kernel].gdal_name, creationOptions=options,
+                                callback=callback)
+    src = None
+    if result is None:
+        return None
+    result = None
+    # PNG/JPEG驱动会额外生成.aux.xml保存地理参考等信息，标准化结果不需要
+    if os.path.exists(output_path + ".aux.xml") and driver != "GTiff":
+        os.remove(output_path + ".aux.xml")
+    return source_size
+
+
+def resample_raster(source_path, output_path, width, height, kernel="area", engine="auto", progress=None):
+    """
+    将影像重采样到指定尺寸并写出
+
+    输出格式由扩展名决定；GeoTIFF输出保留投影，地理变换按缩放比例调整。
+
+    Args:
+        source_path: 源影像路径
+        output_path: 输出路径
+        width, height: 输出尺寸
+        kernel: 核函数，见KERNELS
+        engine: "auto"、"gdal"或"tiled"
+        progress: 进度回调progress(比例)，返回False时取消
+
+    Returns:
+        dict: {"source_size": (宽, 高), "engine": 实际使用的引擎}，被取消时返回None
+    """
+    if kernel not in KERNELS:
+        raise ValueError(f"不支持的核函数: {kernel}（可选: {', '.join(KERNELS)}）")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"无效的输出尺寸: {width}x{height}")
+    ext = os.path.splitext(output_path)[1].lower()
+
+    gdal = _gdal()
+    if engine == "gdal" and gdal is None:
+        raise RuntimeError("GDAL不可用，无法使用gdal重采样引擎")
+    if engine in ("auto", "gdal") and gdal is not None and ext in _GDAL_OUTPUTS:
+        probe = gdal.Open(source_path, gdal.GA_ReadOnly)
+        if probe is not None:
+            probe = None
+            source_size = _resample_gdal(gdal, source_path, output_path, width, height, kernel, progress)
+            if source_size is None:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                return None
+            return {"source_size": source_size, "engine": "gdal"}
+        if engine == "gdal":
+            raise IOError(f"GDAL无法打开影像: {source_path}")
+
+    source = _open_source(source_path, width, height)
+    try:
+        if gdal is not None and ext in GEOTIFF_EXTENSIONS:
+            writer = _GdalWriter(output_path, width, height, source, source.dtype)
+        else:
+            writer = _ArrayWriter(output_path, width, height, source.channels, source.dtype)
+        completed = _resample_tiled(source, writer, width, height, kernel, progress)
+        writer.close()
+        if not completed:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return None
+        return {"source_size": source.full_size, "engine": "tiled"}
+    finally:
+        source.close()
@@ -0,0 +1,483 @@
+"""
+结果打包模块 - 将批量处理结果打包为可交付的压缩包
+
+压缩包内容：
+    cog/       每组影像的云优化GeoTIFF（COG），继承前时相影像的地理参考
+    masks/     GDAL不可用时直接打包原始结果影像
+    mosaic/    全部结果合并的镶嵌影像（结果均有地理参考时生成）
+    vector/    变化图斑矢量图层（GeoJSON），每种坐标系一个图层并写明坐标系；
+               结果的坐标系都相同时为changes.geojson，否则为changes_<坐标系>.geojson
+    summary.csv 每组影像的统计汇总
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+import numpy as np
+from PySide6.QtCore import QThread, Signal
+
+from .raster_io import GEOTIFF_EXTENSIONS, _open_gdal, geojson_crs
+from .telemetry import timed
+
+# 支持的压缩包格式
+ARCHIVE_FORMATS = ('.zip', '.tar', '.tar.gz')
+
+# 生成的文本内容超过该大小后转存到临时文件，避免大结果集占用过多内存
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+# 写入压缩包时的复制块大小
+COPY_CHUNK = 1024 * 1024
+
+SUMMARY_FIELDS = ["pair_key", "before_path", "after_path", "result_path", "width", "height",
+                  "changed_pixels", "changed_ratio", "polygons", "changed_area", "duration_s", "model"]
+
+
+def archive_format(path):
+    """根据文件名判断压缩包格式，不支持时返回None"""
+    lower = path.lower()
+    for ext in sorted(ARCHIVE_FORMATS, key=len, reverse=True):
+        if lower.endswith(ext):
+            return ext
+    return None
+
+
+class _ArchiveWriter:
+    """压缩包写入器
+
+    已有文件按块直接读入压缩包，不产生中间副本；PNG、TIFF等已压缩的影像以存储方式写入，
+    文本内容使用DEFLATE压缩。ZIP启用ZIP64，支持超过4GB的结果集。
+    """
+
+    def __init__(self, path):
+        self.format = archive_format(path)
+        if self.format is None:
+            raise ValueError(f"不支持的压缩包格式: {path}")
+        if self.format == '.zip':
+            self._zip = zipfile.ZipFile(path, 'w', allowZip64=True)
+            self._tar = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(path, 'w:gz' if self.format == '.tar.gz' else 'w')
+
+    def add_file(self, path, arcname, compress=False):
+        """将磁盘上的文件流式写入压缩包"""
+        if self._zip is not None:
+            self._zip.write(path, arcname, zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+        else:
+            self._tar.add(path, arcname, recursive=False)
+
+    def add_stream(self, fileobj, size, arcname, compress=False):
+        """将文件对象中的内容流式写入压缩包"""
+        if self._zip is not None:
+            info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with self._zip.open(info, 'w', force_zip64=size > 0x7FFFFFFF) as dst:
+                shutil.copyfileobj(fileobj, dst, COPY_CHUNK)
+        else:
+            info = tarfile.TarInfo(arcname)
+            info.size = size
+            info.mtime = time.time()
+            self._tar.addfile(info, fileobj)
+
+    def add_bytes(self, data, arcname, compress=False):
+        self.add_stream(io.BytesIO(data), len(data), arcname, compress)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+
+def _read_mask(path):
+    """读取结果影像为单波段数组（支持中文路径）"""
+    mask = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        raise IOError(f"无法读取结果影像: {path}")
+    return mask
+
+
+def _read_georeference(path):
+    """读取影像的地理变换参数和投影，无地理参考时返回(None, None)"""
+    if not path or not path.lower().endswith(GEOTIFF_EXTENSIONS):
+        return None, None
+    ds = _open_gdal(path)
+    if ds is None:
+        return None, None
+    geotransform = ds.GetGeoTransform(can_return_null=True)
+    projection = ds.GetProjection() or None
+    ds = None
+    return geotransform, projection
+
+
+def _mask_polygons(mask, geotransform):
+    """
+    提取二值结果中的变化图斑
+
+    Args:
+        mask: 单波段结果影像，非零为变化
+        geotransform: 地理变换参数，为None时使用像素坐标
+
+    Returns:
+        tuple: (GeoJSON Polygon坐标列表, 图斑总面积)
+    """
+    contours, hierarchy = cv2.findContours((mask > 0).astype(np.uint8), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return [], 0.0
+
+    gt = geotransform or (0.0, 1.0, 0.0, 0.0, 0.0, 1.0)
+    pixel_area = abs(gt[1] * gt[5] - gt[2] * gt[4])
+
+    def to_ring(contour):
+        points = contour.reshape(-1, 2).astype(np.float64)
+        xs = gt[0] + points[:, 0] * gt[1] + points[:, 1] * gt[2]
+        ys = gt[3] + points[:, 0] * gt[4] + points[:, 1] * gt[5]
+        ring = np.column_stack([xs, ys]).tolist()
+        ring.append(ring[0])
+        return ring
+
+    polygons = []
+    total_area = 0.0
+    hierarchy = hierarchy[0]
+    for idx, contour in enumerate(contours):
+        # RETR_CCOMP下父轮廓为-1的是外边界，其子轮廓为内部空洞
+        if hierarchy[idx][3] != -1 or len(contour) < 3:
+            continue
+        rings = [to_ring(contour)]
+        area = cv2.contourArea(contour)
+        child = hierarchy[idx][2]
+        while child != -1:
+            if len(contours[child]) >= 3:
+                rings.append(to_ring(contours[child]))
+                area -= cv2.contourArea(contours[child])
+            child = hierarchy[child][0]
+        polygons.append(rings)
+        total_area += max(area, 0.0) * pixel_area
+    return polygons, total_area
+
+
+@timed("package.pair")
+def _prepare_pair(row, use_gdal, vsimem_root):
+    """
+    在工作线程中处理一组结果：统计、提取图斑，并生成COG
+
+    Args:
+        row: 作业清单中的一行（dict）
+        use_gdal: 是否生成COG和地理参考
+        vsimem_root: GDAL内存文件系统中的工作目录
+
+    Returns:
+        dict: 统计信息、图斑和生成的内存文件路径
+    """
+    start = time.perf_counter()
+    result_path = row["output_path"]
+    mask = _read_mask(result_path)
+    height, width = mask.shape
+    changed = int(np.count_nonzero(mask))
+
+    geotransform, projection = _read_georeference(row.get("before_path")) if use_gdal else (None, None)
+    polygons, area = _mask_polygons(mask, geotransform)
+    del mask
+
+    cog_path = None
+    vrt_path = None
+    if use_gdal:
+        from osgeo import gdal
+        # 用VRT为结果影像附加地理参考，不复制像素数据
+        vrt_path = f"{vsimem_root}/{row['pair_key']}.vrt"
+        vrt = gdal.Translate(vrt_path, result_path, format="VRT")
+        if geotransform is not None:
+            vrt.SetGeoTransform(geotransform)
+        if projection:
+            vrt.SetProjection(projection)
+        vrt = None
+        cog_path = f"{vsimem_root}/{row['pair_key']}.tif"
+        gdal.Translate(cog_path, vrt_path, format="COG",
+                       creationOptions=["COMPRESS=DEFLATE", "PREDICTOR=2", "BLOCKSIZE=512"])
+        if geotransform is None:
+            # 没有地理参考的结果不参与镶嵌
+            gdal.Unlink(vrt_path)
+            vrt_path = None
+
+    return {
+        "row": row,
+        "width": width,
+        "height": height,
+        "changed": changed,
+        "polygons": polygons,
+        "area": area,
+        "cog_path": cog_path,
+        "vrt_path": vrt_path,
+        "projection": projection,
+        # 图斑坐标所在的坐标系：没有地理变换时为像素坐标
+        "vector_crs": projection if geotransform is not None else None,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+class ResultPackager(QThread):
+    """并行结果打包线程
+
+    工作线程池并行完成解码、统计、图斑提取和COG编码，打包线程按完成顺序依次写入压缩包。
+    同时处理的结果数受限于工作线程数的两倍，内存占用与结果集大小无关。
+    """
+
+    progress = Signal(int, int)  # 已完成步骤, 总步骤
+    message = Signal(str)
+    finished_packaging = Signal(str)  # 压缩包路径
+    failed = Signal(str)
+
+    def __init__(self, rows, archive_path, max_workers=None, parent=None):
+        """
+        初始化结果打包
+
+        Args:
+            rows: 已完成影像对的记录列表，每项包含pair_key、before_path、after_path、output_path、duration
+            archive_path: 输出压缩包路径（.zip、.tar或.tar.gz）
+            max_workers: 并行线程数，默认按CPU核数计算
+            parent: 父QObject
+        """
+        super().__init__(parent)
+        self.rows = [dict(row) for row in rows]
+        self.archive_path = archive_path
+        self.max_workers = max_workers or max(1, min(8, os.cpu_count() or 2))
+
+    def run(self):
+        use_gdal = self._gdal_available()
+        vsimem_root = f"/vsimem/rscd_package_{id(self)}_{threading.get_ident()}"
+        writer = None
+        try:
+            if not use_gdal:
+                self.message.emit("GDAL不可用，将直接打包原始结果影像，不生成COG和镶嵌影像")
+            writer = _ArchiveWriter(self.archive_path)
+            total = len(self.rows) + 3  # 逐组结果 + 镶嵌影像 + 矢量图层 + 汇总表
+            done = 0
+            self.progress.emit(done, total)
+
+            summary_file = tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE, mode="w+b")
+            summary_writer = _CsvSpool(summary_file)
+            # 坐标系 -> 矢量图层，不同坐标系的图斑不能放在同一图层中
+            layers = {}
+
+            mosaic_sources = []
+            projections = set()
+            rows = iter(self.rows)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pending = set()
+                while True:
+                    while len(pending) < self.max_workers * 2 and not self.isInterruptionRequested():
+                        row = next(rows, None)
+                        if row is None:
+                            break
+                        pending.add(executor.submit(_prepare_pair, row, use_gdal, vsimem_root))
+                    if not pending:
+                        break
+                    completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        try:
+                            item = future.result()
+                        except Exception as e:
+                            self.message.emit(f"打包结果出错: {str(e)}")
+                        else:
+                            self._write_item(writer, item, layers, summary_writer)
+                            if item["vrt_path"]:
+                                mosaic_sources.append(item["vrt_path"])
+                                projections.add(item["projection"])
+                        done += 1
+                        self.progress.emit(done, total)
+
+            if self.isInterruptionRequested():
+                self.message.emit("打包已取消")
+                for layer in layers.values():
+                    layer.file.close()
+                summary_file.close()
+                writer.close()
+                writer = None
+                os.remove(self.archive_path)
+                return
+
+            # 镶嵌影像：所有结果均有地理参考且坐标系一致时生成
+            if use_gdal and mosaic_sources and len(mosaic_sources) == len(self.rows) and len(projections) == 1:
+                self._write_mosaic(writer, mosaic_sources, vsimem_root)
+            else:
+                self.message.emit("结果缺少统一的地理参考，跳过镶嵌影像")
+            done += 1
+            self.progress.emit(done, total)
+
+            if not layers:
+                layers[None] = _VectorLayer(None)
+            if len(layers) > 1:
+                self.message.emit(f"结果包含 {len(layers)} 种坐标系，图斑按坐标系分别写入矢量图层")
+            for index, layer in enumerate(layers.values(), start=1):
+                name = "changes" if len(layers) == 1 else f"changes_{layer.suffix or f'crs{index}'}"
+                layer.file.write(b'\n]}\n')
+                size = layer.file.tell()
+                layer.file.seek(0)
+                writer.add_stream(layer.file, size, f"vector/{name}.geojson", compress=True)
+                layer.file.close()
+            done += 1
+            self.progress.emit(done, total)
+
+            size = summary_file.tell()
+            summary_file.seek(0)
+            writer.add_stream(summary_file, size, "summary.csv", compress=True)
+            summary_file.close()
+            done += 1
+            self.progress.emit(done, total)
+
+            writer.close()
+            writer = None
+            self.finished_packaging.emit(self.archive_path)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if writer is not None:
+                writer.close()
+            if use_gdal:
+                self._cleanup_vsimem(vsimem_root)
+
+    @staticmethod
+    def _gdal_available():
+        try:
+            from osgeo import gdal  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _write_item(self, writer, item, layers, summary_writer):
+        """在打包线程中写入一组结果的影像、图斑和汇总行，图斑写入所在坐标系的图层"""
+        row = item["row"]
+        key = row["pair_key"]
+        result_path = row["output_path"]
+
+        if item["cog_path"]:
+            from osgeo import gdal
+            stat = gdal.VSIStatL(item["cog_path"])
+            handle = gdal.VSIFOpenL(item["cog_path"], "rb")
+            try:
+                writer.add_stream(_VSIReader(handle), stat.size, f"cog/{key}_change.tif")
+            finally:
+                gdal.VSIFCloseL(handle)
+                gdal.Unlink(item["cog_path"])
+        else:
+            writer.add_file(result_path, f"masks/{os.path.basename(result_path)}")
+
+        if item["polygons"]:
+            layer = layers.get(item["vector_crs"])
+            if layer is None:
+                layer = layers[item["vector_crs"]] = _VectorLayer(item["vector_crs"])
+            for rings in item["polygons"]:
+                layer.write({
+                    "type": "Feature",
+                    "properties": {"pair_key": key},
+                    "geometry": {"type": "Polygon", "coordinates": rings},
+                })
+
+        pixels = item["width"] * item["height"]
+        summary_writer.writerow({
+            "pair_key": key,
+            "before_path": row.get("before_path") or "",
+            "after_path": row.get("after_path") or "",
+            "result_path": result_path,
+            "width": item["width"],
+            "height": item["height"],
+            "changed_pixels": item["changed"],
+            "changed_ratio": f"{item['changed'] / pixels:.6f}" if pixels else "0",
+            "polygons": len(item["polygons"]),
+            "changed_area": f"{item['area']:.3f}",
+            "duration_s": f"{row['duration']:.3f}" if row.get("duration") is not None else "",
+            "model": row.get("model") or "",
+        })
+
+    def _write_mosaic(self, writer, sources, vsimem_root):
+        """合并所有结果为一幅COG镶嵌影像"""
+        from osgeo import gdal
+        self.message.emit(f"正在生成镶嵌影像（{len(sources)} 幅）...")
+        vrt_path = f"{vsimem_root}/mosaic.vrt"
+        gdal.BuildVRT(vrt_path, sources, srcNodata=0, VRTNodata=0)
+
+        # 镶嵌影像可能很大，写到与压缩包同目录的临时文件后流式写入，再删除
+        fd, temp_path = tempfile.mkstemp(suffix=".tif", dir=os.path.dirname(os.path.abspath(self.archive_path)))
+        os.close(fd)
+        try:
+            gdal.Translate(temp_path, vrt_path, format="COG",
+                           creationOptions=["COMPRESS=DEFLATE", "PREDICTOR=2", "BIGTIFF=IF_SAFER",
+                                            f"NUM_THREADS={self.max_workers}"])
+            writer.add_file(temp_path, "mosaic/change_mosaic.tif")
+        finally:
+            os.remove(temp_path)
+            gdal.Unlink(vrt_path)
+
+    @staticmethod
+    def _cleanup_vsimem(root):
+        from osgeo import gdal
+        for name in gdal.ReadDir(root) or []:
+            gdal.Unlink(f"{root}/{name}")
+
+
+class _VectorLayer:
+    """一个坐标系的GeoJSON图层，要素逐个写入可转存到磁盘的临时文件"""
+
+    def __init__(self, projection):
+        self.suffix, crs = geojson_crs(projection)
+        self.file = tempfile.SpooledTemporaryFile(SPOOL_MAX_SIZE, mode="w+b")
+        header = {"type": "FeatureCollection"}
+        if crs is not None:
+            header["crs"] = crs
+        # 去掉末尾的"}"，接着写要素数组
+        self.file.write(json.dumps(header, ensure_ascii=False)[:-1].encode("utf-8") + b', "features": [\n')
+        self._first = True
+
+    def write(self, feature):
+        if not self._first:
+            self.file.write(b",\n")
+        self.file.write(json.dumps(feature, ensure_ascii=False).encode("utf-8"))
+        self._first = False
+
+
+class _CsvSpool:
+    """逐行把CSV写入二进制文件对象（UTF-8带BOM，便于Excel直接打开）"""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._buffer = io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fieldnames=SUMMARY_FIELDS)
+        self._fileobj.write(b"\xef\xbb\xbf")
+        self._writer.writeheader()
+        self._flush()
+
+    def writerow(self, row):
+        self._writer.writerow(row)
+        self._flush()
+
+    def _flush(self):
+        self._fileobj.write(self._buffer.getvalue().encode("utf-8"))
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+
+class _VSIReader(io.RawIOBase):
+    """将GDAL虚拟文件句柄包装为可读文件对象"""
+
+    def __init__(self, handle):
+        super().__init__()
+        self._handle = handle
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        from osgeo import gdal
+        data = gdal.VSIFReadL(1, len(buffer), self._handle)
+        size = len(data)
+        buffer[:size] = data
+        return size
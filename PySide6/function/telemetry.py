@@ -0,0 +1,337 @@
+"""
+性能遥测模块 - 记录各处理阶段的耗时和资源占用
+
+每个阶段记录墙钟时间、CPU时间（当前线程）、读写字节数、阶段前后的常驻内存变化和
+阶段结束时的进程生命周期峰值内存，
+逐条追加到JSON Lines文件，并按阶段汇总导出为Prometheus文本格式，供node exporter的
+textfile收集器读取。开启时间线追踪（trace_events）时，每个阶段同时记录为一个trace区间。
+
+可通过环境变量配置：
+    RSCD_TELEMETRY=0          关闭遥测
+    RSCD_TELEMETRY_DIR        JSON Lines文件目录，默认logs
+    RSCD_PROM_TEXTFILE        Prometheus文本文件路径，默认logs/rscd_metrics.prom
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .trace_events import get_trace_recorder
+
+# Prometheus文件的最小导出间隔（秒）
+PROM_EXPORT_INTERVAL = 10.0
+
+
+def peak_rss_bytes():
+    """返回进程的峰值常驻内存（字节），无法获取时返回None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux以KB为单位，macOS以字节为单位
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    except ImportError:
+        return None
+
+
+def current_rss_bytes():
+    """返回进程当前的常驻内存（字节），无法获取时返回None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def _process_io():
+    """返回进程累计的(读字节数, 写字节数)，无法获取时返回(None, None)"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            values = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(values["rchar"]), int(values["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+        return counters.read_bytes, counters.write_bytes
+    except (ImportError, AttributeError):
+        return None, None
+
+
+class StageSpan:
+    """一次阶段执行的计时信息"""
+    __slots__ = ('name', 'labels', 'bytes_read', 'bytes_written', 'start_us',
+                 '_wall_start', '_cpu_start', '_io_start', '_rss_start', '_timestamp')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._timestamp = time.time()
+        self._io_start = _process_io()
+        self._rss_start = current_rss_bytes()
+        self._cpu_start = time.thread_time()
+        self._wall_start = time.perf_counter()
+        self.start_us = self._wall_start * 1e6
+
+    def add_bytes(self, read=0, written=0):
+        self.bytes_read += read
+        self.bytes_written += written
+
+    def finish(self, error=None):
+        """结束计时，返回记录字典"""
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.thread_time() - self._cpu_start
+        io_end = _process_io()
+        rss_end = current_rss_bytes()
+        record = {
+            "ts": self._timestamp,
+            "stage": self.name,
+            "labels": self.labels,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "rss_start_bytes": self._rss_start,
+            "rss_end_bytes": rss_end,
+            # 进程生命周期内的峰值，只增不减，不反映单个阶段的内存占用
+            "process_peak_rss_bytes": peak_rss_bytes(),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+        if self._io_start[0] is not None and io_end[0] is not None:
+            # 进程级IO增量，并发阶段之间会相互包含，仅作参考
+            record["proc_read_bytes"] = io_end[0] - self._io_start[0]
+            record["proc_write_bytes"] = io_end[1] - self._io_start[1]
+        if self._rss_start is not None and rss_end is not None:
+            # 进程级内存增量，并发阶段之间会相互包含，仅作参考
+            record["rss_delta_bytes"] = rss_end - self._rss_start
+        if error is not None:
+            record["error"] = error
+        return record
+
+
+class Telemetry:
+    """阶段遥测记录器"""
+
+    def __init__(self, jsonl_path=None, prom_path=None, enabled=True):
+        """
+        初始化遥测记录器
+
+        Args:
+            jsonl_path: JSON Lines输出路径，为None时只在内存中汇总
+            prom_path: Prometheus文本文件路径，为None时不导出
+            enabled: 是否启用
+        """
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._local = threading.local()
+        self._aggregates = {}  # 阶段名 -> 汇总值
+        self._jsonl = None
+        self._last_export = 0.0
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """
+        记录一个处理阶段
+
+        Args:
+            name: 阶段名称，如"detect.inference"
+            labels: 附加标签（只写入JSON Lines，不参与Prometheus汇总）
+        """
+        # 阶段名的第一段作为trace类别，如"detect.inference"归入"detect"
+        category = name.split(".", 1)[0]
+        if not self.enabled:
+            with get_trace_recorder().span(name, category, **labels):
+                yield None
+            return
+        span = StageSpan(name, labels)
+        stack = self._stack()
+        stack.append(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            record = span.finish(error)
+            self._record(record)
+            trace_args = dict(labels, bytes_read=record["bytes_read"], bytes_written=record["bytes_written"])
+            if error is not None:
+                trace_args["error"] = error
+            get_trace_recorder().complete(name, category, span.start_us, record["wall_s"] * 1e6, trace_args)
+
+    def timed(self, name, **labels):
+        """把整个函数作为一个阶段记录的装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_bytes(self, read=0, written=0):
+        """为当前线程中所有进行中的阶段累加读写字节数"""
+        if not self.enabled:
+            return
+        for span in self._stack():
+            span.add_bytes(read, written)
+
+    def _record(self, record):
+        with self._lock:
+            agg = self._aggregates.setdefault(record["stage"], {
+                "count": 0, "errors": 0, "wall_s": 0.0, "cpu_s": 0.0, "wall_max_s": 0.0,
+                "bytes_read": 0, "bytes_written": 0,
+            })
+            agg["count"] += 1
+            agg["errors"] += 1 if "error" in record else 0
+            agg["wall_s"] += record["wall_s"]
+            agg["cpu_s"] += record["cpu_s"]
+            agg["wall_max_s"] = max(agg["wall_max_s"], record["wall_s"])
+            agg["bytes_read"] += record["bytes_read"]
+            agg["bytes_written"] += record["bytes_written"]
+
+            if self.jsonl_path:
+                if self._jsonl is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+                    self._jsonl = open(self.jsonl_path, "a", encoding="utf-8", buffering=1)
+                self._jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            export_due = self.prom_path and time.monotonic() - self._last_export >= PROM_EXPORT_INTERVAL
+        # 其他线程正在导出时跳过本次导出
+        if export_due and self._export_lock.acquire(blocking=False):
+            try:
+                self._write_prometheus(self.prom_path)
+            except OSError:
+                pass
+            finally:
+                self._export_lock.release()
+
+    def snapshot(self):
+        """返回按阶段汇总的统计值副本"""
+        with self._lock:
+            return {name: dict(values) for name, values in self._aggregates.items()}
+
+    def export_prometheus(self, path=None):
+        """
+        将汇总值写为Prometheus文本格式
+
+        先写临时文件再重命名，收集器不会读到写了一半的文件。
+        """
+        path = path or self.prom_path
+        if not path:
+            return
+        with self._export_lock:
+            self._write_prometheus(path)
+
+    def _write_prometheus(self, path):
+        snapshot = self.snapshot()
+        metrics = [
+            ("rscd_stage_calls_total", "counter", "阶段执行次数", "count"),
+            ("rscd_stage_errors_total", "counter", "阶段异常次数", "errors"),
+            ("rscd_stage_wall_seconds_total", "counter", "阶段累计墙钟时间", "wall_s"),
+            ("rscd_stage_cpu_seconds_total", "counter", "阶段累计CPU时间", "cpu_s"),
+            ("rscd_stage_wall_seconds_max", "gauge", "阶段单次最长墙钟时间", "wall_max_s"),
+            ("rscd_stage_read_bytes_total", "counter", "阶段累计读取字节数", "bytes_read"),
+            ("rscd_stage_written_bytes_total", "counter", "阶段累计写入字节数", "bytes_written"),
+        ]
+        lines = []
+        for metric, kind, help_text, key in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name in sorted(snapshot):
+                lines.append(f'{metric}{{stage="{name}"}} {snapshot[name][key]}')
+        peak = peak_rss_bytes()
+        if peak is not None:
+            lines.append("# HELP rscd_process_peak_rss_bytes 进程峰值常驻内存")
+            lines.append("# TYPE rscd_process_peak_rss_bytes gauge")
+            lines.append(f"rscd_process_peak_rss_bytes {peak}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+        self._last_export = time.monotonic()
+
+    def close(self):
+        """导出最终汇总并关闭JSON Lines文件"""
+        try:
+            self.export_prometheus()
+        except OSError:
+            pass
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """获取进程共享的遥测记录器，首次调用时按环境变量创建"""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            enabled = os.environ.get("RSCD_TELEMETRY", "1") not in ("0", "false", "no")
+            log_dir = os.environ.get("RSCD_TELEMETRY_DIR", "logs")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            _telemetry = Telemetry(
+                jsonl_path=os.path.join(log_dir, f"telemetry_{timestamp}.jsonl") if enabled else None,
+                prom_path=os.environ.get("RSCD_PROM_TEXTFILE", os.path.join(log_dir, "rscd_metrics.prom")),
+                enabled=enabled,
+            )
+            atexit.register(_telemetry.close)
+        return _telemetry
+
+
+def stage(name, **labels):
+    """记录一个处理阶段，见Telemetry.stage"""
+    return get_telemetry().stage(name, **labels)
+
+
+def timed(name, **labels):
+    """把整个函数作为一个阶段记录的装饰器，首次调用时才创建遥测记录器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_telemetry().stage(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_bytes(read=0, written=0):
+    """为当前线程中进行中的阶段累加读写字节数"""
+    get_telemetry().record_bytes(read, written)
@@ -0,0 +1,424 @@
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+from PySide6.QtCore import (
+    QObject, QRunnable, QThreadPool, QSize, Qt, Signal,
+    QAbstractListModel, QModelIndex
+)
+from PySide6.QtGui import QImage, QPixmap, QColor
+from PySide6.QtWidgets import QListView
+
+from .workspace import KIND_CACHE, get_workspace
+from .artifact_registry import get_artifact_registry, image_nbytes
+from .raster_io import read_rgb
+from .trace_events import span
+
+# 缩略图缓存数据库的文件名，默认保存在工作空间的缓存目录中
+DEFAULT_CACHE_NAME = "thumbnails.sqlite"
+# 缩略图缓存默认容量（MB），可通过RSCD_THUMBNAIL_CACHE_MB修改
+DEFAULT_CACHE_MB = 256
+# 超出容量时淘汰到容量的该比例以下，避免每次写入都触发淘汰
+PRUNE_TARGET_RATIO = 0.9
+
+
+class ThumbnailCache:
+    """缩略图磁盘缓存
+
+    所有缩略图保存在单个SQLite文件中，以文件路径和缩略图边长为主键，
+    同时记录源文件的修改时间和大小，源文件变化后旧缩略图自动失效。
+    数据库由缓存自身按最近访问时间淘汰，总大小不超过max_bytes。
+    """
+
+    def __init__(self, db_path=None, max_bytes=None):
+        """
+        初始化缩略图缓存
+
+        Args:
+            db_path: SQLite数据库文件路径，默认使用工作空间缓存目录
+            max_bytes: 缩略图数据总大小上限（字节），默认读取RSCD_THUMBNAIL_CACHE_MB
+        """
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("RSCD_THUMBNAIL_CACHE_MB", DEFAULT_CACHE_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        in_workspace = db_path is None
+        if in_workspace:
+            db_path = get_workspace().path_for(KIND_CACHE, DEFAULT_CACHE_NAME)
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL模式下读写互不阻塞，适合多个工作线程同时访问
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS thumbnails (
+                path TEXT NOT NULL,
+                max_edge INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (path, max_edge)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_accessed ON thumbnails (accessed)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM thumbnails").fetchone()[0]
+        self._prune()
+
+        if in_workspace:
+            # 数据库在使用期间保持引用，不参与工作空间的配额淘汰，大小由max_bytes限制
+            workspace = get_workspace()
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    workspace.acquire(db_path + suffix)
+
+    def get(self, path, max_edge, mtime_ns, size):
+        """
+        读取缩略图数据
+
+        Returns:
+            bytes: 编码后的缩略图，不存在或已过期时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, mtime_ns, size FROM thumbnails WHERE path=? AND max_edge=?",
+                (path, max_edge)
+            ).fetchone()
+            if row is None or row[1] != mtime_ns or row[2] != size:
+                return None
+            # 命中时更新访问时间，淘汰按最近访问顺序进行
+            self._conn.execute(
+                "UPDATE thumbnails SET accessed=? WHERE path=? AND max_edge=?",
+                (time.time(), path, max_edge)
+            )
+            self._conn.commit()
+        return row[0]
+
+    def put(self, path, max_edge, mtime_ns, size, data):
+        """写入缩略图数据，覆盖同一路径的旧记录，超出容量时淘汰最久未访问的记录"""
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT LENGTH(data) FROM thumbnails WHERE path=? AND max_edge=?", (path, max_edge)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?)",
+                (path, max_edge, mtime_ns, size, sqlite3.Binary(data), time.time())
+            )
+            self._total += len(data) - (old[0] if old else 0)
+            self._conn.commit()
+            self._prune()
+
+    def _prune(self):
+        """按最近访问时间淘汰记录，直到总大小低于容量的PRUNE_TARGET_RATIO，调用方持有锁或在初始化中"""
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * PRUNE_TARGET_RATIO
+        while self._total > target:
+            rows = self._conn.execute(
+                "SELECT rowid, LENGTH(data) FROM thumbnails ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total = 0
+                break
+            for rowid, length in rows:
+                self._conn.execute("DELETE FROM thumbnails WHERE rowid=?", (rowid,))
+                self._total -= length
+                if self._total <= target:
+                    break
+        self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+def build_thumbnail(path, max_edge):
+    """
+    生成缩略图的JPEG编码数据，可在非GUI线程中调用
+
+    Args:
+        path: 源图像路径
+        max_edge: 缩略图最长边
+
+    Returns:
+        bytes: JPEG编码数据，失败时返回None
+    """
+    try:
+        with Image.open(path) as img:
+            # draft让JPEG解码器直接按1/2、1/4、1/8比例解码，避免解码全分辨率图像
+            img.draft("RGB", (max_edge, max_edge))
+            img = img.convert("RGB")
+            img.thumbnail((max_edge, max_edge), Image.BILINEAR)
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=85)
+            return buffer.getvalue()
+    except Exception:
+        pass
+
+    # PIL无法读取时（如多波段GeoTIFF、虚拟裁剪块）退回OpenCV解码或按窗口读取
+    try:
+        if path.lower().endswith('.vrt'):
+            img = cv2.cvtColor(read_rgb(path), cv2.COLOR_RGB2BGR)
+        else:
+            img = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        height, width = img.shape[:2]
+        scale = min(1.0, max_edge / max(width, height))
+        if scale < 1.0:
+            img = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return buffer.tobytes() if ok else None
+    except Exception:
+        return None
+
+
+class _ThumbnailSignals(QObject):
+    """缩略图任务的信号载体"""
+    done = Signal(str, object)  # 路径, QImage
+
+
+class _ThumbnailTask(QRunnable):
+    """在线程池中读取磁盘缓存或生成缩略图"""
+
+    def __init__(self, path, max_edge, cache, signals):
+        super().__init__()
+        self.path = path
+        self.max_edge = max_edge
+        self.cache = cache
+        self.signals = signals
+
+    def run(self):
+        image = QImage()
+        try:
+            stat = os.stat(self.path)
+            data = self.cache.get(self.path, self.max_edge, stat.st_mtime_ns, stat.st_size)
+            if data is None:
+                with span("thumbnail.build", "decode", max_edge=self.max_edge):
+                    data = build_thumbnail(self.path, self.max_edge)
+                if data is not None:
+                    self.cache.put(self.path, self.max_edge, stat.st_mtime_ns, stat.st_size, data)
+            if data is not None:
+                image = QImage.fromData(data)
+        except Exception:
+            pass
+        self.signals.done.emit(self.path, image)
+
+
+class ThumbnailService(QObject):
+    """缩略图服务
+
+    在工作线程池中生成缩略图，结果同时保存到磁盘缓存和内存LRU缓存。
+    后提交的请求优先处理，快速滚动时可见区域的缩略图最先就绪。
+    """
+
+    thumbnail_ready = Signal(str, object)  # 路径, QImage（失败时为空QImage）
+
+    def __init__(self, max_edge=128, cache=None, memory_capacity=512, parent=None):
+        """
+        初始化缩略图服务
+
+        Args:
+            max_edge: 缩略图最长边
+            cache: ThumbnailCache实例，为None时使用默认缓存文件
+            memory_capacity: 内存中最多保留的缩略图数量
+            parent: 父QObject
+        """
+        super().__init__(parent)
+        self.max_edge = max_edge
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self.memory_capacity = memory_capacity
+
+        self._memory = OrderedDict()  # 路径 -> QImage
+        self._pending = set()
+        self._priority = 0
+
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(max(2, min(8, (os.cpu_count() or 2) - 1)))
+
+        self._signals = _ThumbnailSignals()
+        self._signals.done.connect(self._on_done)
+        get_artifact_registry().track(self)
+
+    def thumbnail(self, path):
+        """
+        获取缩略图
+
+        Args:
+            path: 源图像路径
+
+        Returns:
+            QImage: 内存中已有时直接返回，否则返回None并在后台生成，就绪后发射thumbnail_ready
+        """
+        image = self._memory.get(path)
+        if image is not None:
+            self._memory.move_to_end(path)
+            return image
+        if path not in self._pending:
+            self._pending.add(path)
+            self._priority = (self._priority + 1) % 0x7FFFFFFF
+            self._pool.start(_ThumbnailTask(path, self.max_edge, self.cache, self._signals), self._priority)
+        return None
+
+    def cancel_pending(self):
+        """取消尚未开始的缩略图任务"""
+        self._pool.clear()
+        self._pending.clear()
+
+    def _on_done(self, path, image):
+        self._pending.discard(path)
+        self._memory[path] = image
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.memory_capacity:
+            self._memory.popitem(last=False)
+        self.thumbnail_ready.emit(path, image)
+
+    def clear_memory(self):
+        """释放内存中的缩略图"""
+        self._memory.clear()
+
+    def release_resources(self):
+        """取消未开始的任务并释放内存缩略图，返回释放的内存字节数"""
+        self.cancel_pending()
+        freed = sum(image_nbytes(image) for image in self._memory.values())
+        self.clear_memory()
+        return freed
+
+
+_services = {}
+_shared_cache = None
+
+
+def get_thumbnail_service(max_edge=128):
+    """获取指定边长的共享缩略图服务，所有服务共用一个磁盘缓存文件"""
+    global _shared_cache
+    if max_edge not in _services:
+        if _shared_cache is None:
+            _shared_cache = ThumbnailCache()
+        _services[max_edge] = ThumbnailService(max_edge, _shared_cache)
+    return _services[max_edge]
+
+
+class _ThumbnailModel(QAbstractListModel):
+    """缩略图列表模型，只在视图请求某一行时才生成该行的缩略图"""
+
+    def __init__(self, service, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.paths = []
+        self._rows = {}
+        self._placeholder = QPixmap(service.max_edge, service.max_edge)
+        self._placeholder.fill(QColor(128, 128, 128, 60))
+        self.service.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = list(paths)
+        self._rows = {path: row for row, path in enumerate(self.paths)}
+        self.endResetModel()
+
+    def append_paths(self, paths):
+        paths = list(paths)
+        if not paths:
+            return
+        first = len(self.paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        for offset, path in enumerate(paths):
+            self._rows[path] = first + offset
+        self.paths.extend(paths)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DecorationRole:
+            image = self.service.thumbnail(path)
+            if image is None or image.isNull():
+                return self._placeholder
+            return QPixmap.fromImage(image)
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ToolTipRole or role == Qt.UserRole:
+            return path
+        return None
+
+    def _on_thumbnail_ready(self, path, image):
+        row = self._rows.get(path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ThumbnailGridView(QListView):
+    """虚拟化缩略图网格视图
+
+    基于QListView的统一项尺寸模式，只为当前可见的单元格请求缩略图，
+    数千张裁剪块或检测结果也能流畅滚动。
+    """
+
+    thumbnail_activated = Signal(int, str)  # 行号, 路径
+
+    def __init__(self, max_edge=128, flow=QListView.LeftToRight, wrapping=True, parent=None):
+        """
+        初始化缩略图网格视图
+
+        Args:
+            max_edge: 缩略图最长边
+            flow: 排列方向
+            wrapping: 是否自动换行，单行缩略图条可设为False
+            parent: 父控件
+        """
+        super().__init__(parent)
+        self._model = _ThumbnailModel(get_thumbnail_service(max_edge), self)
+        self.setModel(self._model)
+
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(flow)
+        self.setWrapping(wrapping)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(64)
+        self.setIconSize(QSize(max_edge, max_edge))
+        self.setGridSize(QSize(max_edge + 16, max_edge + 28))
+        self.setSelectionMode(QListView.SingleSelection)
+
+        self.clicked.connect(self._on_clicked)
+        self.activated.connect(self._on_clicked)
+
+    def set_paths(self, paths):
+        """设置要显示的图像路径列表"""
+        self._model.set_paths(paths)
+
+    def append_paths(self, paths):
+        """在末尾追加图像路径，不重置已有的行"""
+        self._model.append_paths(paths)
+
+    def select_row(self, row):
+        """选中并滚动到指定行"""
+        if 0 <= row < self._model.rowCount():
+            index = self._model.index(row)
+            self.setCurrentIndex(index)
+            self.scrollTo(index)
+
+    def _on_clicked(self, index):
+        if index.isValid():
+            self.thumbnail_activated.emit(index.row(), self._model.paths[index.row()])
@@ -0,0 +1,196 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, Signal
+from PySide6.QtGui import QImage
+
+from .artifact_registry import get_artifact_registry, image_nbytes
+from .raster_io import read_rgb
+from .trace_events import span
+
+
+class _PrefetchSignals(QObject):
+    """预取任务的信号载体（QRunnable本身不能发射信号）"""
+    loaded = Signal(int, int, object)  # 代次, 索引, QImage
+
+
+class _DecodeTask(QRunnable):
+    """在线程池中解码单个裁剪块并缩放到显示尺寸"""
+
+    def __init__(self, generation, index, path, target_size, signals):
+        super().__init__()
+        self.generation = generation
+        self.index = index
+        self.path = path
+        self.target_size = target_size
+        self.signals = signals
+
+    def run(self):
+        with span("tile.decode", "decode", index=self.index, generation=self.generation):
+            image = decode_tile(self.path, self.target_size)
+        self.signals.loaded.emit(self.generation, self.index, image)
+
+
+def decode_tile(path, target_size=None):
+    """
+    解码图像文件为QImage，可在非GUI线程中调用
+
+    Args:
+        path: 图像路径（支持中文路径）
+        target_size: 目标显示尺寸QSize，为None时保持原始尺寸
+
+    Returns:
+        QImage: 解码后的图像，失败时返回空QImage
+    """
+    try:
+        if path.lower().endswith('.vrt'):
+            # 虚拟裁剪块只读取源影像中对应的窗口
+            img = read_rgb(path)
+        else:
+            img = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                return QImage()
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        height, width = img.shape[:2]
+        # copy()使QImage拥有自己的数据，numpy缓冲区释放后仍然有效
+        qimg = QImage(img.data, width, height, width * 3, QImage.Format_RGB888).copy()
+        if target_size is not None and target_size.width() > 0 and target_size.height() > 0:
+            qimg = qimg.scaled(target_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return qimg
+    except Exception:
+        return QImage()
+
+
+class TilePrefetcher(QObject):
+    """裁剪块预取器
+
+    在后台线程中解码当前索引前后N张裁剪块，结果保存在容量有限的LRU缓存中，
+    浏览器翻页时直接从缓存取图，长按方向键也能按显示速率连续翻页。
+    """
+
+    image_ready = Signal(int, object)  # 索引, QImage（解码失败时为空QImage）
+
+    def __init__(self, file_list, radius=4, capacity=32, parent=None):
+        """
+        初始化预取器
+
+        Args:
+            file_list: 裁剪块文件路径列表
+            radius: 当前索引前后各预取的数量
+            capacity: LRU缓存最多保存的图像数量
+            parent: 父QObject
+        """
+        super().__init__(parent)
+        self.file_list = list(file_list)
+        self.radius = radius
+        self.capacity = max(capacity, 2 * radius + 1)
+
+        self._cache = OrderedDict()  # 索引 -> QImage
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._target_size = QSize()
+        self._current_index = 0
+
+        # 独立线程池，避免与其他后台任务争抢全局线程池
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(2)
+
+        self._signals = _PrefetchSignals()
+        self._signals.loaded.connect(self._on_loaded)
+        get_artifact_registry().track(self)
+
+    def set_target_size(self, size):
+        """设置显示尺寸，尺寸变化时已缓存的缩放结果失效"""
+        if size == self._target_size:
+            return
+        with self._lock:
+            self._target_size = QSize(size)
+            self._generation += 1
+            self._cache.clear()
+            self._pending.clear()
+
+    def request(self, index):
+        """
+        请求显示指定索引的图像，同时调度相邻图像的预取
+
+        Args:
+            index: 图像索引
+
+        Returns:
+            QImage: 命中缓存时返回图像，否则返回None，图像就绪后通过image_ready信号通知
+        """
+        total = len(self.file_list)
+        if total == 0:
+            return None
+        self._current_index = index % total
+
+        with self._lock:
+            image = self._cache.get(self._current_index)
+            if image is not None:
+                self._cache.move_to_end(self._current_index)
+
+        # 先调度当前索引，再按距离由近到远调度前后相邻的图像
+        order = [self._current_index]
+        for offset in range(1, self.radius + 1):
+            order.append((self._current_index + offset) % total)
+            order.append((self._current_index - offset) % total)
+        for i in order:
+            self._schedule(i)
+        return image
+
+    def _schedule(self, index):
+        with self._lock:
+            if index in self._cache or index in self._pending:
+                return
+            self._pending.add(index)
+            task = _DecodeTask(self._generation, index, self.file_list[index],
+                               QSize(self._target_size), self._signals)
+        self._pool.start(task)
+
+    def _on_loaded(self, generation, index, image):
+        """在GUI线程中接收解码结果"""
+        with self._lock:
+            if generation != self._generation:
+                return  # 显示尺寸已变化，丢弃旧结果
+            self._pending.discard(index)
+            self._cache[index] = image
+            self._cache.move_to_end(index)
+            self._evict_locked()
+
+        if index == self._current_index:
+            self.image_ready.emit(index, image)
+
+    def _evict_locked(self):
+        """淘汰离当前索引最远且最久未使用的图像，直到缓存不超过容量"""
+        total = len(self.file_list)
+        while len(self._cache) > self.capacity:
+            def distance(i):
+                d = abs(i - self._current_index)
+                return min(d, total - d)
+            # 预取窗口内的图像优先保留，窗口外按LRU顺序淘汰
+            victim = next((i for i in self._cache if distance(i) > self.radius), None)
+            if victim is None:
+                victim = next(iter(self._cache))
+            del self._cache[victim]
+
+    def shutdown(self):
+        """
+        取消尚未开始的预取任务并释放缓存
+
+        Returns:
+            int: 释放的内存字节数
+        """
+        self._pool.clear()
+        self._pool.waitForDone()
+        with self._lock:
+            freed = sum(image_nbytes(image) for image in self._cache.values())
+            self._generation += 1
+            self._cache.clear()
+            self._pending.clear()
+        return freed
+
+    def release_resources(self):
+        return self.shutdown()
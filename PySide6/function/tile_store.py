@@ -0,0 +1,261 @@
+"""
+分块瓦片存储模块 - 把网格裁剪块写入单个HDF5文件，代替成千上万个小文件
+
+文件结构（每个时相一个组，前后时相可以保存在同一个文件中）：
+    /before, /after                 组属性: source、width、height、grid_size、tile_width、tile_height、
+                                    geo_transform（源影像，可选）、projection
+        tiles           (N, h, w, C)    原始数据类型和全部波段，每个瓦片一个压缩块
+        windows         (N, 4)          源影像中的像素窗口 x, y, 宽度, 高度
+        grid            (N, 2)          行号、列号（从1开始）
+        geo_transforms  (N, 6)          每个瓦片的地理变换（源影像有地理参考时）
+
+网格划分与实体裁剪相同（virtual_tiles.grid_windows），同一网格的瓦片尺寸一致，
+训练和推理时可以一次读取连续的一批。读取时直接取出压缩块在线程池中并行解压
+（zlib解压时释放GIL），只有gzip压缩且没有其他过滤器时可用，否则退回h5py逐块读取。
+
+依赖h5py（可选），未安装时写入和读取都会抛出RuntimeError。
+"""
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .trace_events import span
+from .virtual_tiles import grid_windows
+
+STORE_EXTENSION = '.h5'
+DEFAULT_STORE_NAME = "grid_tiles.h5"
+PHASES = ("before", "after")
+
+
+def _h5py():
+    try:
+        import h5py
+        return h5py
+    except ImportError:
+        raise RuntimeError("分块瓦片存储需要h5py，请先安装: pip install h5py")
+
+
+class _WindowReader:
+    """按窗口读取源影像，GeoTIFF等GDAL可读格式只读取窗口覆盖的数据"""
+
+    def __init__(self, path):
+        self.ds = None
+        self.image = None
+        try:
+            from osgeo import gdal
+            self.ds = gdal.Open(path, gdal.GA_ReadOnly)
+        except ImportError:
+            pass
+        if self.ds is not None:
+            self.width, self.height = self.ds.RasterXSize, self.ds.RasterYSize
+            self.geo_transform = self.ds.GetGeoTransform(can_return_null=True)
+            self.projection = self.ds.GetProjection()
+            self.channels = self.ds.RasterCount
+            return
+
+        import cv2
+        image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise IOError(f"无法读取图像: {path}")
+        if image.ndim == 2:
+            image = image[..., None]
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        elif image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+        self.image = image
+        self.height, self.width, self.channels = image.shape
+        self.geo_transform = None
+        self.projection = ""
+
+    def read(self, x, y, width, height):
+        """读取窗口，返回形状(高度, 宽度, 波段数)的数组"""
+        if self.ds is None:
+            return self.image[y:y + height, x:x + width]
+        with span("gdal.read", "io", width=width, height=height):
+            array = self.ds.ReadAsArray(x, y, width, height)
+        return array[..., None] if array.ndim == 2 else np.moveaxis(array, 0, -1)
+
+    def close(self):
+        self.ds = None
+        self.image = None
+
+
+def write_grid_store(source_path, grid_size, store_path, phase="before", compression_level=4, progress=None):
+    """
+    网格裁剪并写入HDF5瓦片存储，同名时相组已存在时覆盖
+
+    Args:
+        source_path: 源影像路径
+        grid_size: 每行/每列的网格数
+        store_path: HDF5文件路径，不存在时创建
+        phase: 时相组名称，"before"或"after"
+        compression_level: gzip压缩级别(0-9)
+        progress: 进度回调progress(已完成瓦片数, 总瓦片数)
+
+    Returns:
+        dict: count、tile_width、tile_height、channels、dtype、width、height、bytes_written
+    """
+    h5py = _h5py()
+    reader = _WindowReader(source_path)
+    try:
+        windows = list(grid_windows(reader.width, reader.height, grid_size))
+        if not windows:
+            raise ValueError(f"影像尺寸 {reader.width}x{reader.height} 不足以划分为 {grid_size}x{grid_size} 网格")
+        tile_width, tile_height = windows[0][4], windows[0][5]
+        # 读取第一块确定数据类型
+        dtype = reader.read(0, 0, 1, 1).dtype
+
+        directory = os.path.dirname(os.path.abspath(store_path))
+        os.makedirs(directory, exist_ok=True)
+        with h5py.File(store_path, "a") as store:
+            if phase in store:
+                del store[phase]
+            group = store.create_group(phase)
+            group.attrs["source"] = os.path.abspath(source_path)
+            group.attrs["width"] = reader.width
+            group.attrs["height"] = reader.height
+            group.attrs["grid_size"] = grid_size
+            group.attrs["tile_width"] = tile_width
+            group.attrs["tile_height"] = tile_height
+            group.attrs["projection"] = reader.projection or ""
+            if reader.geo_transform is not None:
+                group.attrs["geo_transform"] = np.asarray(reader.geo_transform, dtype=np.float64)
+
+            count = len(windows)
+            # 每个瓦片一个块，按索引读取任意一批时只解压需要的块
+            tiles = group.create_dataset(
+                "tiles", shape=(count, tile_height, tile_width, reader.channels), dtype=dtype,
+                chunks=(1, tile_height, tile_width, reader.channels),
+                compression="gzip", compression_opts=compression_level)
+            group.create_dataset("windows", data=np.asarray([w[2:] for w in windows], dtype=np.int64))
+            group.create_dataset("grid", data=np.asarray([w[:2] for w in windows], dtype=np.int32))
+            if reader.geo_transform is not None:
+                gt = reader.geo_transform
+                group.create_dataset("geo_transforms", data=np.asarray(
+                    [(gt[0] + x * gt[1] + y * gt[2], gt[1], gt[2], gt[3] + x * gt[4] + y * gt[5], gt[4], gt[5])
+                     for _, _, x, y, _, _ in windows], dtype=np.float64))
+
+            # 逐个瓦片按窗口读取，内存中只有一个瓦片，不随影像宽度增长
+            index = 0
+            for row in range(grid_size):
+                row_windows = [w for w in windows if w[0] == row + 1]
+                if not row_windows:
+                    continue
+                with span("store.write_row", "encode", row=row + 1, tiles=len(row_windows)):
+                    for _, _, x, y, _, _ in row_windows:
+                        tiles[index] = reader.read(x, y, tile_width, tile_height)
+                        index += 1
+                if progress is not None:
+                    progress(index, count)
+    finally:
+        reader.close()
+
+    return {"count": count, "tile_width": tile_width, "tile_height": tile_height, "channels": reader.channels,
+            "dtype": str(dtype), "width": reader.width, "height": reader.height,
+            "bytes_written": os.path.getsize(store_path)}
+
+
+class TileStore:
+    """只读访问HDF5瓦片存储
+
+    用法:
+        with TileStore(path) as store:
+            batch = store.read_batch("before", 0, 32)
+            tiles = store.read_tiles("after", [3, 7, 11], workers=4)
+    """
+
+    def __init__(self, path):
+        h5py = _h5py()
+        self.path = path
+        self._file = h5py.File(path, "r")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def phases(self):
+        """返回存储中已有的时相组名称"""
+        return [name for name in PHASES if name in self._file]
+
+    def count(self, phase):
+        return self._file[phase]["tiles"].shape[0]
+
+    def attributes(self, phase):
+        """返回时相组的属性（源影像、尺寸、网格数、地理参考等）"""
+        return {key: (value.tolist() if isinstance(value, np.ndarray) else value)
+                for key, value in self._file[phase].attrs.items()}
+
+    def tile_info(self, phase, index):
+        """
+        返回单个瓦片的位置信息
+
+        Returns:
+            dict: row、col、window (x, y, 宽度, 高度)、geo_transform（无地理参考时为None）
+        """
+        group = self._file[phase]
+        row, col = (int(v) for v in group["grid"][index])
+        info = {"row": row, "col": col, "window": tuple(int(v) for v in group["windows"][index]),
+                "geo_transform": None}
+        if "geo_transforms" in group:
+            info["geo_transform"] = tuple(float(v) for v in group["geo_transforms"][index])
+        return info
+
+    def read_tile(self, phase, index):
+        """读取单个瓦片，形状(h, w, C)"""
+        return self._file[phase]["tiles"][index]
+
+    def read_batch(self, phase, start, stop):
+        """读取连续的一批瓦片，形状(N, h, w, C)"""
+        with span("store.read_batch", "io", phase=phase, start=start, count=stop - start):
+            return self._file[phase]["tiles"][start:stop]
+
+    def read_tiles(self, phase, indices, workers=None):
+        """
+        读取任意一组瓦片，压缩块在线程池中并行解压
+
+        Args:
+            phase: 时相组名称
+            indices: 瓦片索引列表
+            workers: 解压线程数，默认为CPU核数
+
+        Returns:
+            numpy.ndarray: 形状(N, h, w, C)，顺序与indices一致
+        """
+        dataset = self._file[phase]["tiles"]
+        indices = list(indices)
+        if not self._direct_chunks(dataset):
+            return np.stack([dataset[i] for i in indices]) if indices else dataset[0:0]
+
+        shape = dataset.shape[1:]
+        dtype = dataset.dtype
+        # 读取压缩块只是文件IO，在当前线程中完成；解压在线程池中并行
+        with span("store.read_chunks", "io", phase=phase, count=len(indices)):
+            raw = [dataset.id.read_direct_chunk((i, 0, 0, 0)) for i in indices]
+
+        def decode(item):
+            filter_mask, data = item
+            # filter_mask非零表示该块跳过了压缩（数据不可压缩时HDF5会原样保存）
+            buffer = data if filter_mask else zlib.decompress(data)
+            return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+        with span("store.decompress", "decode", count=len(indices)):
+            with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+                return np.stack(list(executor.map(decode, raw))) if raw else dataset[0:0]
+
+    @staticmethod
+    def _direct_chunks(dataset):
+        """只有每个瓦片一个块、仅使用gzip压缩时才能直接解压压缩块"""
+        return (dataset.chunks == (1,) + dataset.shape[1:] and dataset.compression == "gzip"
+                and not dataset.shuffle and not dataset.fletcher32 and dataset.scaleoffset is None
+                and dataset.dtype.byteorder in ("=", "|", "<" if np.little_endian else ">"))
@@ -0,0 +1,280 @@
+"""
+瓦片编码写出服务 - 在线程池中并行编码裁剪块和检测结果
+
+OpenCV的imencode和GDAL写入时都会释放GIL，多线程编码可以利用多核。各格式的编码参数
+集中在EncoderSettings中，默认值可通过环境变量RSCD_ENCODER调整，例如：
+    RSCD_ENCODER="png_level=1,jpeg_quality=85,jpeg_progressive=1,tiff_compression=zstd"
+
+写出统一使用imencode+tofile（GDAL使用Unicode路径），中文路径无需特殊处理。
+TileWriter统计原始数据量、输出大小和编码耗时，便于按存储条件选择参数。
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from .trace_events import span
+
+# TIFF压缩方式 -> libtiff压缩代码（OpenCV编码参数）
+_TIFF_CODES = {"none": 1, "lzw": 5, "deflate": 8, "zstd": 50000}
+
+
+class EncoderSettings:
+    """各格式的编码参数"""
+
+    def __init__(self, png_level=3, jpeg_quality=90, jpeg_progressive=False,
+                 tiff_compression="lzw", tiff_predictor=2):
+        """
+        Args:
+            png_level: PNG压缩级别(0-9)，越高文件越小、编码越慢
+            jpeg_quality: JPEG质量(1-100)
+            jpeg_progressive: 是否写出渐进式JPEG
+            tiff_compression: TIFF压缩方式，none、lzw、deflate或zstd
+            tiff_predictor: TIFF预测器，1为不使用，2为水平差分（对影像通常能明显减小体积）
+        """
+        if tiff_compression not in _TIFF_CODES:
+            raise ValueError(f"不支持的TIFF压缩方式: {tiff_compression}（可选: {', '.join(_TIFF_CODES)}）")
+        self.png_level = int(png_level)
+        self.jpeg_quality = int(jpeg_quality)
+        self.jpeg_progressive = bool(jpeg_progressive)
+        self.tiff_compression = tiff_compression
+        self.tiff_predictor = int(tiff_predictor)
+
+    @classmethod
+    def from_env(cls, value=None):
+        """从RSCD_ENCODER环境变量（逗号分隔的name=value）读取参数，未设置的项使用默认值"""
+        value = os.environ.get("RSCD_ENCODER", "") if value is None else value
+        options = {}
+        for item in filter(None, (part.strip() for part in value.split(","))):
+            name, _, text = item.partition("=")
+            name = name.strip()
+            if name == "tiff_compression":
+                options[name] = text.strip().lower()
+            elif name == "jpeg_progressive":
+                options[name] = text.strip().lower() in ("1", "true", "yes")
+            elif name in ("png_level", "jpeg_quality", "tiff_predictor"):
+                options[name] = int(text)
+            else:
+                raise ValueError(f"未知的编码参数: {name}")
+        return cls(**options)
+
+    def cv2_params(self, ext):
+        """返回cv2.imencode的编码参数"""
+        ext = ext.lower()
+        if ext == ".png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.png_level]
+        if ext in (".jpg", ".jpeg"):
+            return [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality,
+                    cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.jpeg_progressive)]
+        if ext in (".tif", ".tiff"):
+            params = [cv2.IMWRITE_TIFF_COMPRESSION, _TIFF_CODES[self.tiff_compression]]
+            # 预测器参数需要较新的OpenCV
+            if hasattr(cv2, "IMWRITE_TIFF_PREDICTOR") and self.tiff_compression != "none":
+                params += [cv2.IMWRITE_TIFF_PREDICTOR, self.tiff_predictor]
+            return params
+        return []
+
+    def gdal_options(self):
+        """返回写出GeoTIFF时的GDAL创建参数"""
+        options = [f"COMPRESS={self.tiff_compression.upper()}"]
+        if self.tiff_compression != "none":
+            options.append(f"PREDICTOR={self.tiff_predictor}")
+        return options
+
+    def describe(self):
+        return (f"PNG级别={self.png_level}, JPEG质量={self.jpeg_quality}"
+                f"{'(渐进式)' if self.jpeg_progressive else ''}, "
+                f"TIFF={self.tiff_compression}/预测器{self.tiff_predictor}")
+
+
+_default_settings = None
+_settings_lock = threading.Lock()
+
+
+def get_encoder_settings():
+    """获取进程共享的编码参数，首次调用时按环境变量创建"""
+    global _default_settings
+    with _settings_lock:
+        if _default_settings is None:
+            _default_settings = EncoderSettings.from_env()
+        return _default_settings
+
+
+def encode_to_file(path, array, settings=None, color_order="BGR"):
+    """
+    编码数组并写入文件，可在工作线程中调用
+
+    Args:
+        path: 输出路径，扩展名决定编码格式
+        array: 灰度或3/4通道数组
+        settings: EncoderSettings，默认使用get_encoder_settings()
+        color_order: 数组的通道顺序，"RGB"时编码前转换为OpenCV的BGR
+
+    Returns:
+        int: 写出的字节数
+    """
+    settings = settings or get_encoder_settings()
+    ext = os.path.splitext(path)[1] or ".png"
+    if color_order == "RGB" and array.ndim == 3:
+        if array.shape[2] == 3:
+            array = cv2.cvtColor(array, cv2.COLOR_RGB2BGR)
+        elif array.shape[2] == 4:
+            array = cv2.cvtColor(array, cv2.COLOR_RGBA2BGRA)
+    with span("cv2.encode", "encode", format=ext, width=array.shape[1], height=array.shape[0]):
+        ok, buffer = cv2.imencode(ext, array, settings.cv2_params(ext))
+    if not ok:
+        raise IOError(f"编码图像失败: {path}")
+    with span("file.write", "io", bytes=buffer.size):
+        buffer.tofile(path)
+    return int(buffer.size)
+
+
+def write_geotiff(path, array, geo_transform=None, projection=None, nodata=None, settings=None):
+    """
+    使用GDAL写出GeoTIFF，可在工作线程中调用（每次调用使用独立的数据集）
+
+    Args:
+        path: 输出路径
+        array: 形状(h, w)或(h, w, 波段数)的数组，保留原始数据类型
+        geo_transform: 地理变换
+        projection: 投影WKT
+        nodata: 每个波段的无效值列表
+        settings: EncoderSettings
+
+    Returns:
+        int: 写出的字节数
+    """
+    from osgeo import gdal, gdal_array
+    settings = settings or get_encoder_settings()
+    if array.ndim == 2:
+        array = array[..., None]
+    height, width, bands = array.shape
+    with span("gdal.encode", "encode", width=width, height=height, bands=bands):
+        ds = gdal.GetDriverByName("GTiff").Create(
+            path, width, height, bands, gdal_array.NumericTypeCodeToGDALTypeCode(array.dtype),
+            settings.gdal_options())
+        if ds is None:
+            raise IOError(f"无法创建GeoTIFF: {path}")
+        if geo_transform is not None:
+            ds.SetGeoTransform(geo_transform)
+        if projection:
+            ds.SetProjection(projection)
+        for index in range(bands):
+            band = ds.GetRasterBand(index + 1)
+            if nodata and nodata[index] is not None:
+                band.SetNoDataValue(nodata[index])
+            band.WriteArray(array[:, :, index])
+        ds.FlushCache()
+        ds = None
+    return os.path.getsize(path)
+
+
+class TileWriter:
+    """并行瓦片写出器
+
+    调用方在当前线程中读取/切分数据后提交，编码和写文件在线程池中完成。同时排队的任务数
+    有上限，超过时submit会等待，避免读取速度快于编码时数据在内存中堆积。
+
+    用法:
+        with TileWriter() as writer:
+            writer.submit(path, tile)
+        writer.stats()
+    """
+
+    def __init__(self, settings=None, max_workers=None, max_pending=None):
+        """
+        Args:
+            settings: EncoderSettings，默认使用get_encoder_settings()
+            max_workers: 编码线程数，默认为CPU核数
+            max_pending: 最多同时排队的任务数，默认为线程数的两倍
+        """
+        self.settings = settings or get_encoder_settings()
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.max_pending = max_pending or self.max_workers * 2
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tile-writer")
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._files = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._encode_seconds = 0.0
+        self._start = time.perf_counter()
+        self._end = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _run(self, func, path, array, *args):
+        start = time.perf_counter()
+        written = func(path, array, *args)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._files += 1
+            self._bytes_in += array.nbytes
+            self._bytes_out += written
+            self._encode_seconds += elapsed
+        return path
+
+    def _submit(self, func, path, array, *args):
+        while len(self._pending) >= self.max_pending:
+            done, self._pending = wait(self._pending, return_when=FIRST_COMPLETED)
+        # 切片视图可能引用整幅影像，复制后调用方可以立即释放源数据
+        future = self._executor.submit(self._run, func, path, np.ascontiguousarray(array), *args)
+        self._pending.add(future)
+        return future
+
+    def submit(self, path, array, color_order="BGR"):
+        """
+        提交普通图像的编码任务
+
+        Returns:
+            concurrent.futures.Future: 结果为输出路径，失败时抛出编码异常
+        """
+        return self._submit(lambda p, a: encode_to_file(p, a, self.settings, color_order), path, array)
+
+    def submit_geotiff(self, path, array, geo_transform=None, projection=None, nodata=None):
+        """提交GeoTIFF写出任务，参数见write_geotiff"""
+        return self._submit(lambda p, a: write_geotiff(p, a, geo_transform, projection, nodata, self.settings),
+                            path, array)
+
+    def close(self):
+        """等待全部任务完成并关闭线程池"""
+        self._executor.shutdown(wait=True)
+        self._pending.clear()
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    def stats(self):
+        """
+        返回编码统计
+
+        Returns:
+            dict: files、bytes_in（原始数据）、bytes_out（输出文件）、encode_seconds（各线程累计）、
+                  wall_seconds、mb_per_s（原始数据量/墙钟时间）、ratio（压缩比）
+        """
+        with self._lock:
+            wall = (self._end or time.perf_counter()) - self._start
+            return {
+                "files": self._files,
+                "bytes_in": self._bytes_in,
+                "bytes_out": self._bytes_out,
+                "encode_seconds": self._encode_seconds,
+                "wall_seconds": wall,
+                "mb_per_s": self._bytes_in / (1024 * 1024) / wall if wall > 0 else 0.0,
+                "ratio": self._bytes_in / self._bytes_out if self._bytes_out else None,
+            }
+
+    def summary(self):
+        """返回一行统计说明，用于日志"""
+        stats = self.stats()
+        ratio = f", 压缩比 {stats['ratio']:.2f}" if stats["ratio"] else ""
+        return (f"编码 {stats['files']} 个文件: 原始 {stats['bytes_in'] / (1024 * 1024):.2f} MB -> "
+                f"{stats['bytes_out'] / (1024 * 1024):.2f} MB{ratio}, {stats['mb_per_s']:.1f} MB/s "
+                f"({self.max_workers} 线程; {self.settings.describe()})")
@@ -0,0 +1,203 @@
+"""
+时间线追踪模块 - 以Chrome trace-event格式记录GUI线程和工作线程的活动区间
+
+开启后写入logs/trace_<时间戳>.json，可直接拖入Perfetto（ui.perfetto.dev）或
+chrome://tracing查看。每个区间记录为一个完整事件（"ph": "X"），带进程号和线程号，
+并为每个线程写入线程名元数据，GDAL读取、模型推理、编码和界面绘制的重叠情况一目了然。
+
+文件以JSON数组格式边运行边追加，进程异常退出时缺少结尾的"]"，查看器同样可以读取。
+
+可通过环境变量配置：
+    RSCD_TRACE=1              开启追踪
+    RSCD_TRACE_FILE           追踪文件路径，默认logs/trace_<时间戳>.json
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 缓冲的事件数达到该值或距上次写入超过FLUSH_INTERVAL秒时写入文件
+FLUSH_EVENTS = 256
+FLUSH_INTERVAL = 2.0
+
+
+def _now_us():
+    """单调时钟的当前时间（微秒）"""
+    return time.perf_counter_ns() / 1000.0
+
+
+class TraceRecorder:
+    """Chrome trace-event记录器"""
+
+    def __init__(self, path=None):
+        """
+        初始化追踪记录器
+
+        Args:
+            path: 追踪文件路径，为None时不记录
+        """
+        self.path = path
+        self.enabled = path is not None
+        self._lock = threading.Lock()
+        self._pending = []
+        self._known_threads = set()
+        self._file = None
+        self._pid = os.getpid()
+        self._last_flush = time.monotonic()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._file.write(json.dumps({
+            "name": "process_name", "ph": "M", "pid": self._pid, "tid": 0,
+            "args": {"name": "RSCD"},
+        }, ensure_ascii=False))
+
+    def _append(self, event):
+        tid = event["tid"]
+        with self._lock:
+            if tid not in self._known_threads:
+                self._known_threads.add(tid)
+                self._pending.append({
+                    "name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                    "args": {"name": threading.current_thread().name},
+                })
+            self._pending.append(event)
+            if len(self._pending) >= FLUSH_EVENTS or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending or not self.enabled:
+            return
+        if self._file is None:
+            self._open()
+        for event in self._pending:
+            self._file.write(",\n" + json.dumps(event, ensure_ascii=False))
+        self._file.flush()
+        self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def complete(self, name, category, start_us, duration_us, args=None):
+        """
+        记录一个已结束的区间
+
+        Args:
+            name: 区间名称
+            category: 类别，如"io"、"inference"、"paint"
+            start_us: 开始时间（_now_us()的返回值）
+            duration_us: 持续时间（微秒）
+            args: 附加参数，显示在查看器的详情中
+        """
+        if not self.enabled:
+            return
+        event = {
+            "name": name, "cat": category, "ph": "X",
+            "ts": round(start_us, 3), "dur": round(duration_us, 3),
+            "pid": self._pid, "tid": threading.get_native_id(),
+        }
+        if args:
+            event["args"] = {key: value if isinstance(value, (int, float, bool)) else str(value)
+                             for key, value in args.items()}
+        self._append(event)
+
+    def instant(self, name, category="app", args=None):
+        """记录一个瞬时事件（如取消、超时）"""
+        if not self.enabled:
+            return
+        event = {
+            "name": name, "cat": category, "ph": "i", "s": "t",
+            "ts": round(_now_us(), 3), "pid": self._pid, "tid": threading.get_native_id(),
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        self._append(event)
+
+    @contextmanager
+    def span(self, name, category="app", **args):
+        """记录with块的执行区间"""
+        if not self.enabled:
+            yield
+            return
+        start = _now_us()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, _now_us() - start, args)
+
+    def flush(self):
+        """把缓冲的事件写入文件"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """写入剩余事件并补全JSON数组"""
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.write("\n]\n")
+                self._file.close()
+                self._file = None
+            self.enabled = False
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def _default_trace_path():
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join("logs", f"trace_{timestamp}.json")
+
+
+def get_trace_recorder():
+    """获取进程共享的追踪记录器，首次调用时按环境变量创建"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            enabled = os.environ.get("RSCD_TRACE", "0") not in ("0", "false", "no", "")
+            path = (os.environ.get("RSCD_TRACE_FILE") or _default_trace_path()) if enabled else None
+            _recorder = TraceRecorder(path)
+            atexit.register(_recorder.close)
+        return _recorder
+
+
+def enable_tracing(path=None):
+    """
+    开启追踪（如命令行参数--trace），已开启时返回现有文件路径
+
+    Args:
+        path: 追踪文件路径，默认logs/trace_<时间戳>.json
+
+    Returns:
+        str: 追踪文件路径
+    """
+    global _recorder
+    with _recorder_lock:
+        if _recorder is not None and _recorder.enabled:
+            return _recorder.path
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = TraceRecorder(path or _default_trace_path())
+        atexit.register(_recorder.close)
+        return _recorder.path
+
+
+def span(name, category="app", **args):
+    """记录with块的执行区间，见TraceRecorder.span"""
+    return get_trace_recorder().span(name, category, **args)
+
+
+def traced(name, category="app"):
+    """把整个函数记录为一个区间的装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_trace_recorder().span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
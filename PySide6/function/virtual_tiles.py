@@ -0,0 +1,208 @@
+"""
+虚拟裁剪模块 - 用VRT和瓦片索引代替实体裁剪块
+
+每个网格块写成一个很小的VRT文件，只记录源影像路径和窗口（SrcRect），不复制像素；
+同时写出瓦片索引：
+    {前缀}_tiles.csv        每行一个瓦片：名称、行列号、像素窗口、VRT路径
+    {前缀}_tiles.geojson    每个瓦片的外包多边形（有地理变换时为地理坐标，否则为像素坐标）
+
+VRT按GDAL格式写出，GDAL可以直接读取；GDAL不可用时，read_vrt_window解析窗口后
+由raster_io按窗口读取源影像。源影像移动后虚拟裁剪块失效，需要重新生成。
+"""
+import csv
+import json
+import os
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from .raster_io import geojson_crs
+
+VRT_EXTENSION = '.vrt'
+
+# PIL模式 -> (波段数, VRT数据类型)，GDAL不可用时据此生成普通图像的VRT
+_PIL_MODES = {
+    "1": (1, "Byte"), "L": (1, "Byte"), "P": (1, "Byte"), "LA": (2, "Byte"),
+    "RGB": (3, "Byte"), "RGBA": (4, "Byte"), "I;16": (1, "UInt16"), "I": (1, "Int32"), "F": (1, "Float32"),
+}
+_COLOR_INTERP = {1: ["Gray"], 2: ["Gray", "Alpha"], 3: ["Red", "Green", "Blue"], 4: ["Red", "Green", "Blue", "Alpha"]}
+
+
+def grid_windows(width, height, grid_size):
+    """
+    按与实体裁剪相同的规则划分网格（每块宽高为整除结果，余下的边缘像素不输出）
+
+    Yields:
+        tuple: (行号, 列号, x, y, 宽度, 高度)，行列号从1开始
+    """
+    grid_width = width // grid_size
+    grid_height = height // grid_size
+    for row in range(grid_size):
+        for col in range(grid_size):
+            x = col * grid_width
+            y = row * grid_height
+            current_width = min(grid_width, width - x)
+            current_height = min(grid_height, height - y)
+            if current_width > 0 and current_height > 0:
+                yield row + 1, col + 1, x, y, current_width, current_height
+
+
+def source_metadata(path):
+    """
+    读取生成VRT所需的源影像信息，不解码像素
+
+    Returns:
+        dict: width、height、bands（[(数据类型, 颜色解释, 无效值), ...]）、geo_transform、projection
+    """
+    try:
+        from osgeo import gdal
+        ds = gdal.Open(path, gdal.GA_ReadOnly)
+    except ImportError:
+        ds = None
+    if ds is not None:
+        bands = []
+        for index in range(1, ds.RasterCount + 1):
+            band = ds.GetRasterBand(index)
+            bands.append((gdal.GetDataTypeName(band.DataType),
+                          gdal.GetColorInterpretationName(band.GetColorInterpretation()),
+                          band.GetNoDataValue()))
+        return {"width": ds.RasterXSize, "height": ds.RasterYSize, "bands": bands,
+                "geo_transform": ds.GetGeoTransform(can_return_null=True), "projection": ds.GetProjection()}
+
+    from PIL import Image
+    with Image.open(path) as img:
+        count, data_type = _PIL_MODES.get(img.mode, (len(img.getbands()), "Byte"))
+        width, height = img.size
+    interp = _COLOR_INTERP.get(count, ["Undefined"] * count)
+    return {"width": width, "height": height, "bands": [(data_type, interp[i], None) for i in range(count)],
+            "geo_transform": None, "projection": ""}
+
+
+def _source_reference(source_path, vrt_dir):
+    """源影像与VRT在同一磁盘时使用相对路径，整体移动目录后仍然有效"""
+    try:
+        return os.path.relpath(source_path, vrt_dir), True
+    except ValueError:
+        return os.path.abspath(source_path), False
+
+
+def tile_vrt_xml(source_path, meta, window, vrt_dir):
+    """
+    生成引用源影像窗口的VRT文本
+
+    Args:
+        source_path: 源影像路径
+        meta: source_metadata的返回值
+        window: (x, y, 宽度, 高度)
+        vrt_dir: VRT所在目录，用于计算相对路径
+    """
+    x, y, width, height = window
+    reference, relative = _source_reference(source_path, vrt_dir)
+    lines = [f'<VRTDataset rasterXSize="{width}" rasterYSize="{height}">']
+    if meta["projection"]:
+        lines.append(f'  <SRS>{escape(meta["projection"])}</SRS>')
+    geo_transform = meta["geo_transform"]
+    if geo_transform is not None:
+        # 窗口左上角的地理坐标，像元大小和旋转项不变
+        origin_x = geo_transform[0] + x * geo_transform[1] + y * geo_transform[2]
+        origin_y = geo_transform[3] + x * geo_transform[4] + y * geo_transform[5]
+        values = (origin_x, geo_transform[1], geo_transform[2], origin_y, geo_transform[4], geo_transform[5])
+        lines.append(f'  <GeoTransform>{", ".join(repr(float(v)) for v in values)}</GeoTransform>')
+    for index, (data_type, color_interp, nodata) in enumerate(meta["bands"], start=1):
+        lines.append(f'  <VRTRasterBand dataType="{data_type}" band="{index}">')
+        if nodata is not None:
+            lines.append(f'    <NoDataValue>{nodata!r}</NoDataValue>')
+        lines.append(f'    <ColorInterp>{color_interp}</ColorInterp>')
+        lines.append('    <SimpleSource>')
+        lines.append(f'      <SourceFilename relativeToVRT="{int(relative)}">{escape(reference)}</SourceFilename>')
+        lines.append(f'      <SourceBand>{index}</SourceBand>')
+        lines.append(f'      <SrcRect xOff="{x}" yOff="{y}" xSize="{width}" ySize="{height}" />')
+        lines.append(f'      <DstRect xOff="0" yOff="0" xSize="{width}" ySize="{height}" />')
+        lines.append('    </SimpleSource>')
+        lines.append('  </VRTRasterBand>')
+    lines.append('</VRTDataset>')
+    return "\n".join(lines) + "\n"
+
+
+def read_vrt_window(vrt_path):
+    """
+    解析虚拟裁剪块引用的源影像和窗口（只支持本模块生成的简单VRT）
+
+    Returns:
+        tuple: (源影像绝对路径, (x, y, 宽度, 高度))
+    """
+    root = ElementTree.parse(vrt_path).getroot()
+    source = root.find("VRTRasterBand/SimpleSource")
+    if source is None:
+        raise ValueError(f"不是虚拟裁剪块: {vrt_path}")
+    filename = source.find("SourceFilename")
+    path = filename.text
+    if filename.get("relativeToVRT") == "1":
+        path = os.path.join(os.path.dirname(os.path.abspath(vrt_path)), path)
+    rect = source.find("SrcRect")
+    window = tuple(int(float(rect.get(key))) for key in ("xOff", "yOff", "xSize", "ySize"))
+    return os.path.normpath(path), window
+
+
+def _tile_polygon(window, geo_transform):
+    """瓦片外包多边形的闭合坐标环"""
+    x, y, width, height = window
+    corners = [(x, y), (x + width, y), (x + width, y + height), (x, y + height), (x, y)]
+    if geo_transform is None:
+        return [[float(px), float(py)] for px, py in corners]
+    return [[geo_transform[0] + px * geo_transform[1] + py * geo_transform[2],
+             geo_transform[3] + px * geo_transform[4] + py * geo_transform[5]] for px, py in corners]
+
+
+def write_virtual_grid(source_path, grid_size, save_dir, prefix):
+    """
+    虚拟裁剪：为每个网格块写出VRT，并写出CSV和GeoJSON瓦片索引
+
+    Args:
+        source_path: 源影像路径
+        grid_size: 每行/每列的网格数
+        save_dir: 保存目录
+        prefix: 文件名前缀，瓦片命名为{前缀}_{行}_{列}.vrt
+
+    Returns:
+        tuple: (VRT路径列表, 元数据dict，含width、height、index_csv、index_geojson)
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    source_path = os.path.abspath(source_path)
+    meta = source_metadata(source_path)
+
+    tiles = []
+    vrt_paths = []
+    for row, col, x, y, width, height in grid_windows(meta["width"], meta["height"], grid_size):
+        name = f"{prefix}_{row}_{col}"
+        vrt_path = os.path.join(save_dir, name + VRT_EXTENSION)
+        with open(vrt_path, "w", encoding="utf-8") as f:
+            f.write(tile_vrt_xml(source_path, meta, (x, y, width, height), save_dir))
+        vrt_paths.append(vrt_path)
+        tiles.append({"name": name, "row": row, "col": col, "x": x, "y": y, "width": width, "height": height,
+                      "vrt": os.path.basename(vrt_path)})
+
+    index_csv = os.path.join(save_dir, f"{prefix}_tiles.csv")
+    with open(index_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["name", "row", "col", "x", "y", "width", "height", "vrt"])
+        writer.writeheader()
+        writer.writerows(tiles)
+
+    features = []
+    for tile in tiles:
+        window = (tile["x"], tile["y"], tile["width"], tile["height"])
+        features.append({"type": "Feature", "properties": tile,
+                         "geometry": {"type": "Polygon", "coordinates": [_tile_polygon(window, meta["geo_transform"])]}})
+    collection = {"type": "FeatureCollection", "name": f"{prefix}_tiles",
+                  "source": source_path,
+                  "coordinates": "geographic" if meta["geo_transform"] is not None else "pixel",
+                  "features": features}
+    _, crs = geojson_crs(meta["projection"])
+    if crs:
+        collection["crs"] = crs
+    index_geojson = os.path.join(save_dir, f"{prefix}_tiles.geojson")
+    with open(index_geojson, "w", encoding="utf-8") as f:
+        json.dump(collection, f, ensure_ascii=False)
+
+    return vrt_paths, {"width": meta["width"], "height": meta["height"], "bands": len(meta["bands"]),
+                       "index_csv": index_csv, "index_geojson": index_geojson}
+
@@ -0,0 +1,209 @@
+import os
+from collections import deque
+
+from PySide6.QtCore import QObject, QThread, QTimer, QFileSystemWatcher, QMetaObject, Qt, Signal, Slot
+
+from .detection_pool import DetectionWorkerPool
+from .directory_index import DirectoryIndex
+
+
+class WatchFolderIngest(QObject):
+    """目录监控接入
+
+    通过QFileSystemWatcher（Linux下基于inotify）监控前后时相投放目录，
+    目录变化经去抖后增量扫描；文件大小和修改时间连续多次不变才视为写入完成，
+    前后时相都完成的影像对进入有界队列，按检测线程池的空闲程度逐步提交。
+    队列中只保存路径，正在解码的影像数受并行上限约束，成千上万个文件同时到达也不会占满内存。
+    """
+
+    result_ready = Signal(str, str)  # 配对键, 结果路径
+    pair_failed = Signal(str, str)  # 配对键, 错误信息
+    status_changed = Signal(str)
+
+    def __init__(self, before_dir, after_dir, output_dir, rule, max_workers=None,
+                 debounce_ms=1500, stable_checks=2, max_queue=1000, threshold=0.5):
+        """
+        初始化目录监控
+
+        Args:
+            before_dir: 前时相投放目录
+            after_dir: 后时相投放目录
+            output_dir: 结果输出目录
+            rule: PairingRule配对规则
+            max_workers: 检测线程数
+            debounce_ms: 目录变化去抖间隔，也是文件稳定性检查的周期
+            stable_checks: 文件属性连续不变的检查次数，达到后视为写入完成
+            max_queue: 等待检测的影像对上限，超出的影像对留到队列空闲后再入队
+            threshold: 变化概率阈值
+        """
+        super().__init__()
+        self.before_dir = before_dir
+        self.after_dir = after_dir
+        self.output_dir = output_dir
+        self.rule = rule
+        self.max_workers = max_workers
+        self.debounce_ms = debounce_ms
+        self.stable_checks = stable_checks
+        self.max_queue = max_queue
+        self.threshold = threshold
+
+        self.completed = 0
+        self.failed = 0
+
+        # Qt对象在start()中创建，使其属于监控线程
+        self._watcher = None
+        self._timer = None
+        self._pool = None
+
+    @Slot()
+    def start(self):
+        """在监控线程中启动监控"""
+        self._indexes = {True: DirectoryIndex(self.before_dir), False: DirectoryIndex(self.after_dir)}
+        self._pending = {True: {}, False: {}}  # 文件名 -> ((大小, 修改时间), 连续不变次数)
+        self._stable_keys = {True: {}, False: {}}  # 配对键 -> 路径
+        self._stable_names = {True: set(), False: set()}
+        self._seen_keys = set()
+        self._queue = deque()
+        self._backlog = False
+
+        self._pool = DetectionWorkerPool(self.max_workers, self.threshold, parent=self)
+        self._pool.finished.connect(self._on_finished)
+        self._pool.failed.connect(self._on_failed)
+        # 正在执行和已提交待执行的任务总数上限
+        self._max_in_flight = self._pool.max_workers * 2
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._poll)
+
+        self._watcher = QFileSystemWatcher([self.before_dir, self.after_dir], self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+
+        self._poll()
+
+    @Slot()
+    def stop(self):
+        """停止监控，取消尚未开始的检测任务并等待执行中的任务结束"""
+        if self._timer is not None:
+            self._timer.stop()
+        if self._watcher is not None:
+            self._watcher.removePaths(self._watcher.directories())
+        if self._pool is not None:
+            self._pool.cancel_pending()
+            self._pool.wait_for_done()
+        self._queue.clear()
+
+    def _on_directory_changed(self, path):
+        # 每次变化都重新计时，一批文件写入期间只在最后扫描一次
+        self._timer.start(self.debounce_ms)
+
+    def _poll(self):
+        """增量扫描目录、检查文件稳定性并把完整的影像对加入队列"""
+        for is_before, index in self._indexes.items():
+            try:
+                index.scan()
+            except OSError as e:
+                self.status_changed.emit(f"扫描目录出错: {str(e)}")
+                continue
+            self._check_stability(is_before, index)
+
+        self._enqueue_pairs()
+        self._dispatch()
+
+        # 仍有写入中的文件或因队列已满未入队的影像对时，继续定时检查
+        if any(self._pending.values()) or self._backlog:
+            self._timer.start(self.debounce_ms)
+        self._emit_status()
+
+    def _check_stability(self, is_before, index):
+        pending = self._pending[is_before]
+        stable_names = self._stable_names[is_before]
+        for name in list(index.entries):
+            if name in stable_names:
+                continue
+            entry = index.refresh(name) if name in pending else index.entries[name]
+            if entry is None:
+                pending.pop(name, None)
+                continue
+            signature = (entry.size, entry.mtime_ns)
+            previous = pending.get(name)
+            count = previous[1] + 1 if previous and previous[0] == signature and entry.size > 0 else 0
+            if count >= self.stable_checks:
+                pending.pop(name, None)
+                stable_names.add(name)
+                key = self.rule.key(name)
+                if key is not None and key not in self._stable_keys[is_before]:
+                    self._stable_keys[is_before][key] = entry.path
+            else:
+                pending[name] = (signature, count)
+
+    def _enqueue_pairs(self):
+        self._backlog = False
+        after_keys = self._stable_keys[False]
+        for key, before_path in self._stable_keys[True].items():
+            if key in self._seen_keys or key not in after_keys:
+                continue
+            output_path = os.path.join(self.output_dir, f"{key}_change.png")
+            if os.path.exists(output_path):
+                # 之前已发布过结果，跳过
+                self._seen_keys.add(key)
+                continue
+            if len(self._queue) >= self.max_queue:
+                self._backlog = True
+                break
+            self._seen_keys.add(key)
+            self._queue.append((key, before_path, after_keys[key], output_path))
+
+    def _dispatch(self):
+        while self._queue and self._pool.in_flight < self._max_in_flight:
+            self._pool.submit(*self._queue.popleft())
+
+    def _on_finished(self, key, output_path, elapsed, fingerprints):
+        self.completed += 1
+        self.result_ready.emit(key, output_path)
+        self._after_task()
+
+    def _on_failed(self, key, error):
+        self.failed += 1
+        self.pair_failed.emit(key, error)
+        self._after_task()
+
+    def _after_task(self):
+        self._dispatch()
+        # 队列降到一半以下时，把之前因队列已满而未入队的影像对补进来
+        if self._backlog and len(self._queue) < self.max_queue // 2:
+            self._enqueue_pairs()
+            self._dispatch()
+        self._emit_status()
+
+    def _emit_status(self):
+        writing = len(self._pending[True]) + len(self._pending[False])
+        self.status_changed.emit(
+            f"监控中: 写入中 {writing} 个文件，排队 {len(self._queue)} 组，"
+            f"处理中 {self._pool.in_flight} 组，已完成 {self.completed} 组，失败 {self.failed} 组"
+            # 模型在第一次推理时加载，之后才能确定实际使用的检测方法
+            + (f"，检测方法: {self._pool.model.description}" if self.completed else ""))
+
+
+class WatchFolderController(QObject):
+    """在独立线程中运行WatchFolderIngest，界面线程只接收信号"""
+
+    def __init__(self, ingest, parent=None):
+        super().__init__(parent)
+        self.ingest = ingest
+        self.thread = QThread()
+        self.ingest.moveToThread(self.thread)
+        self.thread.started.connect(self.ingest.start)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        if self.thread.isRunning():
+            # 阻塞等待监控线程完成清理后再退出事件循环
+            QMetaObject.invokeMethod(self.ingest, "stop", Qt.BlockingQueuedConnection)
+            self.thread.quit()
+            self.thread.wait()
+
+    def is_running(self):
+        return self.thread.isRunning()
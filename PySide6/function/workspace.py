@@ -0,0 +1,308 @@
+"""
+工作空间管理模块 - 统一管理处理过程中产生的中间文件
+
+程序自己生成的中间文件（检测结果、变化概率图、特征和缩略图缓存等）都在工作空间目录下按类别
+存放，并在登记表中记录大小和最近访问时间。总大小超过配额时按最近最少使用（LRU）顺序删除
+未被引用的文件；清理时只删除登记过的文件，不按通配符匹配目录。裁剪瓦片、虚拟裁剪块等写到
+用户选择目录中的文件是处理结果，不由工作空间管理。
+
+同时运行的多个程序实例各自使用根目录下的instance_N子目录，并对instance_N.lock加锁，
+一个实例不会登记或淘汰另一个实例正在使用的文件；实例退出后锁随之释放，下次启动的实例
+重新使用该目录（缩略图缓存等得以保留）。
+
+根目录和配额可通过环境变量配置，便于放到tmpfs或SSD上：
+    RSCD_WORKSPACE           工作空间根目录
+    RSCD_WORKSPACE_QUOTA_MB  空间配额（MB）
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# 默认空间配额
+DEFAULT_QUOTA_MB = 2048
+
+# 最多尝试的instance_N数，锁文件都无法获取时（如根目录不可写）报错，不无限尝试
+MAX_INSTANCES = 64
+
+# 中间文件类别
+KIND_RESULTS = "results"
+KIND_CACHE = "cache"
+
+
+def _try_lock(path):
+    """
+    以非阻塞方式对文件加排他锁，成功时返回保持打开的文件对象
+
+    已被其他进程锁定或锁文件无法打开（只读、无权限）时返回None，由调用方换用下一个文件。
+    """
+    try:
+        handle = open(path, "a+")
+    except OSError:
+        return None
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+class WorkspaceEntry:
+    """工作空间中登记的一个文件"""
+    __slots__ = ('path', 'kind', 'size', 'refs', 'accessed')
+
+    def __init__(self, path, kind, size, accessed):
+        self.path = path
+        self.kind = kind
+        self.size = size
+        self.refs = 0
+        self.accessed = accessed
+
+
+class Workspace:
+    """中间文件工作空间
+
+    登记表按访问顺序保存在OrderedDict中，最久未访问的在最前面。
+    正在使用的文件（引用计数大于0，如当前显示的结果、打开中的缓存数据库）不会被淘汰。
+    """
+
+    def __init__(self, root=None, quota_bytes=None):
+        """
+        初始化工作空间
+
+        Args:
+            root: 根目录，默认读取RSCD_WORKSPACE，未设置时使用系统临时目录下的rscd_workspace；
+                  实际使用其中本实例加锁的instance_N子目录
+            quota_bytes: 空间配额（字节），默认读取RSCD_WORKSPACE_QUOTA_MB
+        """
+        base = os.path.abspath(
+            root or os.environ.get("RSCD_WORKSPACE") or os.path.join(tempfile.gettempdir(), "rscd_workspace"))
+        os.makedirs(base, exist_ok=True)
+        self.root, self._instance_lock = self._claim_instance(base)
+        if quota_bytes is None:
+            quota_bytes = int(float(os.environ.get("RSCD_WORKSPACE_QUOTA_MB", DEFAULT_QUOTA_MB)) * 1024 * 1024)
+        self.quota_bytes = quota_bytes
+
+        self._entries = OrderedDict()  # 路径 -> WorkspaceEntry
+        self._total = 0
+        self._lock = threading.RLock()
+
+        os.makedirs(self.root, exist_ok=True)
+        self._adopt_existing()
+
+    @staticmethod
+    def _claim_instance(base):
+        """取第一个未被其他实例锁定的instance_N子目录，锁在进程退出前一直保持"""
+        for index in range(MAX_INSTANCES):
+            handle = _try_lock(os.path.join(base, f"instance_{index}.lock"))
+            if handle is not None:
+                return os.path.join(base, f"instance_{index}"), handle
+        raise OSError(f"无法在工作空间目录中获取实例锁: {base}")
+
+    def _adopt_existing(self):
+        """登记本实例目录中上次运行留下的文件，使配额对历史文件同样生效"""
+        found = []
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat()
+                            kind = os.path.relpath(directory, self.root).split(os.sep)[0]
+                            found.append((stat.st_mtime, entry.path, kind, stat.st_size))
+            except OSError:
+                continue
+        for mtime, path, kind, size in sorted(found):
+            self._entries[path] = WorkspaceEntry(path, kind if kind != "." else "", size, mtime)
+            self._total += size
+        self._evict()
+
+    def directory(self, kind):
+        """返回某类中间文件的目录，不存在时创建"""
+        path = os.path.join(self.root, kind)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def path_for(self, kind, name):
+        """返回某类中间文件的固定路径（用于缓存数据库等固定文件）"""
+        return os.path.join(self.directory(kind), name)
+
+    def new_path(self, kind, prefix, suffix):
+        """
+        生成一个不重复的中间文件路径
+
+        Args:
+            kind: 文件类别
+            prefix: 文件名前缀
+            suffix: 扩展名（含点）
+
+        Returns:
+            str: 文件路径（文件尚未创建，写出后需调用register登记）
+        """
+        directory = self.directory(kind)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix=f"{prefix}_{stamp}_", dir=directory)
+        os.close(fd)
+        return path
+
+    def register(self, path, kind=None):
+        """
+        登记写出的中间文件，并按配额淘汰最久未使用的文件
+
+        已登记的文件会更新大小并标记为最近使用。
+
+        Returns:
+            WorkspaceEntry: 登记项，文件不存在时返回None
+        """
+        path = os.path.abspath(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                if kind is None:
+                    kind = os.path.relpath(os.path.dirname(path), self.root).split(os.sep)[0]
+                entry = WorkspaceEntry(path, kind, size, time.time())
+                self._entries[path] = entry
+            else:
+                self._total -= entry.size
+                entry.size = size
+                entry.accessed = time.time()
+                self._entries.move_to_end(path)
+            self._total += size
+            self._evict()
+            return entry
+
+    def touch(self, path):
+        """标记文件为最近使用"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                entry.accessed = time.time()
+                self._entries.move_to_end(path)
+
+    def acquire(self, path):
+        """增加文件的引用计数，被引用的文件不会被淘汰"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = self.register(path)
+            if entry is not None:
+                entry.refs += 1
+                self._entries.move_to_end(path)
+            return entry
+
+    def release(self, path, delete=False):
+        """
+        减少文件的引用计数
+
+        Args:
+            path: 文件路径
+            delete: 引用计数归零时是否立即删除文件
+
+        Returns:
+            int: 释放的磁盘空间（字节）
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return 0
+            entry.refs = max(0, entry.refs - 1)
+            if entry.refs == 0:
+                if delete:
+                    return self._remove_entry(entry)
+                self._evict()
+            return 0
+
+    def remove(self, path):
+        """删除登记的文件（忽略引用计数）"""
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+            return self._remove_entry(entry) if entry is not None else 0
+
+    def clear(self, kind=None):
+        """
+        删除登记的未被引用的文件
+
+        Args:
+            kind: 只清理指定类别，为None时清理全部
+
+        Returns:
+            tuple: (删除的文件数, 释放的磁盘空间字节数)
+        """
+        removed = freed = 0
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.refs > 0 or (kind is not None and entry.kind != kind):
+                    continue
+                freed += self._remove_entry(entry)
+                removed += 1
+        return removed, freed
+
+    def usage(self):
+        """
+        获取空间使用情况
+
+        Returns:
+            dict: {"total": 已用字节数, "quota": 配额字节数, "files": 文件数, "by_kind": {类别: 字节数}}
+        """
+        with self._lock:
+            by_kind = {}
+            for entry in self._entries.values():
+                by_kind[entry.kind] = by_kind.get(entry.kind, 0) + entry.size
+            return {"total": self._total, "quota": self.quota_bytes, "files": len(self._entries), "by_kind": by_kind}
+
+    def _evict(self):
+        """总大小超过配额时，从最久未使用的文件开始删除未被引用的文件"""
+        if self._total <= self.quota_bytes:
+            return
+        for entry in list(self._entries.values()):
+            if self._total <= self.quota_bytes:
+                break
+            if entry.refs > 0:
+                continue
+            self._remove_entry(entry)
+            logging.info(f"工作空间超出配额，已淘汰: {entry.path}")
+
+    def _remove_entry(self, entry):
+        self._entries.pop(entry.path, None)
+        self._total -= entry.size
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logging.warning(f"删除中间文件失败: {entry.path}, 错误: {str(e)}")
+            return 0
+        return entry.size
+
+
+_workspace = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace():
+    """获取进程共享的工作空间"""
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            _workspace = Workspace()
+        return _workspace
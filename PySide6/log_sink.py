@@ -0,0 +1,138 @@
+"""
+日志输出模块 - 后台线程写日志文件，界面日志按定时器批量刷新
+
+所有logging调用只把记录放入队列（QueueHandler），由QueueListener在后台线程中
+写入logs/app_<时间戳>.log和控制台；界面上的日志先进入缓冲区，定时一次性追加到
+QPlainTextEdit，并限制最大行数，大量逐块日志也不会拖慢界面。
+
+日志级别可通过环境变量RSCD_LOG_LEVEL设置（如DEBUG），默认INFO，逐块裁剪等细节信息使用DEBUG级别。
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from collections import deque
+from datetime import datetime
+
+from PySide6.QtCore import QObject, QTimer
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_log_file = None
+
+
+def setup_log_sink(log_dir="logs", level=None):
+    """
+    配置后台日志写入，重复调用时直接返回已有的日志文件
+
+    Args:
+        log_dir: 日志目录
+        level: 日志级别，默认读取RSCD_LOG_LEVEL
+
+    Returns:
+        str: 日志文件路径
+    """
+    global _listener, _log_file
+    if _listener is not None:
+        return _log_file
+
+    level = level or os.environ.get("RSCD_LOG_LEVEL", "INFO").upper()
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    _log_file = os.path.join(log_dir, f"app_{timestamp}.log")
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.FileHandler(_log_file, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    # SimpleQueue的put不需要加锁等待，调用线程只做入队
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    atexit.register(shutdown_log_sink)
+    return _log_file
+
+
+def get_log_file():
+    """返回当前日志文件路径，未配置时返回None"""
+    return _log_file
+
+
+def get_log_dir():
+    """返回日志目录"""
+    return os.path.dirname(_log_file) if _log_file else "logs"
+
+
+def shutdown_log_sink():
+    """停止后台写入线程，写完队列中剩余的记录"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class UiLogSink(QObject):
+    """界面日志缓冲
+
+    log_message可在任意线程调用，消息先追加到缓冲区；GUI线程中的定时器每隔interval_ms
+    把缓冲区中的消息合并为一次追加并只滚动一次。控件的最大行数限制了文档大小，
+    缓冲区长度同样受限，短时间内的大量消息只保留最新的部分。
+    """
+
+    def __init__(self, widget, max_blocks=5000, interval_ms=100, level=logging.INFO):
+        """
+        初始化界面日志缓冲
+
+        Args:
+            widget: 日志控件（QPlainTextEdit，也兼容QTextEdit）
+            max_blocks: 控件保留的最大行数
+            interval_ms: 刷新间隔（毫秒）
+            level: 显示到界面的最低日志级别
+        """
+        super().__init__(widget)
+        self.widget = widget
+        self.level = level
+        self._pending = deque(maxlen=max_blocks)
+        widget.document().setMaximumBlockCount(max_blocks)
+        self._append = getattr(widget, 'appendPlainText', None) or widget.append
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def append(self, message, level=logging.INFO):
+        """将消息加入缓冲区，低于界面级别的消息直接忽略"""
+        if level >= self.level:
+            self._pending.append(str(message))
+
+    def flush(self):
+        """把缓冲区中的消息一次性追加到控件"""
+        if not self._pending:
+            return
+        lines = []
+        while self._pending:
+            lines.append(self._pending.popleft())
+
+        # 用户向上翻看历史日志时不强制滚动到底部
+        scrollbar = self.widget.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self._append("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def clear(self):
+        """清空缓冲区和控件"""
+        self._pending.clear()
+        self.widget.clear()
@@ -1,7 +1,6 @@
 import sys
 import os
-import logging
-from datetime import datetime
+import argparse
 
 # 设置Qt插件路径 - 在导入PySide6之前设置环境变量
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -24,11 +23,14 @@ if "PATH" in os.environ:
 else:
     os.environ["PATH"] = plugins_dir
 
-from PySide6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QTextEdit, QLabel, QPushButton, QWidget, QMessageBox, QGroupBox, QSizePolicy, QDialog, QTextBrowser, QStackedWidget
+from PySide6.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QLabel, QPushButton, QWidget, QMessageBox, QGroupBox, QSizePolicy, QDialog, QTextBrowser, QStackedWidget, QSlider
 from PySide6.QtCore import Qt, QSize
 from PySide6.QtGui import QFont, QPixmap, QImage, QIcon
 
 from display import NavigationFunctions, ZoomableLabel
+from log_sink import setup_log_sink
+from profiler import OperationProfiler
+from function.trace_events import enable_tracing
 from theme_manager import ThemeManager
 
 # 导入功能模块
@@ -122,13 +124,22 @@ class HomePage(QWidget):
             self.init_ui()  # 重新初始化UI以应用新主题
 
 class RemoteSensingApp(QMainWindow):
-    def __init__(self):
-        """初始化GUI界面"""
+    def __init__(self, profile=False, profile_top=25):
+        """
+        初始化GUI界面
+        
+        Args:
+            profile: 启动时是否开启性能分析
+            profile_top: 性能分析报告保留的条目数
+        """
         super().__init__()
         
         # 配置日志
         self.configure_logging()
         
+        # 性能分析器，开启后每个操作在日志目录生成.prof和内存分配差异报告
+        self.profiler = OperationProfiler(enabled=profile, top_n=profile_top)
+        
         # 设置窗口属性
         self.setWindowTitle("遥感影像变化检测系统 V2.0")
         self.setGeometry(100, 100, 1280, 800)
@@ -303,6 +314,14 @@ class RemoteSensingApp(QMainWindow):
         self.btn_begin = QPushButton("开始解译")
         self.btn_begin.setIcon(QIcon(":/icons/play.png"))
         
+        # 创建区域检测按钮：框选区域后只检测该区域
+        self.btn_roi = QPushButton("区域解译")
+        self.btn_roi.setToolTip("在前时相或后时相影像上框选区域，只对该区域执行变化检测")
+        
+        # 创建多时相检测按钮：前时相影像作为基准，与多个后续时相逐一比较
+        self.btn_multi_date = QPushButton("多时相解译")
+        self.btn_multi_date.setToolTip("以前时相影像为基准，与选择的多个后续时相影像逐一检测，基准影像只编码一次")
+        
         # 创建结果导出按钮
         self.btn_export = QPushButton("导出结果")
         self.btn_export.setIcon(QIcon(":/icons/export.png"))
@@ -321,8 +340,14 @@ class RemoteSensingApp(QMainWindow):
         self.btn_help = QPushButton("帮助")
         self.btn_help.setIcon(QIcon(":/icons/help.png"))
         
+        # 性能分析开关
+        self.btn_profile = QPushButton("性能分析")
+        self.btn_profile.setCheckable(True)
+        self.btn_profile.setChecked(self.profiler.enabled)
+        self.btn_profile.setToolTip("开启后每个操作在日志目录中保存cProfile结果和内存分配差异")
+        
         # 添加所有按钮到布局（除首页按钮外，已在前面添加）
-        for btn in [self.btn_standard, self.btn_crop, self.btn_import, self.btn_import_after, self.btn_begin, self.btn_export, self.btn_batch, self.btn_theme, self.btn_clear, self.btn_help]:
+        for btn in [self.btn_standard, self.btn_crop, self.btn_import, self.btn_import_after, self.btn_begin, self.btn_roi, self.btn_multi_date, self.btn_export, self.btn_batch, self.btn_theme, self.btn_clear, self.btn_help, self.btn_profile]:
             button_layout.addWidget(btn)
             # 设置固定高度并增加间距
             btn.setFixedHeight(32)
@@ -347,16 +372,29 @@ class RemoteSensingApp(QMainWindow):
     def connect_buttons(self):
         """连接按钮点击事件"""
         self.btn_home.clicked.connect(self.switch_to_home_page)
-        self.btn_import.clicked.connect(self.import_before_image.on_import_clicked)
-        self.btn_import_after.clicked.connect(self.import_after_image.import_after_image)
-        self.btn_standard.clicked.connect(self.image_standardization.standardize_image)
-        self.btn_crop.clicked.connect(self.grid_cropping.crop_image)
-        self.btn_begin.clicked.connect(self.execute_change_detection.on_begin_clicked)
+        # 用户触发的处理操作经性能分析器包装，未开启分析时直接执行
+        profiled = self.profiler.wrap
+        self.btn_import.clicked.connect(profiled("import_before", self.import_before_image.on_import_clicked))
+        self.btn_import_after.clicked.connect(profiled("import_after", self.import_after_image.import_after_image))
+        self.btn_standard.clicked.connect(profiled("standardize", self.image_standardization.standardize_image))
+        self.btn_crop.clicked.connect(profiled("crop", self.grid_cropping.crop_image))
+        self.btn_begin.clicked.connect(profiled("detect", self.execute_change_detection.on_begin_clicked))
+        self.btn_roi.clicked.connect(self.execute_change_detection.start_selection_detection)
+        self.btn_multi_date.clicked.connect(self.execute_change_detection.start_multi_date)
         self.btn_clear.clicked.connect(self.clear_task.clear_interface)
         self.btn_help.clicked.connect(self.show_help)
-        self.btn_export.clicked.connect(self.on_export_clicked)
+        self.btn_export.clicked.connect(profiled("export", self.on_export_clicked))
         self.btn_theme.clicked.connect(self.toggle_theme)
         self.btn_batch.clicked.connect(self.show_batch_processing)
+        self.btn_profile.toggled.connect(self.toggle_profiling)
+
+    def toggle_profiling(self, enabled):
+        """开启或关闭性能分析"""
+        self.profiler.set_enabled(enabled)
+        if enabled:
+            self.navigation_functions.log_message(f"性能分析已开启，结果保存在: {os.path.abspath(self.profiler.output_dir())}")
+        else:
+            self.navigation_functions.log_message("性能分析已关闭")
 
     def toggle_theme(self):
         """切换深浅主题并更新首页主题"""
@@ -406,8 +444,8 @@ class RemoteSensingApp(QMainWindow):
         # 更新所有按钮的尺寸和字体
         all_buttons = [
             self.btn_home, self.btn_standard, self.btn_crop, self.btn_import, 
-            self.btn_import_after, self.btn_begin, self.btn_export, self.btn_batch,
-            self.btn_theme, self.btn_clear, self.btn_help
+            self.btn_import_after, self.btn_begin, self.btn_roi, self.btn_multi_date, self.btn_export, self.btn_batch,
+            self.btn_theme, self.btn_clear, self.btn_help, self.btn_profile
         ]
         
         for btn in all_buttons:
@@ -428,21 +466,8 @@ class RemoteSensingApp(QMainWindow):
 
     def configure_logging(self):
         """配置日志系统"""
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_file = os.path.join(log_dir, f"app_{timestamp}.log")
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        # 日志记录经队列交给后台线程写入logs/app_<时间戳>.log，调用方不等待磁盘IO
+        self.log_file = setup_log_sink("logs")
     
     def create_before_image_group(self, parent_layout):
         """创建前时相影像组"""
@@ -495,25 +520,8 @@ class RemoteSensingApp(QMainWindow):
     def refresh_log_text_color(self):
         """刷新日志文本框中所有文本的颜色，使其与当前主题一致"""
         if hasattr(self, 'text_log'):
-            # 获取当前文本并清空
-            current_text = self.text_log.toPlainText()
-            self.text_log.clear()
-            
-            # 根据当前主题确定文本颜色
-            text_color = "white" if self.is_dark_theme else "black"
-            
-            # 设置默认文本颜色
-            if self.is_dark_theme:
-                self.text_log.setTextColor(Qt.GlobalColor.white)
-            else:
-                self.text_log.setTextColor(Qt.GlobalColor.black)
-            
-            # 将文本拆分成行并使用HTML格式重新添加，确保每行都有正确的文本颜色
-            lines = current_text.split('\n')
-            for line in lines:
-                if line.strip():  # 跳过空行
-                    formatted_line = f"<span style='color:{text_color};'>{line}</span>"
-                    self.text_log.append(formatted_line)
+            # 纯文本日志的颜色由样式表统一决定，无需逐行重新设置
+            self.text_log.setStyleSheet(ThemeManager.get_log_text_style(self.is_dark_theme))
     
     def create_log_group(self, parent_layout):
         """创建日志组"""
@@ -521,19 +529,14 @@ class RemoteSensingApp(QMainWindow):
         layout_log = QVBoxLayout(self.group_log)
         layout_log.setContentsMargins(8, 16, 8, 8)  # 增加内边距
         
-        self.text_log = QTextEdit()
+        # 纯文本日志控件，文本颜色由样式表决定，最大行数由UiLogSink设置
+        self.text_log = QPlainTextEdit()
         self.text_log.setReadOnly(True)
         self.text_log.setFont(QFont("Microsoft YaHei UI", 9))  # 设置合适的字体和大小
         
         # 使用主题管理器设置日志区域样式
         self.text_log.setStyleSheet(ThemeManager.get_log_text_style(self.is_dark_theme))
         
-        # 确保文本颜色正确设置
-        if self.is_dark_theme:
-            self.text_log.setTextColor(Qt.GlobalColor.white)
-        else:
-            self.text_log.setTextColor(Qt.GlobalColor.black)
-        
         layout_log.addWidget(self.text_log)
         
         if parent_layout:
@@ -562,6 +565,17 @@ class RemoteSensingApp(QMainWindow):
         
         layout_output.addWidget(self.label_result)
         
+        # 阈值滑块：调整变化概率阈值时只重新着色结果，不重新推理
+        threshold_layout = QHBoxLayout()
+        self.slider_threshold = QSlider(Qt.Horizontal)
+        self.slider_threshold.setRange(1, 99)
+        self.slider_threshold.setToolTip("调整变化概率阈值，导出时按当前阈值生成结果")
+        self.label_threshold = QLabel()
+        self.label_threshold.setFont(QFont("Microsoft YaHei UI", 9))
+        threshold_layout.addWidget(self.slider_threshold, 1)
+        threshold_layout.addWidget(self.label_threshold)
+        layout_output.addLayout(threshold_layout)
+        
         return self.group_output
     
     def show_help(self):
@@ -804,9 +818,8 @@ class RemoteSensingApp(QMainWindow):
                          self.execute_change_detection.result_image_path is not None)
             
             if has_result:
-                # 使用图像导出模块导出结果
-                result_path = self.execute_change_detection.result_image_path
-                self.image_export.export_result_image(result_path)
+                # 使用图像导出模块导出结果，阈值调整过时先在后台从概率图重新生成
+                self.execute_change_detection.result_at_threshold(self.image_export.export_result_image)
             else:
                 # 没有结果图像路径，表示无法导出
                 self.navigation_functions.log_message("导出失败: 没有可用的检测结果")
@@ -834,12 +847,6 @@ class RemoteSensingApp(QMainWindow):
         # 设置当前主题信息，确保子模块使用正确的主题
         self.navigation_functions.is_dark_theme = self.is_dark_theme
         
-        # 确保日志文本颜色正确
-        if self.is_dark_theme:
-            self.text_log.setTextColor(Qt.GlobalColor.white)
-        else:
-            self.text_log.setTextColor(Qt.GlobalColor.black)
-        
         # 初始化各功能模块
         self.image_standardization = ImageStandardization(self.navigation_functions)
         self.grid_cropping = GridCropping(self.navigation_functions)
@@ -849,6 +856,7 @@ class RemoteSensingApp(QMainWindow):
             self.navigation_functions, 
             self.label_result
         )
+        self.execute_change_detection.bind_threshold_slider(self.slider_threshold, self.label_threshold)
         self.clear_task = ClearTask(
             self.navigation_functions, 
             self.label_before, 
@@ -900,16 +908,36 @@ class RemoteSensingApp(QMainWindow):
         self.btn_import_after.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
         self.btn_standard.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
         self.btn_crop.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
+        self.btn_roi.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
+        self.btn_multi_date.setStyleSheet(ThemeManager.get_secondary_button_style(self.is_dark_theme))
         
         # 功能性按钮使用工具按钮样式
         self.btn_theme.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         self.btn_help.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
         self.btn_clear.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
+        self.btn_profile.setStyleSheet(ThemeManager.get_utility_button_style(self.is_dark_theme))
+
+def parse_args(argv):
+    """解析命令行参数，未识别的参数留给Qt处理"""
+    parser = argparse.ArgumentParser(description="遥感影像变化检测系统")
+    parser.add_argument("--profile", action="store_true",
+                        help="启动时开启性能分析，每个操作在日志目录保存.prof和内存分配差异")
+    parser.add_argument("--profile-top", type=int, default=25,
+                        help="性能分析报告保留的条目数（默认25）")
+    parser.add_argument("--trace", nargs="?", const="", default=None, metavar="FILE",
+                        help="记录Chrome trace-event时间线（可在Perfetto中查看），默认保存为logs/trace_<时间戳>.json")
+    args, qt_args = parser.parse_known_args(argv[1:])
+    return args, [argv[0]] + qt_args
 
 def main():
     """主函数"""
-    app = QApplication(sys.argv)
-    window = RemoteSensingApp()
+    args, qt_argv = parse_args(sys.argv)
+    trace_file = enable_tracing(args.trace or None) if args.trace is not None else None
+    app = QApplication(qt_argv)
+    window = RemoteSensingApp(profile=args.profile, profile_top=args.profile_top)
+    if trace_file:
+        # 日志在窗口创建时配置，之后与其他启动信息一样写入日志文件和日志面板
+        window.navigation_functions.log_message(f"时间线追踪已开启: {trace_file}")
     window.show()
     sys.exit(app.exec())
 
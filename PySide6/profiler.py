@@ -0,0 +1,159 @@
+"""
+性能分析模块 - 按操作记录cProfile和tracemalloc内存分配差异
+
+开启后，每次用户触发的操作（导入、标准化、裁剪、检测、导出）都会在日志目录中生成：
+    profile_<时间戳>_<操作名>.prof        cProfile统计，可用snakeviz或pstats查看
+    profile_<时间戳>_<操作名>_alloc.txt   操作前后内存分配差异最大的前N项和耗时最多的函数
+
+cProfile只统计调用线程，后台线程池中的工作不在统计范围内；tracemalloc统计整个进程的分配。
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from log_sink import get_log_dir
+
+# 内存差异报告中保留的调用栈深度
+TRACEMALLOC_FRAMES = 10
+
+
+def _reset_peak():
+    """
+    重置tracemalloc记录的峰值
+
+    tracemalloc.reset_peak()从Python 3.9开始提供；3.8上重新启动跟踪，
+    已有的跟踪记录随之清空，因此须在获取操作前的快照之前调用。
+    """
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.stop()
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+class OperationProfiler:
+    """按操作生成性能分析文件"""
+
+    def __init__(self, enabled=False, top_n=25, log_dir=None):
+        """
+        初始化性能分析器
+
+        Args:
+            enabled: 是否启用
+            top_n: 内存差异和函数耗时报告保留的条目数
+            log_dir: 输出目录，默认与日志文件相同
+        """
+        self.top_n = top_n
+        self.log_dir = log_dir
+        self.enabled = False
+        self._active = False
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        """开启或关闭性能分析，tracemalloc只在开启期间运行"""
+        enabled = bool(enabled)
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        logging.info(f"性能分析已{'开启' if enabled else '关闭'}")
+
+    def output_dir(self):
+        """返回分析结果的保存目录"""
+        return self.log_dir or get_log_dir()
+
+    def _output_prefix(self, name):
+        log_dir = self.output_dir()
+        os.makedirs(log_dir, exist_ok=True)
+        # 精确到毫秒，同一秒内的两次分析不会互相覆盖
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        safe_name = re.sub(r'[^\w.-]+', '_', name)
+        return os.path.join(log_dir, f"profile_{timestamp}_{safe_name}")
+
+    @contextmanager
+    def profile(self, name):
+        """
+        分析一次操作
+
+        未开启或已有操作在分析中（嵌套调用）时直接执行，不重复分析。
+
+        Args:
+            name: 操作名称，用于输出文件名
+        """
+        if not self.enabled or self._active:
+            yield
+            return
+
+        self._active = True
+        profile = cProfile.Profile()
+        # 重置峰值，报告中的峰值只反映本次操作
+        _reset_peak()
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            self._active = False
+            try:
+                self._write_report(name, profile, before, after, elapsed)
+            except Exception as e:
+                logging.warning(f"保存性能分析结果失败: {str(e)}")
+
+    def wrap(self, name, func):
+        """
+        返回按钮等信号可直接连接的槽函数，调用时分析func
+
+        槽函数不接收参数，clicked信号的checked参数不会传给func。
+        """
+        def slot():
+            with self.profile(name):
+                return func()
+        return slot
+
+    def _write_report(self, name, profile, before, after, elapsed):
+        prefix = self._output_prefix(name)
+        prof_path = f"{prefix}.prof"
+        profile.dump_stats(prof_path)
+
+        # 过滤分析器、tracemalloc和导入机制自身的分配
+        filters = [
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+
+        stats_stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stats_stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+
+        alloc_path = f"{prefix}_alloc.txt"
+        with open(alloc_path, "w", encoding="utf-8") as f:
+            f.write(f"操作: {name}\n")
+            f.write(f"耗时: {elapsed:.3f} 秒\n")
+            f.write(f"当前跟踪内存: {current / 1024 / 1024:.2f} MB, 峰值: {peak / 1024 / 1024:.2f} MB\n")
+            f.write(f"净分配变化: {sum(stat.size_diff for stat in diff) / 1024 / 1024:+.2f} MB\n\n")
+            f.write(f"内存分配差异前{self.top_n}项:\n")
+            for stat in diff[:self.top_n]:
+                f.write(f"{stat}\n")
+            f.write(f"\n累计耗时前{self.top_n}的函数:\n")
+            f.write(stats_stream.getvalue())
+
+        logging.info(f"性能分析[{name}] 耗时 {elapsed:.3f} 秒，结果已保存: {prof_path}")
+        return prof_path, alloc_path